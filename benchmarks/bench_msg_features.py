@@ -0,0 +1,194 @@
+"""
+消息特征提取的微基准测试，在仓库根目录执行：
+
+    python -m benchmarks.bench_msg_features
+
+- extract：书库与静默加分两个处理器的文本判断。旧流程各自读取并扫描消息文本；
+  新流程创建特征并查匹配表，中文字符数量只在有 `MinHanzi` 规则时统计一次；
+- dispatch：一条群组消息经过 `GroupMsgDispatcher` 与群组消息处理器 (与 `bot.py` 中注册的相同) 的开销。
+  旧流程的处理器匹配所有消息、自己判断消息文本，新流程的处理器声明匹配规则。
+  只保留处理器中判断是否需要处理的部分，不包括实际的数据库与网络操作。
+  猫娘的消息处理器注册在其他处理器组，两种流程中都直接读取 `message.text`，不计入。
+"""
+
+import asyncio
+import re
+import time
+import timeit
+from datetime import datetime
+from itertools import cycle
+from typing import Callable
+
+from telegram import Chat, Message, Update, User
+
+from shubot.config import PassiveBoostConfig
+from shubot.ext.group_msg_dispatcher import GroupMsgDispatcher
+from shubot.ext.group_msg_handler import GroupMessageHandleResult, GroupMsgHandlerMixin
+from shubot.ext.group_msg_match import ExactText, MatchAll, MinHanzi, MsgMatchTable
+from shubot.ext.msg_features import MessageFeatures
+
+_re_hanzi = re.compile(r"[\u4e00-\u9fff]")
+
+SAMPLES = {
+    "short_zh": "今天天气不错",
+    "mixed": "今天天气不错，我们去看书吧 hello world 📚",
+    "ascii": "hello world, this is an english only message",
+    "book_repo": "书库",
+    "long_zh": "修仙" * 200,
+}
+
+UPDATE_COUNT = 1000
+"""每个样本轮流使用的更新数量"""
+
+REPEAT = 5
+"""重复测量的次数，取最快的一次以减少干扰"""
+
+HANZI_REQUIRED = PassiveBoostConfig().chinese_count
+
+# extract 只使用匹配表，规则与 bot.py 中注册的处理器相同
+MATCH_TABLE = MsgMatchTable([(MatchAll(),), (ExactText("书库"),), (MinHanzi(HANZI_REQUIRED),)])
+
+
+def legacy_should_add_points(message: str, required_count: int = HANZI_REQUIRED) -> bool:
+    """旧实现：逐个迭代正则匹配结果"""
+    actual_count = 0
+    if len(message) >= required_count:
+        for _ in _re_hanzi.finditer(message):
+            actual_count += 1
+            if actual_count >= required_count:
+                return True
+    return False
+
+
+def legacy_extract(message: Message) -> bool:
+    """旧的单个处理器：书库处理器与加分处理器各自扫描一次文本"""
+    text = message.text or message.caption or ""
+    _ = text.strip() == "书库"
+    return legacy_should_add_points(text)
+
+
+def features_extract(message: Message) -> bool:
+    """创建特征并查匹配表 (序号 2 为加分处理器)"""
+    return 2 in MATCH_TABLE.lookup(MessageFeatures.from_message(message))
+
+
+# dispatch：经过实际的群组消息派发器。旧流程的处理器匹配所有消息，由处理器自己读取并判断消息文本；
+# 新流程的处理器声明匹配规则，派发器只调用匹配的处理器 (不匹配的处理器不会创建任务)
+
+
+class _BenchHandler(GroupMsgHandlerMixin):
+    # noinspection PyMissingConstructor
+    def __init__(self):
+        """基准测试不需要机器人与数据库"""
+
+
+class LegacyAssoc(_BenchHandler):
+    async def handle_group_msg(self, update: Update, context, features: MessageFeatures):
+        message = update.message
+        _ = message.from_user.id, message.chat.id
+
+
+class LegacyBookRepo(_BenchHandler):
+    may_stop = True
+
+    async def handle_group_msg(self, update: Update, context, features: MessageFeatures):
+        if (update.message.text or "").strip() != "书库":
+            return None
+        return GroupMessageHandleResult.STOP
+
+
+class LegacyChatBoost(_BenchHandler):
+    async def handle_group_msg(self, update: Update, context, features: MessageFeatures):
+        message = update.message
+        if legacy_should_add_points(message.text or message.caption or ""):
+            pass
+
+
+class FeaturesAssoc(_BenchHandler):
+    async def handle_group_msg(self, update: Update, context, features: MessageFeatures):
+        _ = features.user_id, features.chat_id
+
+
+class FeaturesBookRepo(_BenchHandler):
+    may_stop = True
+
+    def match_rules(self):
+        return (ExactText("书库"),)
+
+    async def handle_group_msg(self, update: Update, context, features: MessageFeatures):
+        return GroupMessageHandleResult.STOP
+
+
+class FeaturesChatBoost(_BenchHandler):
+    def match_rules(self):
+        return (MinHanzi(HANZI_REQUIRED),)
+
+    async def handle_group_msg(self, update: Update, context, features: MessageFeatures):
+        pass
+
+
+def make_dispatcher(*handlers: GroupMsgHandlerMixin) -> GroupMsgDispatcher:
+    dispatcher = GroupMsgDispatcher()
+    for handler in handlers:
+        dispatcher.register(handler)
+    dispatcher.compile()
+    return dispatcher
+
+
+# 与 bot.py 的注册顺序相同：用户群组关联、书库、被动加分
+LEGACY_DISPATCHER = make_dispatcher(LegacyAssoc(), LegacyBookRepo(), LegacyChatBoost())
+FEATURES_DISPATCHER = make_dispatcher(FeaturesAssoc(), FeaturesBookRepo(), FeaturesChatBoost())
+
+
+def time_call(func: Callable[[], object], number: int) -> float:
+    """返回多次测量中最快一次的平均耗时 (微秒)"""
+    return min(timeit.repeat(func, number=number, repeat=REPEAT)) / number * 1e6
+
+
+def time_dispatch(dispatchers: tuple[GroupMsgDispatcher, ...], updates: list[Update], number: int) -> list[float]:
+    """
+    在事件循环中用各派发器连续派发 `number` 条更新，返回各自多次测量中最快一次的平均耗时 (微秒)。
+    各派发器交替测量，避免先后顺序 (如内存增长) 影响结果。
+    """
+
+    async def run(dispatcher: GroupMsgDispatcher) -> float:
+        it = cycle(updates)
+        started = time.perf_counter()
+        for _ in range(number):
+            await dispatcher.dispatch(next(it), None)
+        return time.perf_counter() - started
+
+    best = [float("inf")] * len(dispatchers)
+    for _ in range(REPEAT):
+        for i, dispatcher in enumerate(dispatchers):
+            best[i] = min(best[i], asyncio.run(run(dispatcher)))
+    return [elapsed / number * 1e6 for elapsed in best]
+
+
+def make_updates(text: str) -> list[Update]:
+    chat = Chat(-100, Chat.SUPERGROUP)
+    user = User(1, "test", False)
+    date = datetime.now()
+    return [
+        Update(update_id, message=Message(update_id, date, chat, from_user=user, text=text))
+        for update_id in range(UPDATE_COUNT)
+    ]
+
+
+def main(number: int = 100_000):
+    print(f"{'sample':<12}{'':<10}{'legacy (us)':>14}{'features (us)':>16}")
+    for name, text in SAMPLES.items():
+        updates = make_updates(text)
+        message = updates[0].message
+        assert legacy_extract(message) == features_extract(message)
+        legacy = time_call(lambda: legacy_extract(message), number)
+        features = time_call(lambda: features_extract(message), number)
+        print(f"{name:<12}{'extract':<10}{legacy:>14.3f}{features:>16.3f}")
+
+        # 派发包括事件循环的任务调度，比特征提取慢得多，减少次数
+        legacy, features = time_dispatch((LEGACY_DISPATCHER, FEATURES_DISPATCHER), updates, number // 10)
+        print(f"{'':<12}{'dispatch':<10}{legacy:>14.3f}{features:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+对各模型与指令的热点查询执行 EXPLAIN，检查是否使用了索引。需要本地数据库：
+
+    docker compose up -d db
+    python -m benchmarks.explain_queries
+    # 或使用配置文件中的数据库
+    python -m benchmarks.explain_queries -c config.yaml
+
+未指定配置文件时使用 docker-compose.yml 中的连接参数 (即 `DatabaseConfig` 的默认值)。
+执行前会先运行数据库迁移。全表扫描 (type=ALL) 与文件排序 (Using filesort) 会被标记，
+预期需要读取整张表的查询 (启动时的全量加载等) 除外。
+
+修改或新增查询时，请同步更新 `QUERIES`。
+"""
+
+import argparse
+import asyncio
+from typing import Any, NamedTuple
+
+from mashumaro.codecs.yaml import yaml_decode
+
+from shubot.config import Config, DatabaseConfig
+from shubot.database import DatabaseManager
+from shubot.migrations import MigrationRunner
+from shubot.model.leaderboard import NO_CULTIVATION
+
+UID = 10001
+GROUP_ID = -1001234567890
+DATE = "2025-01-01"
+
+
+class Query(NamedTuple):
+    name: str
+    sql: str
+    args: tuple[Any, ...] = ()
+    full_scan: bool = False
+    """是否预期读取整张表"""
+
+
+QUERIES = [
+    Query(
+        "Leaderboard._fetch_group",
+        f"""
+            SELECT ug.user_id, u.user_id IS NOT NULL, IFNULL(uc.stage, {NO_CULTIVATION}), IFNULL(u.points, 0)
+            FROM user_group ug
+                LEFT JOIN users u ON ug.user_id = u.user_id
+                LEFT JOIN user_cultivation uc ON ug.user_id = uc.user_id
+            WHERE ug.group_id = %s
+        """,
+        (GROUP_ID,),
+    ),
+    Query(
+        "Leaderboard.global_page (first)",
+        """
+            SELECT user_id, cultivation_stage, points
+            FROM users
+            WHERE cultivation_stage >= 0
+            ORDER BY cultivation_stage DESC, points DESC, user_id DESC
+            LIMIT 10
+        """,
+    ),
+    Query(
+        "Leaderboard.global_page (next)",
+        """
+            SELECT user_id, cultivation_stage, points
+            FROM users
+            WHERE cultivation_stage >= 0
+              AND (cultivation_stage < %s OR cultivation_stage = %s AND (points < %s OR points = %s AND user_id < %s))
+            ORDER BY cultivation_stage DESC, points DESC, user_id DESC
+            LIMIT 10
+        """,
+        (3, 3, 100, 100, UID),
+    ),
+    Query(
+        "Leaderboard._refresh_user",
+        f"""
+            SELECT IFNULL(uc.stage, {NO_CULTIVATION}), u.points
+            FROM users u
+                LEFT JOIN user_cultivation uc ON u.user_id = uc.user_id
+            WHERE u.user_id = %s
+        """,
+        (UID,),
+    ),
+    Query(
+        "User._fetch_states",
+        """
+            SELECT ids.user_id, u.points, uc.stage, uc.pills, uc.next_cost
+            FROM (SELECT %s AS user_id UNION ALL SELECT %s AS user_id) ids
+                LEFT JOIN users u ON ids.user_id = u.user_id
+                LEFT JOIN user_cultivation uc ON ids.user_id = uc.user_id
+        """,
+        (UID, UID + 1),
+    ),
+    Query(
+        "User._load_known_users",
+        "SELECT u.user_id FROM users u JOIN user_cultivation uc ON u.user_id = uc.user_id",
+        full_scan=True,
+    ),
+    Query(
+        "UserName._fetch_names",
+        "SELECT user_id, full_name, username FROM users WHERE user_id IN (%s, %s) AND full_name IS NOT NULL",
+        (UID, UID + 1),
+    ),
+    Query("UserGroup.init", "SELECT user_id, group_id FROM user_group", full_scan=True),
+    Query("GroupAuth._fetch_version", "SELECT COUNT(*), MAX(added_at) FROM authorized_groups", full_scan=True),
+    Query("GroupAuth.reload", "SELECT group_id FROM authorized_groups", full_scan=True),
+    Query("PendingDeletion.load_all", "SELECT chat_id, message_id, due_at FROM pending_deletions", full_scan=True),
+    Query(
+        "PendingDeletion.remove_many",
+        "DELETE FROM pending_deletions WHERE (chat_id, message_id) IN ((%s, %s), (%s, %s))",
+        (GROUP_ID, 1, GROUP_ID, 2),
+    ),
+    Query("Checkin._load_checkins", "SELECT user_id FROM users WHERE last_checkin = UTC_DATE()"),
+    Query(
+        "Cultivation._breakthrough",
+        """
+            SELECT uc.stage, uc.next_cost, uc.pills, u.points
+            FROM user_cultivation uc
+            JOIN users u ON u.user_id = uc.user_id
+            WHERE uc.user_id = %s
+        """,
+        (UID,),
+    ),
+    Query(
+        "Slave._load_contracts",
+        "SELECT master_id, slave_id, group_id, confirmed FROM slave_records WHERE created_date = %s",
+        (DATE,),
+    ),
+    Query("Slave._find_slave", "SELECT 1 FROM slave_records WHERE master_id = %s AND created_date = %s", (UID, DATE)),
+    Query(
+        "Slave._update_confirm_slavery",
+        "UPDATE slave_records SET confirmed = 1 WHERE slave_id = %s AND created_date = %s",
+        (UID, DATE),
+    ),
+    Query(
+        "Slave._find_slave_by_date",
+        """
+            SELECT master_id, confirmed
+            FROM slave_records
+            WHERE slave_id = %s AND group_id = %s and created_date = %s
+            ORDER BY created_date DESC
+            LIMIT 1
+        """,
+        (UID, GROUP_ID, DATE),
+    ),
+]
+
+
+async def explain(db: DatabaseManager, query: Query) -> list[str]:
+    """返回执行计划的每一行，需要注意的行以 `!` 开头"""
+    lines = []
+    async with db.get_cursor() as cursor:
+        await cursor.execute("EXPLAIN " + query.sql, query.args or None)
+        columns = [d[0] for d in cursor.description]
+        for row in await cursor.fetchall():
+            plan = dict(zip(columns, row))
+            extra = plan.get("Extra") or ""
+            bad = plan.get("type") == "ALL" or "filesort" in extra
+            flag = "!" if bad and not query.full_scan else " "
+            lines.append(
+                f"{flag} {plan.get('table')}: type={plan.get('type')} key={plan.get('key')} "
+                f"rows={plan.get('rows')} {extra}".rstrip()
+            )
+    return lines
+
+
+async def run(config: DatabaseConfig):
+    db = DatabaseManager.get_instance()
+    await db.open_pool(config)
+    try:
+        await MigrationRunner(db).migrate()
+        # pending_deletions 表由模型自己的 SQL 文件建立
+        await db.Schema.init()
+        await db.PendingDeletion.init()
+
+        warnings = 0
+        for query in QUERIES:
+            lines = await explain(db, query)
+            warnings += sum(1 for line in lines if line.startswith("!"))
+            print(f"[{query.name}]" + (" (全表读取)" if query.full_scan else ""))
+            print("\n".join(lines))
+        print(f"\n共 {len(QUERIES)} 条查询，{warnings} 处需要注意")
+    finally:
+        await db.close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--config", help="config file path (默认使用 docker-compose.yml 中的数据库)")
+    args = parser.parse_args()
+
+    config = DatabaseConfig()
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = yaml_decode(f.read(), Config).db
+    asyncio.run(run(config))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from abc import ABC, abstractmethod
+from contextlib import AbstractAsyncContextManager
+from typing import Any
+
+
+class DatabaseBackend(ABC):
+    """
+    数据库后端。
+
+    `DatabaseManager` 默认直接使用 MySQL / MariaDB 连接池；配置了其他后端时，
+    `find_one`、`find_many`、`update`、`call` 与 `transaction` 转交给后端实现。
+
+    查询语句使用 MySQL 语法与 `%s` 占位符，由后端负责转换。存储过程 (`call`) 由后端按名称实现。
+    """
+
+    dialect: str
+    """SQL 方言名称"""
+
+    @abstractmethod
+    async def open(self):
+        """打开数据库并建立表结构"""
+
+    @abstractmethod
+    async def close(self):
+        """关闭数据库"""
+
+    @abstractmethod
+    async def find_one(self, query: str, args: tuple[Any, ...] | None = None) -> Any:
+        pass
+
+    @abstractmethod
+    async def find_many(self, query: str, args: tuple[Any, ...] | None = None) -> list[tuple[Any, ...]]:
+        pass
+
+    @abstractmethod
+    async def update(self, query: str, args: tuple[Any, ...] | None = None) -> int:
+        """执行更新操作，返回受影响行数"""
+
+    @abstractmethod
+    async def call(self, procedure: str, *args: Any) -> tuple[int, tuple[Any, ...]]:
+        """调用存储过程，返回受影响行数和结果"""
+
+    @abstractmethod
+    def transaction(self) -> AbstractAsyncContextManager[None]:
+        """开启事务，正常退出时提交，发生异常时回滚。嵌套调用时加入外层事务。"""
+
+    @property
+    @abstractmethod
+    def in_transaction(self) -> bool:
+        pass
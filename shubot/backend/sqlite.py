@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+from functools import lru_cache
+from os import path
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from shubot.backend import DatabaseBackend
+from shubot.backend.sqlite_procedures import PROCEDURES
+from shubot.config import DatabaseConfig
+from shubot.metrics import metrics
+from shubot.query_stats import find_caller, fingerprint, query_stats
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("shubot.slow_query")
+
+T = TypeVar("T")
+
+_SCHEMA_PATH = path.join(path.dirname(__file__), "sqlite_schema.sql")
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(sep=" "))
+
+_re_insert_ignore = re.compile(r"\bINSERT\s+IGNORE\b", re.I)
+_re_on_duplicate = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_re_values_ref = re.compile(r"\bVALUES\((\w+)\)", re.I)
+_re_utc_date = re.compile(r"\bUTC_DATE\(\)", re.I)
+_re_utc_timestamp = re.compile(r"\bUTC_TIMESTAMP\(\)", re.I)
+_re_for_update = re.compile(r"\bFOR\s+UPDATE\b", re.I)
+
+
+@lru_cache(maxsize=512)
+def translate(query: str) -> tuple[tuple[str, int], ...]:
+    """
+    将本项目使用的 MySQL 语法转换为 SQLite 语法，并按分号拆分为多条语句。
+    返回每条语句及其占位符数量。只处理代码中实际用到的写法，不是通用的转换器。
+    """
+    sql = query.replace("%s", "?")
+    sql = _re_insert_ignore.sub("INSERT OR IGNORE", sql)
+    sql = _re_on_duplicate.sub("ON CONFLICT DO UPDATE SET", sql)
+    sql = _re_values_ref.sub(r"excluded.\1", sql)
+    sql = _re_utc_date.sub("date('now')", sql)
+    sql = _re_utc_timestamp.sub("datetime('now')", sql)
+    # 写入在单一连接上串行执行，无需行锁
+    sql = _re_for_update.sub("", sql)
+    statements = [s.strip() for s in sql.split(";")]
+    return tuple((s, s.count("?")) for s in statements if s)
+
+
+class _Transaction:
+    active: bool
+
+    def __init__(self):
+        self.active = True
+
+
+class SqliteBackend(DatabaseBackend):
+    """
+    SQLite 后端，适合小型部署，以及不依赖 MariaDB 的测试与基准测试。
+
+    - 使用 WAL 模式：读取在只读连接 (线程池) 上执行，不会阻塞写入；
+    - 所有写入在唯一的写入连接 (单线程) 上按顺序执行，每次写入是一个事务；
+    - `transaction` 期间独占写入连接，事务内的读取也在写入连接上执行，以读到自己的写入；
+    - 存储过程由 `sqlite_procedures` 中的 Python 函数实现，在写入连接上以一个事务执行。
+    """
+
+    dialect = "sqlite"
+
+    _config: DatabaseConfig
+    _db_path: str
+    _local: threading.local
+    """每个线程各自的连接"""
+    _writer: ThreadPoolExecutor | None
+    _readers: ThreadPoolExecutor | None
+    _write_lock: asyncio.Lock
+    """写入队列：按先后顺序独占写入连接"""
+    _current_tx: ContextVar[_Transaction | None]
+
+    def __init__(self, config: DatabaseConfig):
+        self._config = config
+        self._db_path = config.sqlite.path
+        self._local = threading.local()
+        self._writer = None
+        self._readers = None
+        self._write_lock = asyncio.Lock()
+        self._current_tx = ContextVar("sqlite_transaction", default=None)
+
+    def _connect(self, readonly: bool):
+        conn = sqlite3.connect(self._db_path, timeout=self._config.sqlite.busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        self._local.conn = conn
+
+    async def open(self):
+        self._writer = ThreadPoolExecutor(1, "sqlite-writer", initializer=self._connect, initargs=(False,))
+        # 内存数据库无法在多个连接间共享，读取也使用写入连接
+        if self._db_path != ":memory:" and self._config.sqlite.readers > 0:
+            self._readers = ThreadPoolExecutor(
+                self._config.sqlite.readers, "sqlite-reader", initializer=self._connect, initargs=(True,)
+            )
+
+        with open(_SCHEMA_PATH, "r", encoding="utf-8") as f:
+            schema = f.read()
+        await self._run(self._writer, lambda conn: conn.executescript(schema))
+        logger.info(f"SQLite 数据库已打开 ({self._db_path})")
+
+    async def close(self):
+        for executor in (self._readers, self._writer):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        self._readers = self._writer = None
+
+    async def _run(self, executor: ThreadPoolExecutor, func: Callable[[sqlite3.Connection], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(executor, lambda: func(self._local.conn))
+
+    async def _timed(self, query: str, executor: ThreadPoolExecutor, func: Callable[[sqlite3.Connection], T]) -> T:
+        """执行查询并记录耗时，与 MySQL 后端的计时游标相同"""
+        fp = fingerprint(query)
+        caller = find_caller()
+        started = time.perf_counter()
+        try:
+            return await self._run(executor, func)
+        finally:
+            elapsed = time.perf_counter() - started
+            query_stats.observe(fp, elapsed)
+            metrics.histogram("db.query").observe(elapsed)
+            if 0 <= self._config.slow_query_threshold <= elapsed:
+                metrics.inc("db.query.slow")
+                slow_query_logger.warning(f"慢查询 {elapsed * 1000:.0f}ms [{caller}]: {fp}")
+
+    def _active_tx(self) -> _Transaction | None:
+        tx = self._current_tx.get()
+        # 事务结束后，事务中创建的后台任务仍可能继承该上下文
+        return tx if tx is not None and tx.active else None
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._active_tx() is not None
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, query: str, args: tuple[Any, ...] | None) -> tuple[sqlite3.Cursor, int]:
+        """执行 (可能包含多条语句的) 查询，返回最后一条语句的游标与总的受影响行数"""
+        args = tuple(args or ())
+        cursor = None
+        rowcount = 0
+        offset = 0
+        for sql, n in translate(query):
+            cursor = conn.execute(sql, args[offset : offset + n])
+            offset += n
+            rowcount += max(cursor.rowcount, 0)
+        return cursor, rowcount
+
+    async def _read(self, query: str, func: Callable[[sqlite3.Connection], T]) -> T:
+        if self._readers is not None and self._active_tx() is None:
+            return await self._timed(query, self._readers, func)
+        return await self._write(query, func, atomic=False)
+
+    async def _write(self, query: str, func: Callable[[sqlite3.Connection], T], atomic: bool = True) -> T:
+        """
+        在写入连接上执行。处于事务中时直接执行 (事务已持有写入连接)，
+        否则排队等待写入连接；`atomic` 时包装为一个事务。
+        """
+        if self._active_tx() is not None:
+            return await self._timed(query, self._writer, func)
+
+        def run_atomic(conn: sqlite3.Connection) -> T:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+        async with self._write_lock:
+            return await self._timed(query, self._writer, run_atomic if atomic else func)
+
+    async def find_one(self, query: str, args: tuple[Any, ...] | None = None) -> Any:
+        return await self._read(query, lambda conn: self._execute(conn, query, args)[0].fetchone())
+
+    async def find_many(self, query: str, args: tuple[Any, ...] | None = None) -> list[tuple[Any, ...]]:
+        return await self._read(query, lambda conn: self._execute(conn, query, args)[0].fetchall())
+
+    async def update(self, query: str, args: tuple[Any, ...] | None = None) -> int:
+        return await self._write(query, lambda conn: self._execute(conn, query, args)[1])
+
+    async def call(self, procedure: str, *args: Any) -> tuple[int, tuple[Any, ...]]:
+        proc = PROCEDURES.get(procedure)
+        if proc is None:
+            raise NotImplementedError(f"SQLite 后端未实现存储过程 {procedure}")
+
+        def run(conn: sqlite3.Connection) -> tuple[int, tuple[Any, ...]]:
+            # 与存储过程的 EXIT HANDLER 相同：回滚并返回表示异常的结果
+            conn.execute("SAVEPOINT shubot_call")
+            try:
+                row = proc.func(conn, *args)
+            except sqlite3.Error as ex:
+                conn.execute("ROLLBACK TO shubot_call")
+                conn.execute("RELEASE shubot_call")
+                logger.error(f"存储过程 {procedure} 执行失败: {str(ex)}")
+                return 0, proc.on_error
+            conn.execute("RELEASE shubot_call")
+            return 1, row
+
+        return await self._write(f"CALL {procedure}()", run)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        if self._active_tx() is not None:
+            yield
+            return
+
+        async with self._write_lock:
+            await self._run(self._writer, lambda conn: conn.execute("BEGIN IMMEDIATE"))
+            tx = _Transaction()
+            token = self._current_tx.set(tx)
+            try:
+                yield
+            except BaseException:
+                tx.active = False
+                await self._run(self._writer, lambda conn: conn.execute("ROLLBACK"))
+                raise
+            else:
+                tx.active = False
+                await self._run(self._writer, lambda conn: conn.execute("COMMIT"))
+            finally:
+                self._current_tx.reset(token)
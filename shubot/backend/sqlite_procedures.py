@@ -0,0 +1,208 @@
+"""
+MySQL 存储过程 (`shubot_*`) 的 Python 实现，供 SQLite 后端使用。
+
+每个函数在写入连接上、已开启的事务中执行，参数与返回的结果行与对应的存储过程一致。
+函数抛出异常时事务回滚，并返回 `on_error` 中的结果行 (与存储过程的 EXIT HANDLER 相同)。
+"""
+
+import math
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Callable, NamedTuple
+
+
+class Procedure(NamedTuple):
+    func: Callable[..., tuple[Any, ...]]
+    on_error: tuple[Any, ...]
+    """发生异常时返回的结果行"""
+
+
+PROCEDURES: dict[str, Procedure] = {}
+
+
+def procedure(name: str, on_error: tuple[Any, ...]):
+    def decorator(func: Callable[..., tuple[Any, ...]]):
+        PROCEDURES[name] = Procedure(func, on_error)
+        return func
+
+    return decorator
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _utc_date() -> str:
+    return _utc_now().date().isoformat()
+
+
+def _fetch_one(conn: sqlite3.Connection, query: str, args: tuple[Any, ...]) -> tuple[Any, ...] | None:
+    return conn.execute(query, args).fetchone()
+
+
+@procedure("shubot_common_user_update_pts", on_error=(0, 0, 0))
+def common_user_update_pts(conn: sqlite3.Connection, uid: int, delta: int):
+    """用户积分更改"""
+    row = _fetch_one(conn, "SELECT points FROM users WHERE user_id = ?", (uid,))
+    if row is None:
+        # 目标不存在，建立用户。
+        new_pts = max(delta, 0)
+        conn.execute("INSERT INTO users (user_id, points) VALUES (?, ?)", (uid, new_pts))
+        return 1, 0, new_pts
+
+    old_pts = row[0] or 0
+    new_pts = max(old_pts + delta, 0)
+    conn.execute("UPDATE users SET points = ? WHERE user_id = ?", (new_pts, uid))
+    return 2, old_pts, new_pts
+
+
+@procedure("shubot_common_user_update_pills", on_error=(0, 0, 0))
+def common_user_update_pills(conn: sqlite3.Connection, uid: int, delta: int):
+    """修仙/药丸更改"""
+    row = _fetch_one(conn, "SELECT pills FROM user_cultivation WHERE user_id = ?", (uid,))
+    if row is None:
+        # 目标不存在，建立修仙档案。
+        new_pills = max(delta, 0)
+        conn.execute(
+            "INSERT INTO user_cultivation (user_id, pills, stage, next_cost) VALUES (?, ?, 0, 10)", (uid, new_pills)
+        )
+        return 1, 0, new_pills
+
+    old_pills = row[0] or 0
+    new_pills = max(old_pills + delta, 0)
+    conn.execute("UPDATE user_cultivation SET pills = ? WHERE user_id = ?", (new_pills, uid))
+    return 2, old_pills, new_pills
+
+
+@procedure("shubot_checkin", on_error=(0, 0))
+def checkin(conn: sqlite3.Connection, uid: int, username: str | None, full_name: str | None, points: int):
+    """每日签到 (按需建立积分帐号与修仙档案)"""
+    today = _utc_date()
+    conn.execute(
+        "INSERT OR IGNORE INTO users (user_id, username, full_name) VALUES (?, ?, ?)", (uid, username, full_name)
+    )
+    conn.execute(
+        "INSERT OR IGNORE INTO user_cultivation (user_id, pills, stage, next_cost) VALUES (?, 0, 0, 10)", (uid,)
+    )
+    updated = conn.execute(
+        """
+            UPDATE users
+            SET points = points + ?, last_checkin = ?
+            WHERE user_id = ? AND (last_checkin IS NULL OR last_checkin != ?)
+        """,
+        (points, today, uid, today),
+    ).rowcount
+    (new_pts,) = _fetch_one(conn, "SELECT points FROM users WHERE user_id = ?", (uid,))
+    # 1: 签到成功；-1: 今日已签到
+    return (1 if updated > 0 else -1), new_pts
+
+
+@procedure("shubot_lottery", on_error=(0, 0, 0, 0))
+def lottery(conn: sqlite3.Connection, uid: int, daily_limit: int, cost: int, prize: int):
+    """更新抽奖记录，并更新用户积分"""
+    today = _utc_date()
+    row = _fetch_one(
+        conn,
+        """
+            SELECT u.points, gr.date, gr.times_used
+            FROM users u
+                LEFT JOIN gua_records gr ON u.user_id = gr.user_id
+            WHERE u.user_id = ?
+            ORDER BY gr.date DESC
+            LIMIT 1
+        """,
+        (uid,),
+    )
+    user_pts, last_lottery, lottery_count = row if row is not None else (0, None, None)
+    user_pts = user_pts or 0
+    if last_lottery != today or lottery_count is None:
+        # 今日尚未未抽奖，重置次数
+        lottery_count = 0
+
+    if lottery_count >= daily_limit:
+        # 当日次数达到了上限
+        return -1, user_pts, 0, lottery_count
+    if user_pts < cost:
+        # 积分不足
+        return -2, user_pts, 0, lottery_count
+
+    # 成功，记录一次并扣除积分
+    lottery_count += 1
+    user_pts_new = user_pts - cost + prize
+    conn.execute(
+        """
+            INSERT INTO gua_records (user_id, times_used, date)
+            VALUES (?, ?, ?)
+            ON CONFLICT (user_id, date) DO UPDATE SET times_used = excluded.times_used
+        """,
+        (uid, lottery_count, today),
+    )
+    conn.execute("UPDATE users SET points = ? WHERE user_id = ?", (user_pts_new, uid))
+    return 1, user_pts, user_pts_new, lottery_count
+
+
+@procedure("shubot_rob_user", on_error=(0, 0))
+def rob_user(conn: sqlite3.Connection, uid: int, cooldown: int, daily_max: int):
+    """打劫用户：检查并记录打劫次数与冷却时间"""
+    now = _utc_now()
+    now_text = now.isoformat(sep=" ", timespec="seconds")
+    row = _fetch_one(conn, "SELECT count, last_rob FROM rob_records WHERE user_id = ?", (uid,))
+    if row is None:
+        # 未曾打劫过，成功。
+        conn.execute("INSERT INTO rob_records (user_id, count, last_rob) VALUES (?, 1, ?)", (uid, now_text))
+        return 1, 1
+
+    rob_count, rob_date = row
+    rob_date = datetime.fromisoformat(rob_date) if rob_date else None
+    if rob_date is None or rob_date.date() != now.date():
+        # 今日未打劫，成功。
+        conn.execute("UPDATE rob_records SET count = 1, last_rob = ? WHERE user_id = ?", (now_text, uid))
+        return 2, 1
+    if rob_count >= daily_max:
+        # 次数达到了上限
+        return -1, 0
+    if (now - rob_date).total_seconds() <= cooldown:
+        # 未冷却
+        return -2, 0
+
+    # 打劫一次，成功。
+    conn.execute("UPDATE rob_records SET count = ?, last_rob = ? WHERE user_id = ?", (rob_count + 1, now_text, uid))
+    return 3, rob_count + 1
+
+
+def _rob_get_user_pts(conn: sqlite3.Connection, uid: int) -> int:
+    """获取用户的积分，用户不存在时建立"""
+    row = _fetch_one(conn, "SELECT points FROM users WHERE user_id = ?", (uid,))
+    if row is None:
+        conn.execute("INSERT INTO users (user_id, points) VALUES (?, 0)", (uid,))
+        return 0
+    return row[0] or 0
+
+
+@procedure("shubot_rob_transfer", on_error=(0, 0, 0, 0))
+def rob_transfer(conn: sqlite3.Connection, victim_uid: int, robber_uid: int, rob_ratio: float):
+    """打劫转账"""
+    victim_pts = _rob_get_user_pts(conn, victim_uid)
+    robber_pts = _rob_get_user_pts(conn, robber_uid)
+    rob_pts = math.floor(rob_ratio * victim_pts)
+
+    if victim_pts == 0:
+        # 输家没钱
+        return -1, rob_pts, victim_pts, robber_pts
+    if rob_pts == 0:
+        # 比例太低，值太低了
+        return -2, rob_pts, victim_pts, robber_pts
+
+    victim_pts -= rob_pts
+    robber_pts += rob_pts
+    conn.execute("UPDATE users SET points = ? WHERE user_id = ?", (victim_pts, victim_uid))
+    conn.execute("UPDATE users SET points = ? WHERE user_id = ?", (robber_pts, robber_uid))
+    return 1, rob_pts, victim_pts, robber_pts
+
+
+@procedure("shubot_rob_reset_user", on_error=(0,))
+def rob_reset_user(conn: sqlite3.Connection, victim_uid: int):
+    """积分与修为归零 (下次访问自动生成白板号)"""
+    conn.execute("UPDATE users SET points = 0 WHERE user_id = ?", (victim_uid,))
+    conn.execute("DELETE FROM user_cultivation WHERE user_id = ?", (victim_uid,))
+    return (1,)
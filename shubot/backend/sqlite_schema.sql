@@ -0,0 +1,120 @@
+-- SQLite 后端的表结构，对应 MySQL 的迁移 (shubot/migrations) 与各模块的建表语句。
+-- 每次打开数据库时执行，语句需要可以重复执行。
+-- 外键不启用：MySQL 的 INSERT IGNORE 会忽略外键错误，而 SQLite 的 INSERT OR IGNORE 不会。
+
+CREATE TABLE IF NOT EXISTS users
+(
+    id                INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id           INTEGER NOT NULL UNIQUE,
+    username          TEXT,
+    points            INTEGER DEFAULT 0,
+    last_checkin      TEXT,
+    full_name         TEXT,
+    cultivation_stage INTEGER NOT NULL DEFAULT -1
+);
+
+CREATE TABLE IF NOT EXISTS authorized_groups
+(
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id   INTEGER NOT NULL UNIQUE,
+    group_name TEXT,
+    added_at   TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_group
+(
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id   INTEGER NOT NULL,
+    group_id  INTEGER NOT NULL,
+    joined_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, group_id)
+);
+
+CREATE TABLE IF NOT EXISTS files
+(
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    md5        TEXT    NOT NULL UNIQUE,
+    user_id    INTEGER NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS gua_records
+(
+    user_id    INTEGER NOT NULL,
+    date       TEXT    NOT NULL,
+    times_used INTEGER DEFAULT 0,
+    PRIMARY KEY (user_id, date)
+);
+
+CREATE TABLE IF NOT EXISTS user_cultivation
+(
+    user_id   INTEGER PRIMARY KEY,
+    stage     INTEGER DEFAULT 0,
+    pills     INTEGER DEFAULT 0,
+    next_cost INTEGER DEFAULT 10
+);
+
+CREATE TABLE IF NOT EXISTS rob_records
+(
+    user_id  INTEGER PRIMARY KEY,
+    last_rob TEXT,
+    count    INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS slave_records
+(
+    master_id    INTEGER NOT NULL,
+    slave_id     INTEGER NOT NULL,
+    group_id     INTEGER NOT NULL,
+    created_date TEXT    NOT NULL,
+    confirmed    INTEGER DEFAULT 0,
+    PRIMARY KEY (master_id, created_date)
+);
+
+CREATE TABLE IF NOT EXISTS pending_deletions
+(
+    chat_id    INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    due_at     REAL    NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+);
+
+-- 与 0003_query_indexes 相同的索引
+CREATE INDEX IF NOT EXISTS idx_user_group_group ON user_group (group_id, user_id);
+CREATE INDEX IF NOT EXISTS idx_users_last_checkin ON users (last_checkin, user_id);
+CREATE INDEX IF NOT EXISTS idx_slave_records_date ON slave_records (created_date);
+CREATE INDEX IF NOT EXISTS idx_slave_records_slave ON slave_records (slave_id, created_date, group_id);
+CREATE INDEX IF NOT EXISTS idx_authorized_groups_added_at ON authorized_groups (added_at);
+CREATE INDEX IF NOT EXISTS idx_users_global_rank ON users (cultivation_stage, points, user_id);
+
+-- 与 0004_global_rank_index 相同，users.cultivation_stage 与 user_cultivation 同步。
+-- 未启用外键时修仙档案可能先于用户建立，因此 users 上也需要触发器。
+CREATE TRIGGER IF NOT EXISTS trg_users_insert
+    AFTER INSERT
+    ON users
+BEGIN
+    UPDATE users
+    SET cultivation_stage = IFNULL((SELECT IFNULL(stage, 0) FROM user_cultivation WHERE user_id = NEW.user_id), -1)
+    WHERE user_id = NEW.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_user_cultivation_insert
+    AFTER INSERT
+    ON user_cultivation
+BEGIN
+    UPDATE users SET cultivation_stage = IFNULL(NEW.stage, 0) WHERE user_id = NEW.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_user_cultivation_update
+    AFTER UPDATE OF stage
+    ON user_cultivation
+BEGIN
+    UPDATE users SET cultivation_stage = IFNULL(NEW.stage, 0) WHERE user_id = NEW.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_user_cultivation_delete
+    AFTER DELETE
+    ON user_cultivation
+BEGIN
+    UPDATE users SET cultivation_stage = -1 WHERE user_id = OLD.user_id;
+END;
@@ -1,11 +1,10 @@
 import asyncio
 import logging
-from traceback import format_exception
 from typing import cast
 
 from telegram import Bot, BotCommandScopeAllPrivateChats, BotCommand, Update, Message
 from telegram.constants import ChatType
-from telegram.ext import Application, JobQueue, MessageHandler, filters, ContextTypes
+from telegram.ext import Application, JobQueue, MessageHandler, TypeHandler, filters, ContextTypes
 
 from shubot.command.checkin import CheckinCommand
 from shubot.command.cultivation import CultivationCommand
@@ -13,12 +12,16 @@ from shubot.command.group_auth import GroupAuthCommand
 from shubot.command.lottery import LotteryCommand
 from shubot.command.rob import RobCommand
 from shubot.command.slave import SlaveCommand
+from shubot.command.stats import StatsCommand
 from shubot.command.user_info import UserInfoCommand
 from shubot.command.welcome import WelcomeNewMemberCommand
 from shubot.config import Config
 from shubot.database import DatabaseManager
 from shubot.ext.bot_helper import BotHelperMixin
-from shubot.ext.group_msg_handler import GroupMsgHandlerMixin, GroupMessageHandleResult
+from shubot.ext.group_msg_dispatcher import GroupMsgDispatcher
+from shubot.ext.message_deleter import MessageDeletionScheduler
+from shubot.ext.rate_limiter import OutboundRateLimiter
+from shubot.ext.update_processor import ChatOrderedUpdateProcessor
 from shubot.group_msg.book_repo_info import BookRepoInfoHandler
 from shubot.group_msg.chat_boost import PassiveChatBoostHandler
 from shubot.group_msg.group_user_assoc import GroupUserAssocRegisterHandler
@@ -37,8 +40,10 @@ class ShuBot:
 
     _config: Config
     _app: Application
+    _update_processor: ChatOrderedUpdateProcessor
+    _message_deleter: MessageDeletionScheduler
     _command_handlers: list[BotHelperMixin] = []
-    _group_message_handlers: list[GroupMsgHandlerMixin] = []
+    _group_msg_dispatcher: GroupMsgDispatcher
 
     def __init__(self, config: Config):
         # Setup singleton
@@ -47,12 +52,26 @@ class ShuBot:
 
         self._config = config
 
+        # 不同群组的更新并发处理，同一群组内保持顺序
+        self._update_processor = ChatOrderedUpdateProcessor(
+            config.telegram.max_concurrent_updates, config.telegram.max_pending_updates
+        )
+
         builder = Application.builder()
         builder.token(config.telegram.token)
+        builder.concurrent_updates(self._update_processor)
+        builder.rate_limiter(OutboundRateLimiter(config.telegram.rate_limit))
         builder.post_init(self._on_post_init)
+        builder.post_shutdown(self._on_post_shutdown)
         self._app = builder.build()
 
         self._db = DatabaseManager.get_instance()
+        self._message_deleter = MessageDeletionScheduler(
+            self.get_bot, self._db, config.telegram.delete_tick, config.telegram.delete_persist_interval
+        )
+
+        # 记录所有更新中出现的用户名称，先于其他处理执行
+        self._app.add_handler(TypeHandler(Update, self._on_any_update), group=-1)
 
         # 指令处理
         self._command_handlers.append(SlaveCommand(self._app, config, self._db))
@@ -64,28 +83,45 @@ class ShuBot:
         self._command_handlers.append(CultivationCommand(self._app, config, self._db))
 
         self._command_handlers.append(GroupAuthCommand(self._app, config, self._db))
+        self._command_handlers.append(StatsCommand(self._app, config, self._db))
 
         # 群组信息处理
         self._app.add_handler(
             MessageHandler((filters.TEXT | filters.Document.ALL) & ~filters.COMMAND, self._on_group_message)
         )
-        self._group_message_handlers.append(GroupUserAssocRegisterHandler(self._app, config, self._db))
-        self._group_message_handlers.append(BookRepoInfoHandler(self._app, config, self._db))
-        self._group_message_handlers.append(PassiveChatBoostHandler(self._app, config, self._db))
+        self._group_msg_dispatcher = GroupMsgDispatcher()
+        self._group_msg_dispatcher.register(GroupUserAssocRegisterHandler(self._app, config, self._db))
+        self._group_msg_dispatcher.register(BookRepoInfoHandler(self._app, config, self._db))
+        self._group_msg_dispatcher.register(PassiveChatBoostHandler(self._app, config, self._db))
+        self._group_msg_dispatcher.compile()
+
+    async def _on_any_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        names = self._db.UserName
+        names.observe(update.effective_user)
+        message = update.effective_message
+        if message and message.reply_to_message:
+            names.observe(message.reply_to_message.from_user)
 
     async def _on_post_init(self, app: Application):
         logger.info("init db...")
         await DatabaseManager.get_instance().init_pool(self._config.db)
         await asyncio.gather(
             *(handler.init_db() for handler in self._command_handlers),
-            *(handler.init_db() for handler in self._group_message_handlers),
+            *(handler.init_db() for handler in self._group_msg_dispatcher.handlers),
         )
 
+        await self._message_deleter.start()
+
         logger.info("init bot startup...")
         await self._set_commands()
         await self._check_bot_username()
         logger.info("post init done")
 
+    async def _on_post_shutdown(self, app: Application):
+        await self._message_deleter.stop()
+        logger.info("closing db...")
+        await self._db.close()
+
     def run(self):
         logger.info("Bot polling")
         self._app.run_polling()
@@ -97,6 +133,12 @@ class ShuBot:
     def get_job_queue(self) -> JobQueue:
         return self._app.job_queue
 
+    def get_update_processor(self) -> ChatOrderedUpdateProcessor:
+        return self._update_processor
+
+    def get_message_deleter(self) -> MessageDeletionScheduler:
+        return self._message_deleter
+
     async def _set_commands(self):
         await self.get_bot().set_my_commands(
             commands=[
@@ -106,6 +148,7 @@ class ShuBot:
                 BotCommand("checkin", "每日签到获取积分"),
                 BotCommand("add", "管理员增加积分（回复消息使用）"),
                 BotCommand("del", "管理员扣除积分（回复消息使用）"),
+                BotCommand("stats", "管理员查看运行状态指标"),
             ],
             scope=BotCommandScopeAllPrivateChats(),
         )
@@ -128,19 +171,12 @@ class ShuBot:
             return
 
         group_id = message.chat.id
-        if not await self._db.GroupAuth.is_group_authorized(group_id):
+        if not self._db.GroupAuth.is_group_authorized(group_id):
             # 未授权的群组，忽略
             logger.warning(
                 f"未授权的群组: {group_id} " f"(user={message.from_user.id}, username={message.from_user.username})"
             )
             return
 
-        # 按照注册顺序处理
-        try:
-            for handler in self._group_message_handlers:
-                handler_result = await handler.handle_group_msg(update, context)
-                if handler_result == GroupMessageHandleResult.STOP:
-                    # 提前退出
-                    break
-        except Exception as ex:
-            logger.error(f"处理群组消息出现异常: {str(ex)}\n{'\n'.join(format_exception(ex))}")
+        # 按照声明的依赖关系分阶段处理，互不依赖的处理器并发执行
+        await self._group_msg_dispatcher.dispatch(update, context)
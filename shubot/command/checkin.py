@@ -1,3 +1,7 @@
+import enum
+import logging
+from datetime import UTC, date as Date, time
+from os import path
 from textwrap import dedent
 
 from telegram import Update, User
@@ -7,17 +11,63 @@ from telegram.ext.filters import ChatType
 from shubot.config import Config
 from shubot.database import DatabaseManager
 from shubot.ext.bot_helper import BotHelperMixin
+from shubot.metrics import metrics
 from shubot.util import reply, defer_delete
 
+logger = logging.getLogger(__name__)
+
 CHECKIN_STAR_PATTERN = "⭐" * 5 + "✨" * 5
 
 
+class CheckinResult(enum.IntEnum):
+    """签到存储过程的结果"""
+
+    EXCEPTION = 0
+    """发生异常"""
+    SUCCESS = 1
+    """签到成功"""
+    ALREADY_CHECKED_IN = -1
+    """今日已签到"""
+
+
 class CheckinCommand(BotHelperMixin):
+    _checked_in: set[int]
+    """当日已签到的用户 ID"""
+    _checked_in_date: Date | None
+    """`_checked_in` 对应的日期 (UTC)"""
+
     def __init__(self, app: Application, config: Config, db: DatabaseManager | None = None):
         super().__init__(app, config, db)
+        self._checked_in = set()
+        self._checked_in_date = None
 
         self._app.add_handler(CommandHandler("checkin", self._handle_checkin, filters=ChatType.GROUPS))
 
+    async def init_db(self):
+        await self._db.Schema.install(path.join(path.dirname(__file__), "checkin_init.sql"))
+
+        await self._load_checkins()
+        # 每日 UTC 零点清空已签到列表
+        self._app.job_queue.run_daily(self._on_new_day, time=time(0, 0, tzinfo=UTC))
+
+    async def _on_new_day(self, context: ContextTypes.DEFAULT_TYPE):
+        self._today_checkins()
+
+    async def _load_checkins(self):
+        """从数据库加载今日已签到的用户"""
+        rows = await self._db.find_many("SELECT user_id FROM users WHERE last_checkin = UTC_DATE()")
+        self._checked_in_date = self.get_today()
+        self._checked_in = {user_id for (user_id,) in rows}
+        logger.info(f"今日已有 {len(self._checked_in)} 位用户签到")
+
+    def _today_checkins(self) -> set[int]:
+        """获取今日已签到的用户集合，跨日后自动清空"""
+        today = self.get_today()
+        if self._checked_in_date != today:
+            self._checked_in = set()
+            self._checked_in_date = today
+        return self._checked_in
+
     async def _handle_checkin(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """每日签到"""
         user = update.effective_user
@@ -45,19 +95,22 @@ class CheckinCommand(BotHelperMixin):
                 """
             )
         reply_msg = await reply(message, reply_text)
-        defer_delete(context.job_queue, reply_msg, 10)
+        defer_delete(reply_msg, 10)
 
     async def _set_checkin(self, user: User, points: int) -> bool:
-        await self._db.User.ensure_exists(user)
-
-        updated = await self._db.update(
-            """
-                UPDATE users
-                SET points       = points + %s,
-                    last_checkin = UTC_DATE()
-                WHERE user_id = %s
-                  AND (last_checkin IS NULL OR last_checkin != UTC_DATE());
-            """,
-            (points, user.id),
-        )
-        return updated > 0
+        checked_in = self._today_checkins()
+        if user.id in checked_in:
+            # 今日已签到，无需访问数据库
+            metrics.inc("checkin.cached")
+            return False
+
+        _, (status, new_points) = await self._db.call("shubot_checkin", user.id, user.username, user.full_name, points)
+        if status == CheckinResult.EXCEPTION:
+            raise RuntimeError("签到失败 (SQL Exception)")
+
+        checked_in.add(user.id)
+        self._db.User.mark_exists(user.id)
+        self._db.User.invalidate(user.id)
+        self._db.Leaderboard.ensure_cultivation(user.id)
+        self._db.Leaderboard.set_score(user.id, points=new_points)
+        return status == CheckinResult.SUCCESS
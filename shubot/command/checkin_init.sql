@@ -0,0 +1,44 @@
+CREATE OR REPLACE PROCEDURE shubot_checkin(IN p_uid INT8, IN p_username VARCHAR(255), IN p_full_name VARCHAR(255), IN p_points INT)
+    -- 每日签到 (按需建立积分帐号与修仙档案)
+    -- p_uid: 用户ID
+    -- p_username: 用户名
+    -- p_full_name: 显示名称
+    -- p_points: 签到获得的积分
+BEGIN
+    DECLARE updated INT DEFAULT 0;
+    DECLARE new_pts INT8 DEFAULT 0;
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN
+        ROLLBACK;
+        -- 返回 0 代表发生了异常
+        SELECT 0, 0;
+    END;
+
+    START TRANSACTION;
+
+    INSERT IGNORE INTO users (user_id, username, full_name)
+    VALUES (p_uid, p_username, p_full_name);
+    INSERT IGNORE INTO user_cultivation (user_id, pills, stage, next_cost)
+    VALUES (p_uid, 0, 0, 10);
+
+    UPDATE users
+    SET points       = points + p_points,
+        last_checkin = UTC_DATE()
+    WHERE user_id = p_uid
+      AND (last_checkin IS NULL OR last_checkin != UTC_DATE());
+    SET updated = ROW_COUNT();
+
+    SELECT points
+    INTO new_pts
+    FROM users
+    WHERE user_id = p_uid;
+
+    IF updated > 0 THEN
+        -- 签到成功
+        SELECT 1, new_pts;
+    ELSE
+        -- 今日已签到
+        SELECT -1, new_pts;
+    END IF;
+    COMMIT;
+END;
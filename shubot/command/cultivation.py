@@ -3,7 +3,6 @@ import logging
 from functools import lru_cache
 from typing import cast
 
-import aiomysql
 from telegram import Update, User
 from telegram.constants import ParseMode
 from telegram.ext import Application, CommandHandler, ContextTypes
@@ -44,10 +43,14 @@ class CultivationCommand(BotHelperMixin, CultivationHelperMixin):
         user = update.effective_user
         message = update.message
 
-        await self._db.User.ensure_exists(user)
+        # 会话只包括数据库操作，回复消息前归还连接
+        async with self._db.session():
+            await self._db.User.ensure_exists(user)
+            await self._db.User.flush_pending_points(user.id)
+            result = await self._breakthrough(user, self._rnd.random())
 
         msgs = self._config.cultivation.messages
-        match await self._breakthrough(user, self._rnd.random()):
+        match result:
             case (BreakThoughStatus.ACCOUNT_MISSING,):
                 return await self.reply(message, msgs.account_missing)
 
@@ -89,51 +92,50 @@ class CultivationCommand(BotHelperMixin, CultivationHelperMixin):
 
     async def _breakthrough(self, user: User, chance_value: float) -> tuple[int, ...]:
         """进行一次突破"""
-        async with self._db.acquire() as conn:  # type: aiomysql.Connection
-            async with conn.cursor() as cursor:  # type: aiomysql.Cursor
-                await cursor.execute(
-                    """
+        # 显式事务，使 SELECT ... FOR UPDATE 的行锁持续到更新完成
+        async with self._db.transaction():
+            initial_fetch = await self._db.find_one(
+                """
                     SELECT uc.stage, uc.next_cost, uc.pills, u.points
                     FROM user_cultivation uc
                     JOIN users u ON u.user_id = uc.user_id
                     WHERE uc.user_id = %s
                     FOR UPDATE
                 """,
-                    (user.id,),
-                )
-
-                initial_fetch = cast(tuple[int, int, int, int], await cursor.fetchone())
-                if not initial_fetch:
-                    return (BreakThoughStatus.ACCOUNT_MISSING,)
-
-                stage, cost, pills, points = initial_fetch
-                is_major = stage in self.major_levels
-                pill_cost = self._config.cultivation.major_pill_cost if is_major else 0
-
-                if stage >= self.max_cult_stage:
-                    return BreakThoughStatus.LEVEL_TOO_HIGH, stage
-                if is_major and pills < pill_cost:
-                    return BreakThoughStatus.INSUFFICIENT_PILLS, pill_cost, pills
-                if points < cost:
-                    return BreakThoughStatus.INSUFFICIENT_POINTS, is_major, stage, cost, points
-
-                chance = self._get_breakthrough_chance(stage)
-                success = chance_value <= chance
-
-                pt_cost = int(cost * 0.3) if not success else cost
-                stage_delta = 1 if success else 0
-                next_cost = int(cost * (2 if is_major else 1.5)) if success else cost
-                await cursor.execute(
-                    """
-                        UPDATE user_cultivation uc
-                        JOIN users u ON u.user_id = uc.user_id
-                        SET u.points = u.points - %s,
-                            uc.stage = uc.stage + %s, uc.pills = uc.pills - %s, uc.next_cost = %s
-                        WHERE uc.user_id = %s;
-                    """,
-                    (pt_cost, stage_delta, pill_cost, next_cost, user.id),
-                )
-                await conn.commit()
+                (user.id,),
+            )
+            if not initial_fetch:
+                return (BreakThoughStatus.ACCOUNT_MISSING,)
+
+            stage, cost, pills, points = cast(tuple[int, int, int, int], initial_fetch)
+            is_major = stage in self.major_levels
+            pill_cost = self._config.cultivation.major_pill_cost if is_major else 0
+
+            if stage >= self.max_cult_stage:
+                return BreakThoughStatus.LEVEL_TOO_HIGH, stage
+            if is_major and pills < pill_cost:
+                return BreakThoughStatus.INSUFFICIENT_PILLS, pill_cost, pills
+            if points < cost:
+                return BreakThoughStatus.INSUFFICIENT_POINTS, is_major, stage, cost, points
+
+            chance = self._get_breakthrough_chance(stage)
+            success = chance_value <= chance
+
+            pt_cost = int(cost * 0.3) if not success else cost
+            stage_delta = 1 if success else 0
+            next_cost = int(cost * (2 if is_major else 1.5)) if success else cost
+            # 分为两条语句 (而非 UPDATE ... JOIN)，以便在 SQLite 后端上执行
+            await self._db.update("UPDATE users SET points = points - %s WHERE user_id = %s", (pt_cost, user.id))
+            await self._db.update(
+                """
+                    UPDATE user_cultivation
+                    SET stage = stage + %s, pills = pills - %s, next_cost = %s
+                    WHERE user_id = %s
+                """,
+                (stage_delta, pill_cost, next_cost, user.id),
+            )
+        self._db.User.invalidate(user.id)
+        self._db.Leaderboard.set_score(user.id, stage=stage + stage_delta, points=points - pt_cost)
         return BreakThoughStatus.OK, success, is_major, stage, stage_delta, pill_cost, pt_cost, next_cost
 
     @lru_cache
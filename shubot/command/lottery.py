@@ -3,13 +3,12 @@ import logging
 from os import path
 from typing import cast
 
-import aiomysql
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Message
 from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler
 from telegram.ext.filters import ChatType
 
 from shubot.config import Config
-from shubot.database import DatabaseManager
+from shubot.database import DatabaseManager, unit_of_work
 from shubot.ext.bot_helper import BotHelperMixin
 
 logger = logging.getLogger(__name__)
@@ -38,9 +37,7 @@ class LotteryCommand(BotHelperMixin):
         self._app.add_handler(CallbackQueryHandler(self._handle_lottery_entry, pattern=r"^lottery_"))
 
     async def init_db(self):
-        init_sql = path.join(path.dirname(__file__), "lottery_init.sql")
-        with open(init_sql, "r", encoding="utf-8") as f:
-            await self._db.update(f.read())
+        await self._db.Schema.install(path.join(path.dirname(__file__), "lottery_init.sql"))
 
     async def _handle_lottery(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """响应 /gua 命令，刮刮乐透"""
@@ -103,12 +100,13 @@ class LotteryCommand(BotHelperMixin):
         )
         await query.edit_message_text(finish_message_text)
 
+    @unit_of_work
     async def _do_lottery_update(self, uid: int, cost: int, prize: int) -> tuple[LotteryUpdateStatus, int, int, int]:
-        async with self._db.acquire() as conn:
-            async with conn.cursor() as cursor:  # type: aiomysql.Cursor
-                await cursor.execute(
-                    "CALL shubot_lottery(%s, %s, %s, %s)",
-                    (uid, self._config.lottery.daily_limit, cost, prize),
-                )
-                result_code, old_balance, new_balance, daily_count = await cursor.fetchone()
-                return LotteryUpdateStatus(result_code), old_balance, new_balance, daily_count
+        await self._db.User.flush_pending_points(uid)
+        _, (result_code, old_balance, new_balance, daily_count) = await self._db.call(
+            "shubot_lottery", uid, self._config.lottery.daily_limit, cost, prize
+        )
+        self._db.User.invalidate(uid)
+        if result_code == LotteryUpdateStatus.SUCCESS:
+            self._db.Leaderboard.set_score(uid, points=new_balance)
+        return LotteryUpdateStatus(result_code), old_balance, new_balance, daily_count
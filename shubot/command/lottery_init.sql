@@ -1,5 +1,4 @@
-DROP PROCEDURE IF EXISTS shubot_lottery;
-CREATE PROCEDURE shubot_lottery(IN p_uid INT8, IN daily_limit INT, IN cost INT, IN prize INT)
+CREATE OR REPLACE PROCEDURE shubot_lottery(IN p_uid INT8, IN daily_limit INT, IN cost INT, IN prize INT)
     -- 更新抽奖记录，并更新用户积分
     -- p_uid: 用户ID
     -- daily_limit: 每日抽奖次数限制
@@ -7,15 +7,15 @@ from math import copysign
 from os import path
 from typing import cast
 
-import aiomysql
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton, Message
 from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler
 from telegram.ext.filters import ChatType
 
 from shubot.config import Config
-from shubot.database import DatabaseManager
+from shubot.database import DatabaseManager, unit_of_work
 from shubot.ext.bot_helper import BotHelperMixin
 from shubot.ext.cult_helper import CultivationHelperMixin
+from shubot.model.leaderboard import NO_CULTIVATION
 from shubot.util import reply as del_and_reply, defer_delete
 
 logger = logging.getLogger(__name__)
@@ -70,9 +70,7 @@ class RobCommand(BotHelperMixin, CultivationHelperMixin):
         self._app.add_handler(CallbackQueryHandler(self._handle_rob_action, pattern=r"^rob_"))
 
     async def init_db(self):
-        init_sql = path.join(path.dirname(__file__), "rob_init.sql")
-        with open(init_sql, "r", encoding="utf-8") as f:
-            await self._db.update(f.read())
+        await self._db.Schema.install(path.join(path.dirname(__file__), "rob_init.sql"))
 
     async def _handle_rob(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         # 打劫
@@ -81,7 +79,7 @@ class RobCommand(BotHelperMixin, CultivationHelperMixin):
 
         if not reply_to or reply_to.from_user.is_bot:
             reply = await del_and_reply(message, "🦹 请对目标修士的消息回复使用此命令")
-            return defer_delete(context.job_queue, reply, 10)
+            return defer_delete(reply, 10)
 
         robber_user = message.from_user
         victim_user = reply_to.from_user
@@ -106,10 +104,7 @@ class RobCommand(BotHelperMixin, CultivationHelperMixin):
                 )
 
         # 获取境界
-        [victim_cult, robber_cult] = await asyncio.gather(
-            self._db.User.get_cultivation_data(victim_user.id),
-            self._db.User.get_cultivation_data(robber_user.id),
-        )
+        [victim_cult, robber_cult] = await self._db.User.get_states([victim_user.id, robber_user.id])
 
         # 检查境界
         major_stage_delta = robber_cult.major_stage - victim_cult.major_stage
@@ -170,8 +165,8 @@ class RobCommand(BotHelperMixin, CultivationHelperMixin):
         winner_id, loser_id = int(winner_id), int(loser_id)
 
         if query.from_user.id != loser_id:
-            loser_user = await context.bot.get_chat(loser_id)
-            return await query.answer(f"🚫 只有 {loser_user.full_name} 可以操作！", show_alert=True)
+            loser_name = await self.get_user_name(loser_id)
+            return await query.answer(f"🚫 只有 {loser_name} 可以操作！", show_alert=True)
 
         await query.answer()
         match action:
@@ -189,12 +184,12 @@ class RobCommand(BotHelperMixin, CultivationHelperMixin):
         """打劫输家选择「破财消灾」"""
         query = update.callback_query
         steal_ratio = self._rnd.uniform(*self._config.rob.penalty_ratio.to_tuple())
-        (loser, (transfer_status, rob_amount, loser_pts, winner_pts)) = await asyncio.gather(
-            context.bot.get_chat(loser_id),
+        (loser_name, (transfer_status, rob_amount, loser_pts, winner_pts)) = await asyncio.gather(
+            self.get_user_name(loser_id),
             self._rob_transfer(loser_id, winner_id, steal_ratio),
         )
 
-        tpl_vars = dict(loser=loser.full_name, rob_amount=rob_amount, winner_pts=winner_pts, loser_pts=loser_pts)
+        tpl_vars = dict(loser=loser_name, rob_amount=rob_amount, winner_pts=winner_pts, loser_pts=loser_pts)
 
         match transfer_status:
             case RobTransferResult.LOSER_NO_MONEY | RobTransferResult.STOLEN_ZERO:
@@ -216,10 +211,10 @@ class RobCommand(BotHelperMixin, CultivationHelperMixin):
         message = cast(Message, query.message)
 
         # 摇点
-        ((winner_dice_message, winner_roll), (loser_dice_message, loser_roll), loser) = await asyncio.gather(
+        ((winner_dice_message, winner_roll), (loser_dice_message, loser_roll), loser_name) = await asyncio.gather(
             self.dice_roll(message.chat_id),
             self.dice_roll(message.chat_id),
-            context.bot.get_chat(loser_id),
+            self.get_user_name(loser_id),
         )
         self.delete(winner_dice_message, 5)
         self.delete(loser_dice_message, 5)
@@ -234,37 +229,41 @@ class RobCommand(BotHelperMixin, CultivationHelperMixin):
 
         sql_ok, _ = await asyncio.gather(
             reset_user_cond,
-            query.edit_message_text(template.format(loser=loser.full_name)),
+            query.edit_message_text(template.format(loser=loser_name)),
         )
 
         if not sql_ok:
             await query.edit_message_text("🚫 未知错误，请联系管理员 (SQL Exception)")
 
     async def _try_rob(self, uid: int) -> tuple[RobResult, int]:
-        async with self._db.acquire() as conn:
-            async with conn.cursor() as cursor:  # type: aiomysql.Cursor
-                await cursor.execute(
-                    "CALL shubot_rob_user(%s, %s, %s)",
-                    (uid, self._config.rob.cooldown, self._config.rob.daily_limit),
-                )
-                result_code, new_rob_count = await cursor.fetchone()
-                return RobResult(result_code), new_rob_count
+        _, (result_code, new_rob_count) = await self._db.call(
+            "shubot_rob_user", uid, self._config.rob.cooldown, self._config.rob.daily_limit
+        )
+        return RobResult(result_code), new_rob_count
 
+    @unit_of_work
     async def _rob_transfer(
         self, loser_id: int, winner_id: int, steal_ratio: float
     ) -> tuple[RobTransferResult, int, int, int]:
-        async with self._db.acquire() as conn:
-            async with conn.cursor() as cursor:  # type: aiomysql.Cursor
-                await cursor.execute(
-                    "CALL shubot_rob_transfer(%s, %s, %s)",
-                    (loser_id, winner_id, steal_ratio),
-                )
-                result_code, rob_amount, loser_pts, winner_pts = await cursor.fetchone()
-                return RobTransferResult(result_code), rob_amount, loser_pts, winner_pts
+        await asyncio.gather(
+            self._db.User.flush_pending_points(loser_id),
+            self._db.User.flush_pending_points(winner_id),
+        )
+        _, (result_code, rob_amount, loser_pts, winner_pts) = await self._db.call(
+            "shubot_rob_transfer", loser_id, winner_id, steal_ratio
+        )
+        self._db.User.invalidate_many((loser_id, winner_id))
+        if result_code == RobTransferResult.SUCCESS:
+            self._db.Leaderboard.set_score(loser_id, points=loser_pts)
+            self._db.Leaderboard.set_score(winner_id, points=winner_pts)
+        return RobTransferResult(result_code), rob_amount, loser_pts, winner_pts
 
+    @unit_of_work
     async def _rob_reset_user(self, loser_id: int) -> bool:
-        async with self._db.acquire() as conn:
-            async with conn.cursor() as cursor:  # type: aiomysql.Cursor
-                await cursor.execute("CALL shubot_rob_reset_user(%s)", (loser_id,))
-                (result_code,) = await cursor.fetchone()
-                return result_code == 1
+        await self._db.User.flush_pending_points(loser_id)
+        _, (result_code,) = await self._db.call("shubot_rob_reset_user", loser_id)
+        self._db.User.invalidate(loser_id)
+        if result_code == 1:
+            self._db.User.mark_missing(loser_id)
+            self._db.Leaderboard.set_score(loser_id, stage=NO_CULTIVATION, points=0)
+        return result_code == 1
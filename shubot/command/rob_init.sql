@@ -1,5 +1,4 @@
-DROP PROCEDURE IF EXISTS shubot_rob_user;
-CREATE PROCEDURE shubot_rob_user(IN p_uid INT8, IN p_cooldown INT, IN p_daily_max INT)
+CREATE OR REPLACE PROCEDURE shubot_rob_user(IN p_uid INT8, IN p_cooldown INT, IN p_daily_max INT)
     -- 打劫用户
     -- p_uid: 打劫人 ID
     -- p_cooldown: 冷却时间 (秒)
@@ -55,8 +54,7 @@ BEGIN
     COMMIT;
 END;
 
-DROP PROCEDURE IF EXISTS shubot_rob_get_user_pts;
-CREATE PROCEDURE shubot_rob_get_user_pts(IN p_uid INT8, OUT pts INT)
+CREATE OR REPLACE PROCEDURE shubot_rob_get_user_pts(IN p_uid INT8, OUT pts INT)
     -- 获取用户的积分
     -- p_uid: 用户ID
 BEGIN
@@ -77,8 +75,7 @@ BEGIN
     END IF;
 END;
 
-DROP PROCEDURE IF EXISTS shubot_rob_transfer;
-CREATE PROCEDURE shubot_rob_transfer(IN p_victim_uid INT8, IN p_robber_uid INT8, IN p_rob_ratio FLOAT)
+CREATE OR REPLACE PROCEDURE shubot_rob_transfer(IN p_victim_uid INT8, IN p_robber_uid INT8, IN p_rob_ratio FLOAT)
     -- 打劫用户
     -- p_victim_uid: 被盗用户
     -- p_robber_uid: 抢劫用户
@@ -126,8 +123,7 @@ BEGIN
     COMMIT;
 END;
 
-DROP PROCEDURE IF EXISTS shubot_rob_reset_user;
-CREATE PROCEDURE shubot_rob_reset_user(IN p_victim_uid INT8)
+CREATE OR REPLACE PROCEDURE shubot_rob_reset_user(IN p_victim_uid INT8)
     -- 打劫用户
     -- p_victim_uid: 被盗用户
     -- p_robber_uid: 抢劫用户
@@ -1,5 +1,6 @@
+import logging
 from dataclasses import dataclass
-from datetime import datetime, UTC
+from datetime import datetime, UTC, date as Date, time
 from textwrap import dedent
 from typing import Optional, cast
 
@@ -17,8 +18,11 @@ from telegram.helpers import escape_markdown
 from shubot.config import Config
 from shubot.database import DatabaseManager
 from shubot.ext.bot_helper import BotHelperMixin
+from shubot.ext.rate_limiter import SendPriority
 from shubot.util import defer_delete, reply
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class CelebrateJobData:
@@ -28,10 +32,20 @@ class CelebrateJobData:
 
 async def _celebrate(ctx: ContextTypes.DEFAULT_TYPE):
     payload = cast(CelebrateJobData, ctx.job.data)
-    await payload.chat.send_message(text=payload.text, parse_mode="MarkdownV2")
+    # 庆祝消息仅为装饰，让位于其他消息发送
+    await ctx.bot.send_message(
+        chat_id=payload.chat.id, text=payload.text, parse_mode="MarkdownV2", rate_limit_args=SendPriority.COSMETIC
+    )
 
 
 class SlaveCommand(BotHelperMixin):
+    _contracts: dict[tuple[int, int], tuple[int, bool]]
+    """当日契约索引：(奴隶 ID, 群组 ID) -> (主人 ID, 是否已确认)"""
+    _masters: set[int]
+    """当日已选定奴隶的主人 ID"""
+    _contracts_date: Date | None
+    """契约索引对应的日期 (UTC)"""
+
     def __init__(
         self,
         app: Application,
@@ -39,6 +53,9 @@ class SlaveCommand(BotHelperMixin):
         db: DatabaseManager | None = None,
     ):
         super().__init__(app, config, db)
+        self._contracts = {}
+        self._masters = set()
+        self._contracts_date = None
 
         self._app.add_handler(CommandHandler("nuli", self._handle_assign_slave, filters=ChatType.GROUPS))
         self._app.add_handler(
@@ -50,6 +67,44 @@ class SlaveCommand(BotHelperMixin):
             group=2,
         )
 
+    async def init_db(self):
+        await self._load_contracts(self.get_today())
+        # 每日 UTC 零点切换到新一天的契约索引
+        self._app.job_queue.run_daily(self._on_new_day, time=time(0, 0, tzinfo=UTC))
+
+    async def _on_new_day(self, context: ContextTypes.DEFAULT_TYPE):
+        await self._load_contracts(self.get_today())
+
+    async def _load_contracts(self, date: Date):
+        """从数据库加载指定日期的全部契约到内存索引"""
+        rows = await self._db.find_many(
+            """
+            SELECT master_id, slave_id, group_id, confirmed
+            FROM slave_records
+            WHERE created_date = %s
+        """,
+            (date,),
+        )
+        self._contracts = {
+            (slave_id, group_id): (master_id, bool(confirmed)) for master_id, slave_id, group_id, confirmed in rows
+        }
+        self._masters = {master_id for master_id, _, _, _ in rows}
+        self._contracts_date = date
+        logger.info(f"已加载 {date} 的 {len(rows)} 份契约")
+
+    def _is_indexed(self, date: Date) -> bool:
+        """检查契约索引能否回答指定日期的查询。跨日后、定时任务执行前，索引视为新的一天的空索引。"""
+        if self._contracts_date is None:
+            return False
+        if date == self._contracts_date:
+            return True
+        if date == self.get_today() and date > self._contracts_date:
+            self._contracts = {}
+            self._masters = set()
+            self._contracts_date = date
+            return True
+        return False
+
     async def _handle_assign_slave(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """帮主任命奴隶"""
         config = self._config.slave_rules
@@ -92,10 +147,7 @@ class SlaveCommand(BotHelperMixin):
         sent_msg = await reply(message, text, parse_mode="MarkdownV2")
 
         # 删除契约消息
-        context.job_queue.run_once(
-            lambda ctx: ctx.bot.delete_message(chat_id=sent_msg.chat_id, message_id=sent_msg.message_id),
-            30,
-        )
+        defer_delete(sent_msg, 30)
 
     async def _handle_confirm_slavery(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         config = self._config.slave_rules
@@ -141,20 +193,23 @@ class SlaveCommand(BotHelperMixin):
             if message.text != config.init_phrase:
                 warning_text = f"⚡ @{user.username or user.id} 灵台混沌未立誓！速诵『{config.init_phrase}』"
                 warning = await reply(message, warning_text, parse_mode="MarkdownV2")
-                defer_delete(context.job_queue, warning, 10)
+                defer_delete(warning, 10)
             return
 
-        if confirmed and config.daily_phrase not in message.text:
+        if confirmed and config.daily_phrase not in (message.text or ""):
             # 当日契约已成立，检查是否带有要求的内容
             reminder_text = f"🐾 @{user.username or user.id} 忘了带尾音哦～要加『{config.daily_phrase}』哦～"
             reminder = await reply(message, reminder_text, parse_mode="MarkdownV2")
-            defer_delete(context.job_queue, reminder, 10)
+            defer_delete(reminder, 10)
 
     @staticmethod
     def _escape(text: str):
         return escape_markdown(escape_markdown(text, version=2), version=2)
 
-    async def _find_slave(self, uid: int, date: datetime.date):
+    async def _find_slave(self, uid: int, date: Date):
+        if self._is_indexed(date):
+            return uid in self._masters
+
         found = await self._db.find_one(
             """
             SELECT 1 FROM slave_records 
@@ -165,22 +220,10 @@ class SlaveCommand(BotHelperMixin):
         return bool(found)
 
     async def _find_gang_leader(self, group_id: int) -> Optional[int]:
-        result = await self._db.find_one(
-            """
-            SELECT u.user_id, uc.stage, u.points 
-            FROM user_group ug
-            JOIN users u ON ug.user_id = u.user_id
-            JOIN user_cultivation uc ON u.user_id = uc.user_id
-            WHERE ug.group_id = %s
-            ORDER BY uc.stage DESC, u.points DESC
-            LIMIT 1
-        """,
-            (group_id,),
-        )
-        return result[0] if result else None
+        return await self._db.Leaderboard.gang_leader(group_id)
 
-    async def _insert_slave_relation(self, master_id: int, slave_id: int, group_id: int, date: datetime.date):
-        return await self._db.update(
+    async def _insert_slave_relation(self, master_id: int, slave_id: int, group_id: int, date: Date):
+        result = await self._db.update(
             """
             INSERT INTO slave_records 
             (master_id, slave_id, group_id, created_date)
@@ -188,17 +231,29 @@ class SlaveCommand(BotHelperMixin):
         """,
             (master_id, slave_id, group_id, date),
         )
+        if self._is_indexed(date):
+            self._contracts[(slave_id, group_id)] = (master_id, False)
+            self._masters.add(master_id)
+        return result
 
-    async def _update_confirm_slavery(self, slave_id: int, date: datetime.date, confirm: bool):
+    async def _update_confirm_slavery(self, slave_id: int, date: Date, confirm: bool):
         await self._db.update(
             """
-            UPDATE slave_records SET confirmed = TRUE 
+            UPDATE slave_records SET confirmed = %s 
             WHERE slave_id = %s AND created_date = %s
         """,
             (int(confirm), slave_id, date),
         )
+        if self._is_indexed(date):
+            for key, (master_id, _) in self._contracts.items():
+                if key[0] == slave_id:
+                    self._contracts[key] = (master_id, confirm)
+
+    async def _find_slave_by_date(self, slave_id: int, group_id: int, date: Date):
+        if self._is_indexed(date):
+            # 绝大多数消息的发送者当日都没有契约，无需访问数据库
+            return self._contracts.get((slave_id, group_id))
 
-    async def _find_slave_by_date(self, slave_id: int, group_id: int, date: datetime.date):
         return await self._db.find_one(
             """
             SELECT master_id, confirmed 
@@ -0,0 +1,79 @@
+from telegram import Update
+from telegram.constants import MessageLimit
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+from shubot.config import Config
+from shubot.database import DatabaseManager
+from shubot.ext.bot_helper import BotHelperMixin
+from shubot.ext.cache import cache_stats
+from shubot.metrics import metrics
+from shubot.query_stats import query_stats
+
+
+def _split_messages(lines: list[str], limit: int = MessageLimit.MAX_TEXT_LENGTH) -> list[str]:
+    """按行将文本拼接为多条消息，每条不超过 `limit` 个字符。超长的单行会被截断，空白的消息会被忽略。"""
+    messages = []
+    current = []
+    length = 0
+
+    def emit():
+        text = "\n".join(current).strip("\n")
+        if text:
+            messages.append(text)
+
+    for line in lines:
+        if len(line) > limit:
+            line = line[: limit - 3] + "..."
+        if current and length + 1 + len(line) > limit:
+            emit()
+            current, length = [], 0
+        length += len(line) + (1 if current else 0)
+        current.append(line)
+    emit()
+    return messages
+
+
+class StatsCommand(BotHelperMixin):
+    """运行状态指标查询，仅限管理员使用"""
+
+    def __init__(self, app: Application, config: Config, db: DatabaseManager | None = None):
+        super().__init__(app, config, db)
+
+        self._app.add_handler(CommandHandler("stats", self._handle_stats))
+
+    async def _handle_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """响应 /stats 命令，显示运行状态指标"""
+        message = update.message
+        if not self.is_admin(update.effective_user):
+            return await self.reply(message, "⚠️ 你没有权限执行此操作")
+
+        from shubot.bot import ShuBot
+
+        lines = [metrics.format_text() or "暂无指标"]
+        queues = ShuBot.get_instance().get_update_processor().queue_stats()
+        if queues:
+            lines.append("")
+            lines.append("排队最多的会话：")
+            for (kind, key_id), depth, last_wait, max_wait in queues:
+                lines.append(f"{kind}:{key_id} depth={depth} wait={last_wait * 1000:.0f}ms max={max_wait * 1000:.0f}ms")
+
+        caches = cache_stats()
+        if caches:
+            lines.append("")
+            lines.append("读取缓存：")
+            for s in caches:
+                lines.append(
+                    f"{s.name} size={s.size} hit={s.hit_rate:.1%} "
+                    f"(hit={s.hits} neg={s.negative_hits} miss={s.misses} coalesced={s.coalesced}) "
+                    f"evicted={s.evictions} invalidated={s.invalidations}"
+                )
+
+        slowest = query_stats.format_text()
+        if slowest:
+            lines.append("")
+            lines.append("总耗时最多的语句：")
+            lines.append(slowest)
+
+        # 指标、缓存与语句较多时会超过 Telegram 单条消息的长度限制，拆分为多条发送
+        for text in _split_messages("\n".join(lines).split("\n")):
+            await self.reply(message, text, delete_source=False, del_reply_timeout=60)
@@ -3,17 +3,19 @@ import logging
 from functools import partial
 from math import copysign
 from textwrap import dedent
+from typing import cast
 from traceback import format_exception
 
-from async_lru import alru_cache
-from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, CommandHandler, ContextTypes, CallbackQueryHandler
 from telegram.ext.filters import ChatType
 from telegram.helpers import escape_markdown
 
 from shubot.config import Config
 from shubot.database import DatabaseManager
 from shubot.ext.bot_helper import BotHelperMixin
+from shubot.ext.cache import ReadCache
+from shubot.model.leaderboard import GlobalCursor, GroupRank
 
 logger = logging.getLogger(__name__)
 
@@ -23,13 +25,22 @@ RANK_NUMBERS = "⒈⒉⒊⒋⒌⒍⒎⒏⒐⒑⒒⒓⒔⒕⒖⒗⒘⒙⒚⒛"
 class UserInfoCommand(BotHelperMixin):
     """查询当前用户状态"""
 
+    _global_pages: ReadCache[tuple[int, GlobalCursor | None, bool], tuple[str, InlineKeyboardMarkup | None]]
+    """全服排行榜渲染好的页面，键为 (页码, 游标, 是否向前翻页)"""
+
     def __init__(self, app: Application, config: Config, db: DatabaseManager | None = None):
         super().__init__(app, config, db)
+        self._global_pages = ReadCache("global_leaderboard_pages", config.leaderboard.global_page_cache)
+        self._db.Leaderboard.on_global_change(self._global_pages.clear)
 
         self._app.add_handler(CommandHandler("my", self._handle_my, filters=ChatType.GROUPS))
         self._app.add_handler(
             CommandHandler(["paihang", "leaderboard", "ranking"], self._handle_ranking, filters=ChatType.GROUPS)
         )
+        self._app.add_handler(
+            CommandHandler(["zongbang", "global_leaderboard"], self._handle_global_ranking, filters=ChatType.GROUPS)
+        )
+        self._app.add_handler(CallbackQueryHandler(self._handle_global_ranking_page, pattern=r"^gboard_"))
         self._app.add_handler(
             CommandHandler("add", partial(self._handle_modify_points, sign=1), filters=ChatType.GROUPS)
         )
@@ -43,10 +54,11 @@ class UserInfoCommand(BotHelperMixin):
         message = update.message
 
         try:
-            [points, cult] = await asyncio.gather(
-                self._db.User.get_points(user.id),
-                self._db.User.get_cultivation_data(user.id),
+            [cult, rank] = await asyncio.gather(
+                self._db.User.get_state(user.id),
+                self._db.Leaderboard.rank(message.chat.id, user.id),
             )
+            points = cult.points
             logger.info(f"修仙数据查询结果：{cult}")
             stage_name = self._config.cultivation.names[cult.stage]
 
@@ -60,7 +72,8 @@ class UserInfoCommand(BotHelperMixin):
                        ├ 当前境界：{stage_name}
                        ├ 突破丹：{cult.pills} 枚
                        ├ 下次突破需：{cult.next_cost} 积分
-                       └ 总积分(灵石)：{points} 分
+                       ├ 总积分(灵石)：{points} 分
+                       └ 群内排名：{self._format_rank(rank)}
                    """
                 ),
             )
@@ -69,6 +82,17 @@ class UserInfoCommand(BotHelperMixin):
             logger.error(f"查询积分失败：{str(e)}\n{'\n'.join(format_exception(e))}")
             await message.reply_text("❌ 查询积分失败，请稍后再试")
 
+    def _format_rank(self, rank: GroupRank | None) -> str:
+        if rank is None:
+            return "暂未上榜"
+        text = f"第 {rank.rank} 名 (共 {rank.total} 人)"
+        if rank.above is None:
+            return text
+        gap = rank.points_to_next()
+        if gap is not None:
+            return f"{text}，距上一名还差 {gap} 分"
+        return f"{text}，上一名已达 {self._config.cultivation.names[max(rank.above[0], 0)]}"
+
     async def _handle_ranking(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """响应 /paihang 命令，查询积分排行榜"""
         message = update.message
@@ -79,45 +103,82 @@ class UserInfoCommand(BotHelperMixin):
         if not top_users:
             return await self.reply(message, rf"🌫️ 本群 \(`{group_id}`\) 尚无修仙者上榜", parse_mode="MarkdownV2")
 
-        tg_names = await asyncio.gather(*(self._get_tg_name(uid) for (uid, _, _) in top_users))
+        leaderboard = await self._render_leaderboard(msgs.banner, top_users, 1)
+        await self.reply(message, leaderboard, parse_mode="MarkdownV2", del_reply_timeout=60, del_source_timeout=0)
+
+    async def _render_leaderboard(self, banner: str, entries: list[tuple[int, int, int]], first_rank: int) -> str:
+        """渲染排行榜，`entries` 为 (用户 ID, 境界, 积分) 列表"""
+        msgs = self._config.leaderboard.messages
+        tg_names = await self.get_user_names([uid for (uid, _, _) in entries])
         leaderboard_entries = []
-        for rank, name, (_, stage, points) in zip(RANK_NUMBERS, tg_names, top_users):
+        for rank, name, (_, stage, points) in zip(range(first_rank, first_rank + len(entries)), tg_names, entries):
             entry = msgs.entry.format(
-                rank=rank,
+                rank=RANK_NUMBERS[rank - 1] if rank <= len(RANK_NUMBERS) else escape_markdown(f"{rank}.", version=2),
                 name=escape_markdown(name, version=2),
                 stage=escape_markdown(self._config.cultivation.names[stage], version=2),
                 points=points,
             )
             leaderboard_entries.append(entry.strip())
-        msgs.separator.join(leaderboard_entries)
-        leaderboard = f"{msgs.banner}\n\n{msgs.separator.join(leaderboard_entries)}\n\n{msgs.footer}"
-        await self.reply(message, leaderboard, parse_mode="MarkdownV2", del_reply_timeout=60, del_source_timeout=0)
+        return f"{banner}\n\n{msgs.separator.join(leaderboard_entries)}\n\n{msgs.footer}"
 
-    @alru_cache
-    async def _get_tg_name(self, uid: int, fallback: str = "侠名") -> str:
-        try:
-            user = await self.bot.get_chat(uid)
-            return user.full_name
-        except Exception as e:
-            logger.error(f"获取用户信息 (uid={uid}) 失败：{str(e)}")
-            return fallback
+    async def _handle_global_ranking(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """响应 /zongbang 命令，查询全服排行榜"""
+        message = update.message
+        text, markup = await self._render_global_page(1, None, False)
+        if text is None:
+            return await self.reply(message, "🌫️ 天下尚无修仙者上榜")
+        await self.reply(
+            message, text, reply_markup=markup, parse_mode="MarkdownV2", del_reply_timeout=120, del_source_timeout=0
+        )
 
-    async def _get_top_users_by_group(self, group_id: int):
-        return await self._db.find_many(
-            f"""
-                SELECT
-                    u.user_id, IFNULL(uc.stage, 0), IFNULL(u.points, 0) 
-                FROM user_group ug
-                    JOIN users u ON ug.user_id = u.user_id
-                    LEFT JOIN user_cultivation uc ON u.user_id = uc.user_id
-                WHERE
-                    ug.group_id = %s
-                ORDER BY
-                    uc.stage DESC, u.points DESC
-                LIMIT {int(self._config.leaderboard.top_count)}
-            """,
-            (group_id,),
+    async def _handle_global_ranking_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """全服排行榜翻页按钮：gboard_{页码}_{n|p}_{境界}_{积分}_{用户 ID}"""
+        query = update.callback_query
+        _, page, direction, *cursor = query.data.split("_")
+        text, markup = await self._render_global_page(
+            int(page), cast(GlobalCursor, tuple(map(int, cursor))), direction == "p"
+        )
+        if text is None:
+            return await query.answer("📜 已经是最后一页了", show_alert=True)
+        await query.answer()
+        await query.edit_message_text(text, reply_markup=markup, parse_mode="MarkdownV2")
+
+    async def _render_global_page(
+        self, page: int, cursor: GlobalCursor | None, backward: bool
+    ) -> tuple[str | None, InlineKeyboardMarkup | None]:
+        """渲染全服排行榜的一页，没有数据时返回 (None, None)。结果在短时间内缓存，翻页时无需重新查询与渲染"""
+        page_data = await self._global_pages.get(
+            (page, cursor, backward), lambda: self._build_global_page(page, cursor, backward)
         )
+        return page_data if page_data is not None else (None, None)
+
+    async def _build_global_page(
+        self, page: int, cursor: GlobalCursor | None, backward: bool
+    ) -> tuple[str, InlineKeyboardMarkup | None] | None:
+        config = self._config.leaderboard
+        entries = await self._db.Leaderboard.global_page(cursor, config.global_page_size, backward)
+        if not entries:
+            return None
+
+        # 按游标翻页不统计之前的行数，名次由页码推算：翻页期间有用户跨页移动时，之后各页的名次是近似值
+        first_rank = (page - 1) * config.global_page_size + 1
+        text = await self._render_leaderboard(config.messages.global_banner, entries, first_rank)
+
+        buttons = []
+        if page > 1:
+            uid, stage, points = entries[0]
+            buttons.append(
+                InlineKeyboardButton("⬅️ 上一页", callback_data=f"gboard_{page - 1}_p_{stage}_{points}_{uid}")
+            )
+        if len(entries) == config.global_page_size:
+            uid, stage, points = entries[-1]
+            buttons.append(
+                InlineKeyboardButton("下一页 ➡️", callback_data=f"gboard_{page + 1}_n_{stage}_{points}_{uid}")
+            )
+        return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+    async def _get_top_users_by_group(self, group_id: int):
+        return await self._db.Leaderboard.top(group_id, int(self._config.leaderboard.top_count))
 
     async def _handle_modify_points(self, update: Update, context: ContextTypes.DEFAULT_TYPE, /, sign: int):
         """响应 /add 和 /del 命令，修改用户积分"""
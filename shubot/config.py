@@ -29,6 +29,24 @@ class FloatRange:
         return self.min, self.max
 
 
+@dataclass
+class RateLimitConfig:
+    """出站消息限流配置"""
+
+    global_rate: float = field(default=30.0)
+    """全局每秒最多发送的消息数"""
+    group_per_minute: float = field(default=20.0)
+    """每个群组每分钟最多发送的消息数"""
+    group_burst: float = field(default=5.0)
+    """每个群组允许的突发消息数"""
+    private_rate: float = field(default=1.0)
+    """每个私聊每秒最多发送的消息数"""
+    private_burst: float = field(default=3.0)
+    """每个私聊允许的突发消息数"""
+    max_retries: int = field(default=3)
+    """触发频率限制 (RetryAfter) 后的最大重试次数"""
+
+
 @dataclass
 class TelegramBotConfig:
     """
@@ -38,17 +56,129 @@ class TelegramBotConfig:
     token: str
     username: str
     admin_ids: list[int]
+    max_concurrent_updates: int = field(default=64)
+    """同时处理的更新数量上限，同一群组内的更新始终按顺序处理"""
+    max_pending_updates: int = field(default=1024)
+    """排队等待处理的更新数量上限"""
+    delete_tick: float = field(default=1.0)
+    """延迟删除消息的时间片，单位为秒。同一时间片内到期的消息合并为一次批量删除请求"""
+    delete_persist_interval: float = field(default=2.0)
+    """待删除消息写入数据库的间隔，单位为秒"""
+    rate_limit: RateLimitConfig = field(default_factory=RateLimitConfig)
+    """出站消息限流配置"""
+
+
+@dataclass
+class WriteBehindConfig:
+    """积分写回缓冲配置"""
+
+    flush_interval: float = field(default=5.0)
+    """写回间隔，单位为秒"""
+    max_pending: int = field(default=500)
+    """缓冲的用户数量达到该值时立即写回"""
+    batch_size: int = field(default=1000)
+    """单条 upsert 语句最多写入的行数"""
+
+
+@dataclass
+class NameCacheConfig:
+    """用户显示名称缓存配置"""
+
+    ttl: float = field(default=86400.0)
+    """名称的有效期，单位为秒。过期后再次见到该用户时会重新写入数据库"""
+    capacity: int = field(default=100000)
+    """内存中最多缓存的用户数量"""
+    flush_interval: float = field(default=10.0)
+    """名称写入数据库的间隔，单位为秒"""
+    max_pending: int = field(default=500)
+    """等待写入的名称数量达到该值时立即写入"""
+    batch_size: int = field(default=500)
+    """单条语句最多更新的行数"""
+
+
+@dataclass
+class MembershipConfig:
+    """用户群组关联写入配置"""
+
+    flush_interval: float = field(default=5.0)
+    """新关联写入数据库的间隔，单位为秒"""
+    max_pending: int = field(default=500)
+    """等待写入的关联数量达到该值时立即写入"""
+    batch_size: int = field(default=1000)
+    """单条语句最多写入的行数"""
+
+
+@dataclass
+class ReadCacheConfig:
+    """模型读取缓存配置"""
+
+    capacity: int = field(default=10000)
+    """最多缓存的条目数量"""
+    ttl: float = field(default=60.0)
+    """缓存的有效期，单位为秒。0 表示不缓存"""
+    negative_ttl: float = field(default=10.0)
+    """不存在的数据 (负缓存) 的有效期，单位为秒。0 表示不缓存"""
+
+
+@dataclass
+class PoolConfig:
+    """数据库连接池配置"""
+
+    minsize: int = field(default=5)
+    """最少保持的连接数，启动时即建立 (预热)"""
+    maxsize: int = field(default=20)
+    """最多同时打开的连接数"""
+    recycle: int = field(default=3600)
+    """连接的最长使用时间，单位为秒，超过后在下次取出时重建。-1 表示不回收"""
+    acquire_timeout: float = field(default=10.0)
+    """从连接池取出连接的超时时间，单位为秒，超时后抛出异常而非一直等待"""
+
+
+@dataclass
+class SqliteConfig:
+    """SQLite 后端配置"""
+
+    path: str = field(default="shubot.db")
+    """数据库文件路径，`:memory:` 表示使用内存数据库 (进程退出后丢失，用于测试与基准测试)"""
+    readers: int = field(default=2)
+    """只读连接 (线程) 数量。WAL 模式下读取不会阻塞写入"""
+    busy_timeout: float = field(default=5.0)
+    """数据库被其他进程锁定时的等待时间，单位为秒"""
 
 
 @dataclass
 class DatabaseConfig:
-    """数据库配置 (MySQL / MariaDB)"""
+    """数据库配置 (MySQL / MariaDB，或用于小型部署的 SQLite)"""
 
+    backend: str = field(default="mysql")
+    """数据库后端：`mysql` (MySQL / MariaDB) 或 `sqlite`"""
+    sqlite: SqliteConfig = field(default_factory=SqliteConfig)
+    """SQLite 后端配置，仅在 `backend` 为 `sqlite` 时使用"""
     host: str = field(default="127.0.0.1")
     port: int = field(default=3306)
     db: str = field(default="shubot")
     user: str = field(default="shubot")
     password: str = field(default="shubot")
+    pool: PoolConfig = field(default_factory=PoolConfig)
+    """连接池配置"""
+    slow_query_threshold: float = field(default=0.2)
+    """慢查询日志的阈值，单位为秒，负数表示不记录"""
+    write_behind: WriteBehindConfig = field(default_factory=WriteBehindConfig)
+    """积分写回缓冲配置"""
+    name_cache: NameCacheConfig = field(default_factory=NameCacheConfig)
+    """用户显示名称缓存配置"""
+    membership: MembershipConfig = field(default_factory=MembershipConfig)
+    """用户群组关联写入配置"""
+    user_state_cache: ReadCacheConfig = field(default_factory=ReadCacheConfig)
+    """用户积分与修仙数据的读取缓存配置"""
+    name_lookup_cache: ReadCacheConfig = field(
+        default_factory=lambda: ReadCacheConfig(capacity=10000, ttl=0.0, negative_ttl=300.0)
+    )
+    """数据库中没有名称的用户的负缓存配置 (有名称的用户已由名称缓存保存)"""
+    group_auth_refresh_interval: float = field(default=60.0)
+    """检查授权群组列表变化的间隔，单位为秒"""
+    leaderboard_reconcile_interval: float = field(default=300.0)
+    """内存排行榜与数据库核对的间隔，单位为秒"""
 
 
 @dataclass
@@ -280,6 +410,8 @@ class LeaderboardMessages:
 
     banner: str = field(default="🏯【合书帮·天骄榜】🏯")
     """排行榜标题"""
+    global_banner: str = field(default="🌏【合书帮·天下榜】🌏")
+    """全服排行榜标题"""
     entry: str = field(default="{rank} {name} - 等级 {stage}，积分 {points}")
     """排行榜条目模板"""
     separator: str = field(default="\n")
@@ -294,6 +426,12 @@ class LeaderboardConfig:
 
     top_count: int = field(default=10)
     """排行榜显示的数量，最大 20"""
+    global_page_size: int = field(default=10)
+    """全服排行榜每页显示的数量。名次由页码推算，翻页期间有用户跨页移动时为近似值"""
+    global_page_cache: ReadCacheConfig = field(
+        default_factory=lambda: ReadCacheConfig(capacity=256, ttl=10.0, negative_ttl=10.0)
+    )
+    """全服排行榜渲染结果的缓存配置。积分或境界修改时作废，静默加分的批量写入在有效期内可能显示稍旧的排名"""
 
     messages: LeaderboardMessages = field(default_factory=LeaderboardMessages)
 
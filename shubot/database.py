@@ -1,16 +1,109 @@
 import asyncio
+import functools
 import logging
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncIterator, Any, AsyncGenerator
+from contextvars import ContextVar
+from typing import AsyncIterator, Any, AsyncGenerator, Awaitable, Callable, ParamSpec, TypeVar
 
 import aiomysql
 from aiomysql import Connection
 
+from shubot.backend import DatabaseBackend
 from shubot.config import DatabaseConfig
+from shubot.metrics import metrics
+from shubot.migrations import MigrationRunner
 from shubot.model.group_auth import GroupAuthModel
+from shubot.model.leaderboard import LeaderboardModel
+from shubot.model.pending_deletion import PendingDeletionModel
+from shubot.model.schema import SchemaModel
 from shubot.model.user import UserModel
+from shubot.model.user_group import UserGroupModel
+from shubot.model.user_name import UserNameModel
+from shubot.query_stats import find_caller, fingerprint, query_stats
 
 logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("shubot.slow_query")
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class PoolTimeoutError(TimeoutError):
+    """在限定时间内无法从连接池取出连接"""
+
+
+class _TimedCursor(aiomysql.Cursor):
+    """记录每条语句耗时的游标，作为连接池的默认游标类型"""
+
+    async def execute(self, query, args=None):
+        fp = fingerprint(query)
+        # 需在第一次挂起前获取调用栈
+        caller = find_caller()
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, args)
+        finally:
+            elapsed = time.perf_counter() - started
+            query_stats.observe(fp, elapsed)
+            metrics.histogram("db.query").observe(elapsed)
+            threshold = DatabaseManager.get_instance().config.slow_query_threshold
+            if 0 <= threshold <= elapsed:
+                metrics.inc("db.query.slow")
+                slow_query_logger.warning(f"慢查询 {elapsed * 1000:.0f}ms [{caller}]: {fp}")
+
+
+class _Session:
+    """
+    数据库会话 (unit of work)：同一次更新处理中的所有查询共用一个连接。
+
+    连接在第一次查询时才从连接池取出，会话结束时归还。同一会话中的并发查询 (如 `asyncio.gather`) 按顺序使用连接。
+    """
+
+    conn: Connection | None
+    closed: bool
+    in_transaction: bool
+    _lock: asyncio.Lock
+    _owner: asyncio.Task | None
+    """当前使用连接的任务，同一任务嵌套使用时不再加锁"""
+
+    def __init__(self):
+        self.conn = None
+        self.closed = False
+        self.in_transaction = False
+        self._lock = asyncio.Lock()
+        self._owner = None
+
+    @asynccontextmanager
+    async def use(self, db: "DatabaseManager") -> AsyncIterator[Connection]:
+        task = asyncio.current_task()
+        if self._owner is task:
+            yield self.conn
+            return
+
+        async with self._lock:
+            if self.conn is None:
+                self.conn = await db.acquire_connection()
+            else:
+                metrics.inc("db.session.reuse")
+            self._owner = task
+            try:
+                yield self.conn
+            finally:
+                self._owner = None
+
+    async def close(self, db: "DatabaseManager"):
+        async with self._lock:
+            self.closed = True
+            if self.conn is not None:
+                if self.in_transaction:
+                    await self.conn.rollback()
+                await db.release_connection(self.conn)
+                self.conn = None
+
+
+_current_session: ContextVar[_Session | None] = ContextVar("shubot_db_session", default=None)
+"""当前上下文的数据库会话"""
 
 
 class DatabaseManager:
@@ -22,16 +115,55 @@ class DatabaseManager:
         return DatabaseManager._instance
 
     _pool: None | aiomysql.Pool
+    _backend: DatabaseBackend | None
+    """非 MySQL 的数据库后端，为 None 时使用 MySQL 连接池"""
+    _config: DatabaseConfig
 
+    Schema: SchemaModel
     User: UserModel
     GroupAuth: GroupAuthModel
+    PendingDeletion: PendingDeletionModel
+    Leaderboard: LeaderboardModel
+    UserName: UserNameModel
+    UserGroup: UserGroupModel
 
     def __init__(self):
         self._pool = None
+        self._backend = None
+        self._config = DatabaseConfig()
+        self.Schema = SchemaModel(self)
         self.User = UserModel(self)
         self.GroupAuth = GroupAuthModel(self)
+        self.PendingDeletion = PendingDeletionModel(self)
+        self.Leaderboard = LeaderboardModel(self)
+        self.UserName = UserNameModel(self)
+        self.UserGroup = UserGroupModel(self)
+
+        metrics.gauge("db.pool.size", lambda: self._pool.size if self._pool else 0)
+        metrics.gauge("db.pool.free", lambda: self._pool.freesize if self._pool else 0)
+        metrics.gauge("db.pool.in_use", lambda: self._pool.size - self._pool.freesize if self._pool else 0)
+
+    @property
+    def config(self) -> DatabaseConfig:
+        return self._config
+
+    @property
+    def dialect(self) -> str:
+        """当前使用的 SQL 方言：`mysql` 或 `sqlite`"""
+        return self._backend.dialect if self._backend else "mysql"
+
+    async def open_pool(self, config: DatabaseConfig):
+        """只建立连接池 (或打开其他后端的数据库)，不初始化模型 (用于迁移等工具)"""
+        self._config = config
+        if config.backend == "sqlite":
+            from shubot.backend.sqlite import SqliteBackend
+
+            self._backend = SqliteBackend(config)
+            await self._backend.open()
+            return
+        if config.backend != "mysql":
+            raise ValueError(f"未知的数据库后端: {config.backend}")
 
-    async def init_pool(self, config: DatabaseConfig):
         self._pool = await aiomysql.create_pool(
             host=config.host,
             port=config.port,
@@ -39,15 +171,147 @@ class DatabaseManager:
             password=config.password,
             db=config.db,
             autocommit=True,
+            cursorclass=_TimedCursor,
+            minsize=config.pool.minsize,
+            maxsize=config.pool.maxsize,
+            pool_recycle=config.pool.recycle,
         )
+        logger.info(f"数据库连接池已建立 (预热 {self._pool.size} 个连接，上限 {self._pool.maxsize})")
+
+    async def init_pool(self, config: DatabaseConfig):
+        await self.open_pool(config)
+        # 迁移需在所有模型之前完成，模型依赖迁移建立的表与列 (SQLite 后端在打开时建立表结构，不使用迁移)
+        await MigrationRunner(self).migrate()
+        # 其他模型通过 Schema 安装 SQL 文件，需最先初始化
+        await self.Schema.init()
         await asyncio.gather(
             self.User.init(),
             self.GroupAuth.init(),
+            self.PendingDeletion.init(),
+            self.Leaderboard.init(),
+            self.UserGroup.init(),
+            self.UserName.init(),
         )
 
+    async def close(self):
+        """写入缓冲数据并关闭连接池"""
+        await asyncio.gather(
+            self.User.close(),
+            self.GroupAuth.close(),
+            self.Leaderboard.close(),
+            self.UserName.close(),
+            self.UserGroup.close(),
+        )
+        await self.close_pool()
+
+    async def close_pool(self):
+        """关闭连接池"""
+        if self._backend:
+            await self._backend.close()
+            self._backend = None
+        if self._pool:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    @staticmethod
+    def _active_session() -> _Session | None:
+        session = _current_session.get()
+        # 会话结束后，由会话中创建的后台任务仍可能继承该上下文，此时直接使用连接池
+        return session if session is not None and not session.closed else None
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[None]:
+        """
+        开启数据库会话，会话中的所有查询共用一个连接池连接。已处于会话中时复用当前会话。
+        通常通过 `unit_of_work` 装饰器绑定到一段数据库操作。SQLite 后端没有连接池，会话不做任何事。
+        """
+        if self._backend is not None or self._active_session() is not None:
+            yield
+            return
+
+        session = _Session()
+        token = _current_session.set(session)
+        try:
+            yield
+        finally:
+            _current_session.reset(token)
+            await session.close(self)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """
+        在当前会话中开启显式事务，正常退出时提交，发生异常时回滚。未处于会话中时会自动开启会话。
+        嵌套调用时加入外层事务。存储过程内部的 START TRANSACTION / COMMIT 会隐式提交外层事务，因此事务中不能调用 `call`。
+        """
+        if self._backend is not None:
+            async with self._backend.transaction():
+                yield
+            return
+
+        session = self._active_session()
+        if session is None:
+            async with self.session():
+                async with self.transaction():
+                    yield
+            return
+        if session.in_transaction:
+            yield
+            return
+
+        async with session.use(self) as conn:
+            await conn.begin()
+        session.in_transaction = True
+        try:
+            yield
+        except BaseException:
+            session.in_transaction = False
+            async with session.use(self) as conn:
+                await conn.rollback()
+            raise
+        session.in_transaction = False
+        async with session.use(self) as conn:
+            await conn.commit()
+
+    async def acquire_connection(self) -> Connection:
+        """从连接池取出连接，超过 `pool.acquire_timeout` 时抛出 `PoolTimeoutError`。用完后需调用 `release_connection`。"""
+        started = time.monotonic()
+        try:
+            conn = await asyncio.wait_for(self._pool.acquire(), timeout=self._config.pool.acquire_timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("db.pool.timeout")
+            raise PoolTimeoutError(
+                f"等待数据库连接超时 ({self._config.pool.acquire_timeout}s, "
+                f"in_use={self._pool.size - self._pool.freesize}/{self._pool.maxsize})"
+            ) from None
+        metrics.histogram("db.pool.acquire").observe(time.monotonic() - started)
+        return conn
+
+    async def release_connection(self, conn: Connection):
+        """将连接归还连接池"""
+        await self._pool.release(conn)
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[Connection]:
+        """获取连接：处于会话中时使用会话的连接，否则从连接池取出"""
+        if self._backend is not None:
+            raise RuntimeError(
+                f"{self._backend.dialect} 后端不支持直接使用连接，请使用 find_one / update / call 等方法"
+            )
+        session = self._active_session()
+        if session is None:
+            conn = await self.acquire_connection()
+            try:
+                yield conn
+            finally:
+                await self.release_connection(conn)
+        else:
+            async with session.use(self) as conn:
+                yield conn
+
     @asynccontextmanager
     async def get_cursor(self) -> AsyncIterator[aiomysql.Cursor]:
-        async with self._pool.acquire() as conn:  # type: aiomysql.Connection
+        async with self._connection() as conn:  # type: aiomysql.Connection
             async with conn.cursor() as cursor:  # type: aiomysql.Cursor
                 yield cursor
 
@@ -56,34 +320,53 @@ class DatabaseManager:
 
     @asynccontextmanager
     async def acquire(self) -> AsyncGenerator[Connection, Any]:
-        async with self._pool.acquire() as conn:  # type: aiomysql.Connection
+        async with self._connection() as conn:  # type: aiomysql.Connection
             try:
                 yield conn
             except Exception as e:
                 await conn.rollback()
                 raise e
 
+    @property
+    def in_transaction(self) -> bool:
+        """当前是否处于显式事务中。事务中不应自行提交，由 `transaction` 统一提交。"""
+        if self._backend is not None:
+            return self._backend.in_transaction
+        session = self._active_session()
+        return session is not None and session.in_transaction
+
     async def find_one(self, query: str, args: tuple[Any, ...] | None = None) -> Any:
+        if self._backend is not None:
+            return await self._backend.find_one(query, args)
         async with self.get_cursor() as cursor:
             await cursor.execute(query, args)
             return await cursor.fetchone()
 
     async def find_many(self, query: str, args: tuple[Any, ...] | None = None) -> list[tuple[Any, ...]]:
+        if self._backend is not None:
+            return await self._backend.find_many(query, args)
         async with self.get_cursor() as cursor:
             await cursor.execute(query, args)
             return await cursor.fetchall()
 
     async def update(self, query: str, args: tuple[Any, ...] | None = None) -> int:
         """执行更新操作，返回受影响行数"""
+        if self._backend is not None:
+            return await self._backend.update(query, args)
         async with self.acquire() as conn:
             async with conn.cursor() as cursor:  # type: aiomysql.Cursor
                 await cursor.execute(query, args)
                 row_count = cursor.rowcount
-                await conn.commit()
+                if not self.in_transaction:
+                    await conn.commit()
                 return row_count
 
     async def call(self, procedure: str, *args: Any) -> tuple[int, tuple[Any, ...]]:
-        """调用存储过程，返回受影响行数和结果"""
+        """调用存储过程，返回受影响行数和结果。存储过程自行提交，不能在显式事务中调用"""
+        if self.in_transaction:
+            raise RuntimeError(f"存储过程 {procedure} 会提交外层事务，不能在显式事务中调用")
+        if self._backend is not None:
+            return await self._backend.call(procedure, *args)
         args_tpl = ",".join(["%s"] * len(args))
         query = f"CALL {procedure}({args_tpl})"
         async with self.get_cursor() as cursor:
@@ -92,3 +375,17 @@ class DatabaseManager:
 
 
 DatabaseManager._instance = DatabaseManager()
+
+
+def unit_of_work(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+    """
+    装饰器：被装饰的函数在一个数据库会话中执行，期间的所有查询共用一个连接。
+    会话持有连接直到函数返回，应只装饰数据库操作部分，不包括 Telegram 请求或等待。
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        async with DatabaseManager.get_instance().session():
+            return await func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,85 @@
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from shubot.metrics import metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    批量读取器 (DataLoader 模式)。
+
+    同一轮事件循环内 (例如 `asyncio.gather` 发起的多个读取) 对 `load` 的调用会被合并，
+    在本轮结束时用一次 `batch_fn` 批量读取，相同的键只读取一次。结果不做缓存，每一批都会重新读取。
+
+    `batch_fn` 接收去重后的键列表，返回键到值的映射，必须包含所有键。
+    `batch_fn` 在空白的上下文中执行，不继承调用方的上下文变量 (例如数据库会话)。
+    """
+
+    _name: str
+    _batch_fn: Callable[[list[K]], Awaitable[dict[K, V]]]
+    _max_batch_size: int
+    _pending: dict[K, asyncio.Future]
+    _scheduled: bool
+    _tasks: set[asyncio.Task]
+
+    def __init__(self, name: str, batch_fn: Callable[[list[K]], Awaitable[dict[K, V]]], max_batch_size: int = 500):
+        self._name = name
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._pending = {}
+        self._scheduled = False
+        self._tasks = set()
+
+    def _enqueue(self, key: K) -> asyncio.Future:
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if not self._scheduled:
+                self._scheduled = True
+                # 在空白上下文中派发：批量读取属于所有调用方，不应使用第一个调用方的数据库会话或事务
+                loop.call_soon(self._dispatch, context=contextvars.Context())
+        return future
+
+    async def load(self, key: K) -> V:
+        """读取单个键"""
+        # 某个调用方被取消时，不影响同一批的其他调用方
+        return await asyncio.shield(self._enqueue(key))
+
+    async def load_many(self, keys: list[K]) -> list[V]:
+        """读取多个键，结果与 `keys` 的顺序一致"""
+        # 同步加入队列，保证与同一轮内的其他调用合并为一批
+        futures = [self._enqueue(key) for key in keys]
+        return list(await asyncio.shield(asyncio.gather(*futures)))
+
+    def _dispatch(self):
+        self._scheduled = False
+        pending, self._pending = self._pending, {}
+        items = list(pending.items())
+        for i in range(0, len(items), self._max_batch_size):
+            task = asyncio.create_task(self._run(dict(items[i : i + self._max_batch_size])))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[K, asyncio.Future]):
+        metrics.inc(f"loader.{self._name}.batches")
+        metrics.inc(f"loader.{self._name}.keys", len(batch))
+        try:
+            result = await self._batch_fn(list(batch))
+        except Exception as ex:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(ex)
+            return
+
+        for key, future in batch.items():
+            if future.done():
+                continue
+            if key in result:
+                future.set_result(result[key])
+            else:
+                future.set_exception(KeyError(key))
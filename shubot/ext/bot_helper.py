@@ -1,18 +1,17 @@
 import asyncio
+import logging
 from datetime import datetime, UTC
 from random import SystemRandom
 from typing import cast
 
 from telegram import Message, Bot, User
-from telegram.ext import Application, CallbackContext
+from telegram.ext import Application
 
 from shubot.config import Config
 from shubot.database import DatabaseManager
+from shubot.util import defer_delete
 
-
-async def _delete_message(ctx: CallbackContext):
-    data = cast(dict, ctx.job.data)
-    await ctx.bot.delete_message(**data)
+logger = logging.getLogger(__name__)
 
 
 class BotHelperMixin:
@@ -49,11 +48,8 @@ class BotHelperMixin:
         pass
 
     def delete(self, message: Message, timeout: int = 10):
-        self._app.job_queue.run_once(
-            _delete_message,
-            data={"chat_id": message.chat_id, "message_id": message.message_id},
-            when=timeout,
-        )
+        """延迟删除消息"""
+        defer_delete(message, timeout)
 
     async def reply(
         self,
@@ -73,6 +69,28 @@ class BotHelperMixin:
             self.delete(reply_message, del_reply_timeout)
         return reply_message
 
+    async def get_user_names(self, user_ids: list[int], fallback: str = "侠名") -> list[str]:
+        """获取用户的显示名称。优先使用名称缓存，缓存中没有的用户才通过 Bot API 查询。"""
+        names = await self._db.UserName.get_names(user_ids)
+
+        async def resolve(uid: int) -> str:
+            if uid in names:
+                return names[uid].full_name
+            try:
+                chat = await self.bot.get_chat(uid)
+            except Exception as e:
+                logger.error(f"获取用户信息 (uid={uid}) 失败：{str(e)}")
+                return fallback
+            self._db.UserName.remember(uid, chat.full_name, chat.username)
+            return chat.full_name
+
+        return list(await asyncio.gather(*(resolve(uid) for uid in user_ids)))
+
+    async def get_user_name(self, user_id: int, fallback: str = "侠名") -> str:
+        """获取单个用户的显示名称"""
+        (name,) = await self.get_user_names([user_id], fallback)
+        return name
+
     @staticmethod
     def get_today():
         """获取今日日期"""
@@ -0,0 +1,181 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, Iterable, NamedTuple, TypeVar
+
+from shubot.config import ReadCacheConfig
+from shubot.metrics import metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class CacheStats(NamedTuple):
+    """缓存统计"""
+
+    name: str
+    size: int
+    hits: int
+    negative_hits: int
+    misses: int
+    coalesced: int
+    """与正在进行的读取合并的请求数"""
+    evictions: int
+    invalidations: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.negative_hits + self.misses + self.coalesced
+        return (self.hits + self.negative_hits) / total if total else 0.0
+
+
+class _Entry(NamedTuple):
+    value: object
+    expires_at: float
+
+
+class ReadCache(Generic[K, V]):
+    """
+    模型读取缓存。
+
+    - 按 LRU 淘汰，容量与有效期由 `ReadCacheConfig` 指定；
+    - 读取结果为 None 时按 `negative_ttl` 缓存 (负缓存)，避免反复查询不存在的数据；
+    - 同一个键同时只有一次读取，并发的未命中会等待同一个结果 (single-flight)；
+    - 写入数据后需调用 `invalidate`。正在进行的读取也会作废，其结果不会写入缓存。
+    """
+
+    name: str
+    _config: ReadCacheConfig
+    _entries: OrderedDict[K, _Entry]
+    _inflight: dict[K, asyncio.Future]
+    _hits: int
+    _negative_hits: int
+    _misses: int
+    _coalesced: int
+    _evictions: int
+    _invalidations: int
+
+    def __init__(self, name: str, config: ReadCacheConfig | None = None):
+        self.name = name
+        self._config = config or ReadCacheConfig()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._hits = self._negative_hits = self._misses = self._coalesced = 0
+        self._evictions = self._invalidations = 0
+
+        _caches[name] = self
+        metrics.gauge(f"cache.{name}.size", lambda: len(self._entries))
+
+    def configure(self, config: ReadCacheConfig):
+        """更新缓存配置 (例如读取配置文件后)，已缓存的数据保留"""
+        self._config = config
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self._config.capacity:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _lookup(self, key: K) -> tuple[bool, V | None]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        if entry.value is None:
+            self._negative_hits += 1
+        else:
+            self._hits += 1
+        return True, entry.value
+
+    def _store(self, key: K, value: V | None):
+        ttl = self._config.ttl if value is not None else self._config.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = _Entry(value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        self._evict()
+
+    async def get(self, key: K, loader: Callable[[], Awaitable[V | None]]) -> V | None:
+        """读取缓存，未命中时调用 `loader` 读取"""
+        found, value = self._lookup(key)
+        if found:
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self._coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # 发起读取的一方被取消，重新读取
+                return await self.get(key, loader)
+
+        self._misses += 1
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await loader()
+        except BaseException as ex:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if future.done():
+                pass
+            elif isinstance(ex, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(ex)
+                # 可能没有其他等待者，避免「未获取的异常」警告
+                future.exception()
+            raise
+
+        if self._inflight.get(key) is future:
+            # 读取期间没有被作废
+            del self._inflight[key]
+            self._store(key, value)
+        if not future.done():
+            future.set_result(value)
+        return value
+
+    async def get_many(self, keys: Iterable[K], loader: Callable[[K], Awaitable[V | None]]) -> list[V | None]:
+        """读取多个键，结果与 `keys` 的顺序一致。未命中的键并发读取，可配合 `BatchLoader` 合并为一次查询。"""
+        return list(await asyncio.gather(*(self.get(key, lambda key=key: loader(key)) for key in keys)))
+
+    def invalidate(self, key: K):
+        """作废一个键的缓存，以及正在进行的读取"""
+        self._invalidations += 1
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def invalidate_many(self, keys: Iterable[K]):
+        for key in keys:
+            self.invalidate(key)
+
+    def clear(self):
+        """清空缓存"""
+        self._invalidations += len(self._entries)
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            self.name,
+            len(self._entries),
+            self._hits,
+            self._negative_hits,
+            self._misses,
+            self._coalesced,
+            self._evictions,
+            self._invalidations,
+        )
+
+
+_caches: dict[str, ReadCache] = {}
+
+
+def cache_stats() -> list[CacheStats]:
+    """获取所有读取缓存的统计"""
+    return [cache.stats() for cache in _caches.values()]
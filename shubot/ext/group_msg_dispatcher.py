@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from traceback import format_exception
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from shubot.ext.group_msg_handler import GroupMsgHandlerMixin, GroupMessageHandleResult
+from shubot.ext.group_msg_match import MsgMatchTable
+from shubot.ext.msg_features import MessageFeatures
+
+logger = logging.getLogger(__name__)
+
+
+class GroupMsgDispatcher:
+    """
+    群组消息派发器。
+
+    根据处理器声明的依赖关系 (`run_after`) 与是否可能终止处理链 (`may_stop`)，将处理器划分为若干阶段：
+    同一阶段内的处理器并发执行，阶段之间按顺序执行。
+    可能返回 STOP 的处理器会成为屏障：在它之后注册的处理器都会排在它所在阶段之后。
+
+    处理器通过 `match_rules` 声明关心的消息，派发器将其编译为查找表，每条消息只调用匹配的处理器。
+    """
+
+    _handlers: list[GroupMsgHandlerMixin]
+    _stages: list[list[int]] | None
+    """各阶段的处理器序号"""
+    _match_table: MsgMatchTable | None
+
+    def __init__(self):
+        self._handlers = []
+        self._stages = None
+        self._match_table = None
+
+    @property
+    def handlers(self) -> list[GroupMsgHandlerMixin]:
+        return self._handlers
+
+    def register(self, handler: GroupMsgHandlerMixin):
+        """注册处理器，注册顺序决定了 STOP 屏障的作用范围"""
+        self._handlers.append(handler)
+        self._stages = None
+
+    def _dependencies(self, index: int) -> list[int]:
+        handler = self._handlers[index]
+        deps = []
+        for i, other in enumerate(self._handlers):
+            if i == index:
+                continue
+            if isinstance(other, handler.run_after) or (i < index and other.may_stop):
+                deps.append(i)
+        return deps
+
+    def compile(self) -> list[list[int]]:
+        """根据依赖关系计算执行阶段，并编译消息匹配表"""
+        deps = [self._dependencies(i) for i in range(len(self._handlers))]
+        levels: dict[int, int] = {}
+
+        def resolve(i: int, visiting: set[int]) -> int:
+            if i in levels:
+                return levels[i]
+            if i in visiting:
+                raise ValueError(f"群组消息处理器存在循环依赖: {type(self._handlers[i]).__name__}")
+            visiting.add(i)
+            levels[i] = max((resolve(d, visiting) + 1 for d in deps[i]), default=0)
+            visiting.discard(i)
+            return levels[i]
+
+        for i in range(len(self._handlers)):
+            resolve(i, set())
+
+        stages: list[list[int]] = [[] for _ in range(max(levels.values(), default=-1) + 1)]
+        for i in range(len(self._handlers)):
+            stages[levels[i]].append(i)
+
+        self._stages = stages
+        self._match_table = MsgMatchTable([handler.match_rules() for handler in self._handlers])
+        logger.info(
+            "群组消息处理阶段: "
+            + " -> ".join("[" + ", ".join(type(self._handlers[i]).__name__ for i in stage) + "]" for stage in stages)
+        )
+        return stages
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """按阶段派发群组消息，任一处理器返回 STOP 时不再执行后续阶段"""
+        if self._stages is None:
+            self.compile()
+
+        # 每条消息只创建一次特征，所有处理器共享
+        features = MessageFeatures.from_message(update.effective_message)
+        matched = self._match_table.lookup(features)
+        if not matched:
+            return
+
+        for stage in self._stages:
+            stage = [self._handlers[i] for i in stage if i in matched]
+            if not stage:
+                continue
+
+            results = await asyncio.gather(
+                *(handler.handle_group_msg(update, context, features) for handler in stage), return_exceptions=True
+            )
+
+            stop = False
+            for handler, result in zip(stage, results):
+                if isinstance(result, Exception):
+                    logger.error(
+                        f"处理群组消息出现异常 ({type(handler).__name__}): {str(result)}\n"
+                        + "\n".join(format_exception(result))
+                    )
+                elif result == GroupMessageHandleResult.STOP:
+                    stop = True
+
+            if stop:
+                # 提前退出
+                break
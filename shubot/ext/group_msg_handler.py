@@ -5,6 +5,8 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from shubot.ext.bot_helper import BotHelperMixin
+from shubot.ext.group_msg_match import MsgMatch, MatchAll
+from shubot.ext.msg_features import MessageFeatures
 
 
 class GroupMessageHandleResult(enum.IntEnum):
@@ -13,13 +15,22 @@ class GroupMessageHandleResult(enum.IntEnum):
 
 
 class GroupMsgHandlerMixin(BotHelperMixin, ABC):
+    run_after: tuple[type["GroupMsgHandlerMixin"], ...] = ()
+    """需要在这些处理器执行完毕后再执行，其余处理器可能与本处理器并发执行"""
+    may_stop: bool = False
+    """是否可能返回 STOP 终止处理链。在其之后注册的处理器，都会等待其执行完毕"""
+
     async def init_db(self):
         """初始化数据库，子类可选实现此方法"""
         pass
 
+    def match_rules(self) -> tuple[MsgMatch, ...]:
+        """消息匹配规则，任一规则匹配时才会调用 `handle_group_msg`。默认处理所有消息。"""
+        return (MatchAll(),)
+
     @abstractmethod
     async def handle_group_msg(
-        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE, features: MessageFeatures
     ) -> GroupMessageHandleResult | None:
-        """处理群组消息"""
+        """处理群组消息。`features` 为派发器预先提取的消息特征。"""
         pass
@@ -0,0 +1,111 @@
+import re
+from dataclasses import dataclass
+
+from shubot.ext.msg_features import MessageFeatures, hanzi_at_least
+
+
+class MsgMatch:
+    """群组消息匹配规则的基类。派发器会预先将所有规则编译为查找表，只调用相关的处理器。"""
+
+
+@dataclass(frozen=True)
+class MatchAll(MsgMatch):
+    """匹配所有消息"""
+
+
+@dataclass(frozen=True)
+class ExactText(MsgMatch):
+    """去除首尾空白后，消息文本与 `text` 完全一致"""
+
+    text: str
+
+
+@dataclass(frozen=True)
+class TextPrefix(MsgMatch):
+    """去除首尾空白后，消息文本以 `prefix` 开头"""
+
+    prefix: str
+
+
+@dataclass(frozen=True)
+class HasDocument(MsgMatch):
+    """消息带有文件"""
+
+
+@dataclass(frozen=True)
+class MinHanzi(MsgMatch):
+    """消息文本中至少包含 `count` 个中文字符"""
+
+    count: int
+
+
+class MsgMatchTable:
+    """由各处理器的匹配规则编译而成的查找表"""
+
+    _always: set[int]
+    _exact: dict[str, set[int]]
+    _prefixes: dict[str, list[tuple[str, int]]]
+    """前缀规则，按前缀首字符分组"""
+    _document: set[int]
+    _hanzi: list[tuple[int, int]]
+    """(中文字符数量要求, 处理器序号)，按数量升序排列"""
+    _hanzi_patterns: list[re.Pattern]
+    """`_hanzi` 中各数量要求对应的正则 (见 `hanzi_at_least`)"""
+    _by_hanzi: list[frozenset[int]]
+    """满足前 i 条中文字符数量规则时匹配的处理器 (包括 `_always`)，查找时无需逐条比较"""
+
+    def __init__(self, rules: list[tuple[MsgMatch, ...]]):
+        self._always = set()
+        self._exact = {}
+        self._prefixes = {}
+        self._document = set()
+        self._hanzi = []
+
+        for index, handler_rules in enumerate(rules):
+            for rule in handler_rules:
+                match rule:
+                    case MatchAll():
+                        self._always.add(index)
+                    case ExactText(text):
+                        self._exact.setdefault(text, set()).add(index)
+                    case TextPrefix(prefix) if prefix:
+                        self._prefixes.setdefault(prefix[0], []).append((prefix, index))
+                    case TextPrefix():
+                        self._always.add(index)
+                    case HasDocument():
+                        self._document.add(index)
+                    case MinHanzi(count):
+                        self._hanzi.append((count, index))
+                    case _:
+                        raise TypeError(f"未知的匹配规则: {rule!r}")
+        self._hanzi.sort()
+
+        self._hanzi_patterns = [hanzi_at_least(required) for required, _ in self._hanzi]
+        self._by_hanzi = [frozenset(self._always)]
+        for _, index in self._hanzi:
+            self._by_hanzi.append(self._by_hanzi[-1] | {index})
+
+    def lookup(self, features: MessageFeatures) -> frozenset[int]:
+        """查找与消息匹配的处理器序号"""
+        matched = self._by_hanzi[0]
+        if self._hanzi_patterns:
+            # 只有注册了中文字符数量规则时才判断。数量要求按升序逐条检查，遇到不满足的即停止
+            source = features.hanzi_source
+            # 中文字符数量不会超过文本长度，短于最小数量要求的文本无需检查
+            if len(source) >= self._hanzi[0][0] and not source.isascii():
+                level = 0
+                for pattern in self._hanzi_patterns:
+                    if pattern.match(source) is None:
+                        break
+                    level += 1
+                matched = self._by_hanzi[level]
+        if self._exact or self._prefixes:
+            text = features.text.strip()
+            exact = self._exact.get(text)
+            if exact:
+                matched = matched.union(exact)
+            if text and text[0] in self._prefixes:
+                matched = matched.union(index for prefix, index in self._prefixes[text[0]] if text.startswith(prefix))
+        if self._document and features.has_document:
+            matched = matched.union(self._document)
+        return matched
@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+import logging
+import math
+import time
+from itertools import count
+from typing import Callable
+
+from telegram import Bot
+from telegram.constants import BulkRequestLimit
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from shubot.database import DatabaseManager
+from shubot.ext.periodic import PeriodicTask
+from shubot.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_MAX_RETRY_DELAY = 300.0
+"""删除请求临时失败 (网络错误、超时等) 后重试的最长等待时间，单位为秒"""
+
+
+class MessageDeletionScheduler:
+    """
+    批量消息删除调度器。
+
+    待删除的消息按到期时间放入最小堆，到期时间向上取整到 `tick` 秒，
+    同一时间片到期的消息按会话分组，通过 `deleteMessages` 一次删除最多 100 条。
+    与每条消息一个 JobQueue 任务相比，内存占用与 HTTP 请求数都少得多。
+
+    待删除的消息会定期批量写入数据库，重启后重新加载并执行，避免消息永远留在群组中。
+    在写入数据库之前就已经删除的消息，不会产生任何数据库写入。
+    """
+
+    _get_bot: Callable[[], Bot]
+    _db: DatabaseManager
+    _tick: float
+    _heap: list[tuple[float, int, int, int]]
+    """(到期时间, 序号, 会话 ID, 消息 ID)"""
+    _seq: count
+    _unsaved: dict[tuple[int, int], float]
+    """尚未写入数据库的待删除消息"""
+    _done: list[tuple[int, int]]
+    """已删除、等待从数据库中移除的消息"""
+    _retry_delay: dict[int, float]
+    """各会话下次临时失败后的重试等待时间，每次失败加倍，成功后清除"""
+    _wakeup: asyncio.Event | None
+    _task: asyncio.Task | None
+    _persist_task: PeriodicTask
+
+    def __init__(
+        self, get_bot: Callable[[], Bot], db: DatabaseManager, tick: float = 1.0, persist_interval: float = 2.0
+    ):
+        self._get_bot = get_bot
+        self._db = db
+        self._tick = tick
+        self._heap = []
+        self._seq = count()
+        self._unsaved = {}
+        self._done = []
+        self._retry_delay = {}
+        self._wakeup = None
+        self._task = None
+        self._persist_task = PeriodicTask("message-deleter-persist", persist_interval, self.persist, run_on_stop=True)
+
+        metrics.gauge("deleter.pending", lambda: len(self._heap))
+
+    async def start(self):
+        """从数据库加载重启前尚未执行的删除任务，并启动调度"""
+        if self._task is not None:
+            return
+
+        rows = await self._db.PendingDeletion.load_all()
+        for chat_id, message_id, due in rows:
+            # 已过期的消息会在第一个时间片内批量删除
+            self._push(due, chat_id, message_id)
+        if rows:
+            logger.info(f"已加载 {len(rows)} 条待删除消息")
+
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name="message-deleter")
+        self._persist_task.start()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._persist_task.stop()
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, chat_id: int, message_id: int, delay: float):
+        """在 `delay` 秒后删除指定消息"""
+        due = time.time() + delay
+        self._push(due, chat_id, message_id)
+        self._unsaved[(chat_id, message_id)] = due
+
+    def _push(self, due: float, chat_id: int, message_id: int):
+        # 到期时间对齐到时间片，让相近时间到期的消息合并为一次请求
+        due = math.ceil(due / self._tick) * self._tick
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (due, next(self._seq), chat_id, message_id))
+        metrics.inc("deleter.scheduled")
+        if self._wakeup and (earliest is None or due < earliest):
+            self._wakeup.set()
+
+    def _pop_due(self, now: float) -> dict[int, list[int]]:
+        """取出所有已到期的消息，按会话分组"""
+        by_chat: dict[int, list[int]] = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, _, chat_id, message_id = heapq.heappop(self._heap)
+            by_chat.setdefault(chat_id, []).append(message_id)
+        return by_chat
+
+    async def _loop(self):
+        while True:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            by_chat = self._pop_due(time.time())
+            await asyncio.gather(*(self._delete_batch(chat_id, ids) for chat_id, ids in by_chat.items()))
+
+    async def _delete_batch(self, chat_id: int, message_ids: list[int]):
+        limit = BulkRequestLimit.MAX_LIMIT
+        for i in range(0, len(message_ids), limit):
+            chunk = message_ids[i : i + limit]
+            metrics.inc("deleter.requests")
+            try:
+                await self._get_bot().delete_messages(chat_id, chunk)
+                metrics.inc("deleter.deleted", len(chunk))
+                self._retry_delay.pop(chat_id, None)
+            except RetryAfter as ex:
+                retry_after = ex.retry_after
+                if hasattr(retry_after, "total_seconds"):
+                    # 新版本 python-telegram-bot 中为 timedelta
+                    retry_after = retry_after.total_seconds()
+                self._retry(chat_id, chunk, retry_after + self._tick, ex)
+                continue
+            except (BadRequest, Forbidden) as ex:
+                # 消息已不存在、无权限等错误重试也不会成功，视为已处理
+                metrics.inc("deleter.failed", len(chunk))
+                logger.warning(f"批量删除消息失败 (chat={chat_id}, count={len(chunk)}): {str(ex)}")
+            except Exception as ex:
+                # 网络错误、超时等临时失败，保留数据库中的记录，稍后重试
+                delay = self._retry_delay.get(chat_id, self._tick)
+                self._retry_delay[chat_id] = min(delay * 2, _MAX_RETRY_DELAY)
+                self._retry(chat_id, chunk, delay, ex)
+                continue
+            self._mark_done(chat_id, chunk)
+
+    def _retry(self, chat_id: int, message_ids: list[int], delay: float, ex: Exception):
+        """将删除失败的消息放回堆中，`delay` 秒后重试"""
+        metrics.inc("deleter.retried", len(message_ids))
+        logger.warning(
+            f"批量删除消息暂时失败 (chat={chat_id}, count={len(message_ids)})，{delay:g} 秒后重试: {str(ex)}"
+        )
+        due = time.time() + delay
+        for message_id in message_ids:
+            self._push(due, chat_id, message_id)
+
+    def _mark_done(self, chat_id: int, message_ids: list[int]):
+        for message_id in message_ids:
+            key = (chat_id, message_id)
+            if self._unsaved.pop(key, None) is None:
+                # 已写入数据库，需要移除
+                self._done.append(key)
+
+    async def persist(self):
+        """将新增的待删除消息写入数据库，并移除已删除的消息"""
+        unsaved, self._unsaved = self._unsaved, {}
+        done, self._done = self._done, []
+        try:
+            await self._db.PendingDeletion.add_many([(c, m, due) for (c, m), due in unsaved.items()])
+        except Exception:
+            # 写入失败期间已删除的消息，无需再写入数据库
+            finished = set(self._done)
+            self._unsaved = {key: due for key, due in unsaved.items() if key not in finished} | self._unsaved
+            self._done = done + [key for key in self._done if key not in unsaved]
+            raise
+
+        try:
+            await self._db.PendingDeletion.remove_many(done)
+        except Exception:
+            self._done = done + self._done
+            raise
@@ -0,0 +1,73 @@
+import re
+
+from telegram import Message
+
+_re_hanzi_run = re.compile(r"[\u4e00-\u9fff]+")
+
+
+def count_hanzi(text: str) -> int:
+    """统计文本中的中文字符数量"""
+    if text.isascii():
+        # 纯 ASCII 文本无需正则扫描
+        return 0
+    # 聊天内容中的中文通常是连续的，按连续片段匹配比逐字匹配快得多
+    return sum(map(len, _re_hanzi_run.findall(text)))
+
+
+def hanzi_at_least(count: int) -> re.Pattern:
+    """编译判断「至少包含 `count` 个中文字符」的正则，使用 `match`，找到第 `count` 个中文字符即停止"""
+    return re.compile(rf"(?:[^\u4e00-\u9fff]*[\u4e00-\u9fff]){{{count}}}")
+
+
+class MessageFeatures:
+    """
+    消息特征，由派发器为每条群组消息创建一次，供匹配表与所有群组消息处理器共享。
+
+    所有字段都在读取时才计算，需要扫描文本的字段 (如 `hanzi_count`) 计算后保存，没有处理器用到时不会扫描文本。
+    匹配表判断中文字符数量时找到足够的字符即停止，不经过 `hanzi_count`。
+    """
+
+    __slots__ = ("message", "_hanzi_count")
+
+    message: Message
+    _hanzi_count: int | None
+
+    def __init__(self, message: Message):
+        self.message = message
+        self._hanzi_count = None
+
+    @staticmethod
+    def from_message(message: Message) -> "MessageFeatures":
+        return MessageFeatures(message)
+
+    @property
+    def text(self) -> str:
+        """消息文本，没有文本时为空字符串 (不使用图片/文件的说明文字)"""
+        return self.message.text or ""
+
+    @property
+    def hanzi_source(self) -> str:
+        """统计中文字符数量的文本：没有文本时使用图片/文件的说明文字 (与静默加分一直以来的规则一致)"""
+        return self.message.text or self.message.caption or ""
+
+    @property
+    def hanzi_count(self) -> int:
+        """`hanzi_source` 中的中文字符数量，第一次读取时计算"""
+        if self._hanzi_count is None:
+            self._hanzi_count = count_hanzi(self.hanzi_source)
+        return self._hanzi_count
+
+    @property
+    def has_document(self) -> bool:
+        """是否带有文件"""
+        return self.message.document is not None
+
+    @property
+    def user_id(self) -> int:
+        """发送者 ID"""
+        return self.message.from_user.id if self.message.from_user else 0
+
+    @property
+    def chat_id(self) -> int:
+        """会话 ID"""
+        return self.message.chat_id
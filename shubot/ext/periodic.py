@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    后台周期任务：每隔 `interval` 秒执行一次 `func`。
+
+    - 可通过 `trigger` 提前唤醒执行；
+    - `stop` 时若 `run_on_stop` 为真，会再执行一次，用于排空缓冲数据。
+    """
+
+    _name: str
+    _interval: float
+    _func: Callable[[], Awaitable[None]]
+    _run_on_stop: bool
+    _task: asyncio.Task | None
+    _wakeup: asyncio.Event | None
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable[None]], run_on_stop: bool = False):
+        self._name = name
+        self._interval = interval
+        self._func = func
+        self._run_on_stop = run_on_stop
+        self._task = None
+        self._wakeup = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """启动后台任务，重复调用无副作用"""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop(), name=self._name)
+
+    def trigger(self):
+        """提前唤醒，立即执行一次"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def stop(self):
+        """停止后台任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._run_on_stop:
+            await self._run_once()
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._run_once()
+
+    async def _run_once(self):
+        try:
+            await self._func()
+        except Exception as ex:
+            logger.exception(f"周期任务 {self._name} 执行失败: {str(ex)}")
@@ -0,0 +1,313 @@
+import asyncio
+import enum
+import heapq
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Coroutine
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from shubot.config import RateLimitConfig
+from shubot.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SendPriority(enum.IntEnum):
+    """发送优先级，数值越小越优先"""
+
+    INTERACTIVE = 0
+    """直接回复用户操作的消息，如指令回复、按钮回调后的编辑"""
+    NORMAL = 1
+    """普通消息"""
+    COSMETIC = 2
+    """装饰性消息，如庆祝消息，可以延后发送"""
+
+
+_THROTTLED_ENDPOINTS = frozenset(
+    {
+        "sendMessage",
+        "sendDice",
+        "sendPhoto",
+        "sendDocument",
+        "sendSticker",
+        "sendAnimation",
+        "copyMessage",
+        "forwardMessage",
+        "editMessageText",
+        "editMessageCaption",
+        "editMessageReplyMarkup",
+    }
+)
+"""会在会话中产生 (或修改) 消息、受 Telegram 频率限制的接口"""
+
+_BUCKET_SWEEP_MIN = 1024
+"""会话令牌桶数量超过该值时才回收空闲的令牌桶"""
+
+
+class _TokenBucket:
+    """令牌桶"""
+
+    rate: float
+    """每秒补充的令牌数"""
+    capacity: float
+    tokens: float
+    updated_at: float
+    blocked_until: float
+    """收到 RetryAfter 后暂停到该时间"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """距离可以取出一个令牌还需要等待的时间"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    @property
+    def idle(self) -> bool:
+        """桶已满且未被暂停，可以回收"""
+        return self.tokens >= self.capacity and self.blocked_until <= self.updated_at
+
+
+class _Waiter:
+    __slots__ = ("chat_id", "priority", "future", "enqueued_at")
+
+    def __init__(self, chat_id: int | None, priority: SendPriority):
+        self.chat_id = chat_id
+        self.priority = priority
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class OutboundRateLimiter(BaseRateLimiter[SendPriority]):
+    """
+    出站消息限流器，通过 `ApplicationBuilder.rate_limiter` 接入，所有 Bot API 请求都会经过这里。
+
+    - 全局与每个会话各有一个令牌桶 (默认群组每分钟 20 条，私聊每秒 1 条，全局每秒 30 条)；
+    - 排队的请求按优先级发送，同一会话内保持先后顺序；
+    - 收到 RetryAfter 时暂停对应会话 (或全局) 并自动重试。
+
+    调用 Bot 方法时可通过 `rate_limit_args=SendPriority.COSMETIC` 指定优先级。
+    未指定时，回复消息与编辑消息视为 INTERACTIVE，其余为 NORMAL。
+    """
+
+    _config: RateLimitConfig
+    _global_bucket: _TokenBucket
+    _chat_buckets: dict[int, _TokenBucket]
+    _bucket_sweep_at: int
+    """令牌桶数量超过该值时回收空闲的令牌桶"""
+    _queues: dict[SendPriority, dict[int | None, deque[_Waiter]]]
+    """每个优先级中各会话排队的请求，同一会话内先进先出"""
+    _ready: dict[SendPriority, list[tuple[float, int, int | None]]]
+    """每个优先级中有排队请求的会话，按 (最早可发送时间, 序号, 会话) 组成的最小堆，每个会话只出现一次"""
+    _seq: int
+    _queued: int
+    _wakeup: asyncio.Event | None
+    _task: asyncio.Task | None
+
+    def __init__(self, config: RateLimitConfig | None = None):
+        self._config = config or RateLimitConfig()
+        self._global_bucket = _TokenBucket(self._config.global_rate, self._config.global_rate)
+        self._chat_buckets = {}
+        self._bucket_sweep_at = _BUCKET_SWEEP_MIN
+        self._queues = {p: {} for p in SendPriority}
+        self._ready = {p: [] for p in SendPriority}
+        self._seq = 0
+        self._queued = 0
+        self._wakeup = None
+        self._task = None
+
+        metrics.gauge("outbound.queued", lambda: self._queued)
+
+    async def initialize(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._dispatch_loop(), name="outbound-rate-limiter")
+
+    async def shutdown(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # 放行所有仍在排队的请求，避免调用方永远等待
+        for queues in self._queues.values():
+            for queue in queues.values():
+                for waiter in queue:
+                    if not waiter.future.done():
+                        waiter.future.set_result(None)
+            queues.clear()
+        for heap in self._ready.values():
+            heap.clear()
+        self._queued = 0
+
+    def _chat_bucket(self, chat_id: int) -> _TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = _TokenBucket(self._config.group_per_minute / 60, self._config.group_burst)
+            else:
+                bucket = _TokenBucket(self._config.private_rate, self._config.private_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    @staticmethod
+    def _get_chat_id(data: dict[str, Any]) -> int | None:
+        chat_id = data.get("chat_id")
+        if isinstance(chat_id, int):
+            return chat_id
+        if isinstance(chat_id, str) and chat_id.lstrip("-").isdigit():
+            return int(chat_id)
+        return None
+
+    @staticmethod
+    def _default_priority(endpoint: str, data: dict[str, Any]) -> SendPriority:
+        if endpoint.startswith("edit") or data.get("reply_parameters") or data.get("reply_to_message_id"):
+            return SendPriority.INTERACTIVE
+        return SendPriority.NORMAL
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, bool | dict[str, Any] | list[dict[str, Any]]]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: SendPriority | None,
+    ) -> bool | dict[str, Any] | list[dict[str, Any]]:
+        chat_id = self._get_chat_id(data)
+        throttled = endpoint in _THROTTLED_ENDPOINTS
+        priority = rate_limit_args if rate_limit_args is not None else self._default_priority(endpoint, data)
+
+        for attempt in range(self._config.max_retries + 1):
+            if throttled and self._task is not None:
+                await self._acquire(chat_id, priority)
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as ex:
+                metrics.inc("outbound.retry_after")
+                retry_after = ex.retry_after
+                if hasattr(retry_after, "total_seconds"):
+                    # 新版本 python-telegram-bot 中为 timedelta
+                    retry_after = retry_after.total_seconds()
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self._global_bucket
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + retry_after + 0.1)
+                logger.warning(f"触发频率限制 (endpoint={endpoint}, chat={chat_id})，{retry_after} 秒后重试")
+                if attempt == self._config.max_retries:
+                    raise
+                if not throttled or self._task is None:
+                    await asyncio.sleep(retry_after + 0.1)
+
+        raise RuntimeError("unreachable")
+
+    def _schedule(self, priority: SendPriority, chat_id: int | None, eligible_at: float):
+        self._seq += 1
+        heapq.heappush(self._ready[priority], (eligible_at, self._seq, chat_id))
+
+    async def _acquire(self, chat_id: int | None, priority: SendPriority):
+        waiter = _Waiter(chat_id, priority)
+        queue = self._queues[priority].get(chat_id)
+        if queue is None:
+            queue = self._queues[priority][chat_id] = deque()
+            self._schedule(priority, chat_id, waiter.enqueued_at)
+        queue.append(waiter)
+        self._queued += 1
+        self._wakeup.set()
+        await waiter.future
+
+        wait = time.monotonic() - waiter.enqueued_at
+        metrics.histogram("outbound.wait").observe(wait)
+        metrics.histogram(f"outbound.wait.{priority.name.lower()}").observe(wait)
+
+    def _pop_waiter(self, queue: deque[_Waiter]) -> _Waiter | None:
+        """取出会话中第一个仍在等待的请求，跳过已取消的请求"""
+        while queue:
+            waiter = queue.popleft()
+            self._queued -= 1
+            if not waiter.future.done():
+                return waiter
+        return None
+
+    def _dispatch(self, now: float) -> float | None:
+        """
+        放行当前可以发送的请求，返回下次需要检查的等待时间。没有排队的请求时返回 None。
+
+        只检查最早可发送时间已到的会话，仍在等待令牌的会话不会被访问，队列积压时每次唤醒的开销与放行的请求数相当。
+        """
+        global_wait = 0.0
+        for priority in SendPriority:
+            heap = self._ready[priority]
+            queues = self._queues[priority]
+            while heap and heap[0][0] <= now:
+                global_wait = self._global_bucket.wait_time(now)
+                if global_wait > 0:
+                    break
+
+                _, _, chat_id = heapq.heappop(heap)
+                queue = queues[chat_id]
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else None
+                wait = bucket.wait_time(now) if bucket is not None else 0.0
+                if wait > 0:
+                    # 收到 RetryAfter 或令牌被其他优先级的请求取走，推迟到实际可发送的时间
+                    self._schedule(priority, chat_id, now + wait)
+                    continue
+
+                waiter = self._pop_waiter(queue)
+                if waiter is not None:
+                    self._global_bucket.take()
+                    if bucket is not None:
+                        bucket.take()
+                    waiter.future.set_result(None)
+
+                if queue:
+                    # 同一时间可发送的会话按序号轮流放行
+                    self._schedule(priority, chat_id, now + (bucket.wait_time(now) if bucket is not None else 0.0))
+                else:
+                    del queues[chat_id]
+
+            if global_wait > 0:
+                break
+
+        self._sweep_buckets()
+
+        heads = [heap[0][0] for heap in self._ready.values() if heap]
+        if not heads:
+            return None
+        return max(global_wait, min(heads) - now, 0.0)
+
+    def _sweep_buckets(self):
+        """回收空闲会话的令牌桶，空闲的令牌桶与新建的令牌桶状态相同"""
+        if len(self._chat_buckets) <= self._bucket_sweep_at:
+            return
+        for chat_id in [c for c, b in self._chat_buckets.items() if b.idle]:
+            del self._chat_buckets[chat_id]
+        # 回收后仍有大量令牌桶时提高阈值，避免每次唤醒都扫描全部令牌桶
+        self._bucket_sweep_at = max(_BUCKET_SWEEP_MIN, len(self._chat_buckets) * 2)
+
+    async def _dispatch_loop(self):
+        while True:
+            self._wakeup.clear()
+            timeout = self._dispatch(time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
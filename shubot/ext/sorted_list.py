@@ -0,0 +1,169 @@
+from bisect import bisect_left, insort
+from typing import Generic, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class SortedList(Generic[T]):
+    """
+    有序列表，用于较大的排行榜。
+
+    元素分为若干个有序的小段 (每段不超过 `2 * load` 个)，另用树状数组 (Fenwick tree) 记录各段的长度：
+
+    - 插入、删除：二分查找所在的段，在段内插入或删除，并更新树状数组，O(log n + load)；
+    - 查找元素的位置、按位置读取元素：O(log n)。
+
+    `bisect.insort` 作用于单个 Python 列表时需要移动插入点之后的所有元素，大群组中每次积分变化都是 O(n)。
+    """
+
+    load: int
+    """每段的目标长度，超过两倍时拆分，不足一半时与相邻段合并"""
+    _lists: list[list[T]]
+    """各段的元素，均不为空"""
+    _maxes: list[T]
+    """各段的最大元素"""
+    _tree: list[int]
+    """各段长度的树状数组，下标从 1 开始"""
+    _len: int
+
+    def __init__(self, load: int = 512):
+        self.load = load
+        self._lists = []
+        self._maxes = []
+        self._tree = [0]
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[T]:
+        for part in self._lists:
+            yield from part
+
+    def _rebuild(self):
+        """段的数量变化后重建树状数组，O(段数)"""
+        size = len(self._lists)
+        tree = [0] * (size + 1)
+        for i, part in enumerate(self._lists, 1):
+            tree[i] += len(part)
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, pos: int, delta: int):
+        i = pos + 1
+        size = len(self._tree) - 1
+        while i <= size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, pos: int) -> int:
+        """前 `pos` 段的元素总数"""
+        total = 0
+        while pos > 0:
+            total += self._tree[pos]
+            pos -= pos & -pos
+        return total
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """将位置转换为 (段序号, 段内位置)"""
+        pos = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= index:
+                pos = nxt
+                index -= self._tree[nxt]
+            step >>= 1
+        return pos, index
+
+    def add(self, value: T):
+        if not self._lists:
+            self._lists.append([value])
+            self._maxes.append(value)
+            self._rebuild()
+            self._len = 1
+            return
+
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._lists[pos].append(value)
+            self._maxes[pos] = value
+        else:
+            insort(self._lists[pos], value)
+        self._len += 1
+
+        if len(self._lists[pos]) > 2 * self.load:
+            self._split(pos)
+            self._rebuild()
+        else:
+            self._tree_add(pos, 1)
+
+    def _split(self, pos: int):
+        """将过长的段拆分为两段，调用方负责重建树状数组"""
+        part = self._lists[pos]
+        self._lists.insert(pos + 1, part[self.load :])
+        del part[self.load :]
+        self._maxes[pos] = part[-1]
+        self._maxes.insert(pos + 1, self._lists[pos + 1][-1])
+
+    def remove(self, value: T) -> bool:
+        """移除一个等于 `value` 的元素，不存在时返回 False"""
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return False
+        part = self._lists[pos]
+        i = bisect_left(part, value)
+        if part[i] != value:
+            return False
+
+        del part[i]
+        self._len -= 1
+        if len(part) >= self.load // 2 or (len(self._lists) == 1 and part):
+            self._maxes[pos] = part[-1]
+            self._tree_add(pos, -1)
+            return True
+
+        # 段过短时与相邻段合并，避免出现大量很短的段
+        if not part:
+            del self._lists[pos]
+            del self._maxes[pos]
+        else:
+            merged = pos - 1 if pos > 0 else 0
+            self._lists[merged] += self._lists.pop(merged + 1)
+            del self._maxes[merged + 1]
+            self._maxes[merged] = self._lists[merged][-1]
+            if len(self._lists[merged]) > 2 * self.load:
+                self._split(merged)
+        self._rebuild()
+        return True
+
+    def index(self, value: T) -> int | None:
+        """元素的位置，不存在时返回 None"""
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return None
+        part = self._lists[pos]
+        i = bisect_left(part, value)
+        if part[i] != value:
+            return None
+        return self._prefix(pos) + i
+
+    def __getitem__(self, index: int) -> T:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("SortedList index out of range")
+        pos, offset = self._locate(index)
+        return self._lists[pos][offset]
+
+    def head(self, limit: int) -> list[T]:
+        """前 `limit` 个元素"""
+        result = []
+        for part in self._lists:
+            if len(result) >= limit:
+                break
+            result.extend(part[: limit - len(result)])
+        return result
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from shubot.metrics import metrics
+
+
+@dataclass
+class _OrderedQueue:
+    """同一会话 (群组/用户) 的更新队列"""
+
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    depth: int = field(default=0)
+    """排队中 (含正在处理) 的更新数量"""
+    last_wait: float = field(default=0.0)
+    """最近一次更新从入队到开始处理的等待时间，单位为秒"""
+    max_wait: float = field(default=0.0)
+    """队列存续期间的最长等待时间，单位为秒"""
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    按会话保序的并发更新处理器。
+
+    - 不同群组的更新并发处理，同一群组内的更新严格按到达顺序处理；
+    - 按钮回调按点击的用户保序 (回调可能来自不同群组的消息)；
+    - `max_concurrent_updates` 限制同时执行的更新数量，`max_pending_updates` 限制排队的更新总数。
+    """
+
+    _running: asyncio.BoundedSemaphore
+    _running_count: int
+    _queues: dict[tuple[str, int], _OrderedQueue]
+
+    def __init__(self, max_concurrent_updates: int, max_pending_updates: int):
+        # 基类的信号量用于限制排队总数，真正执行的数量由 `_running` 限制
+        super().__init__(max(max_pending_updates, max_concurrent_updates))
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._running_count = 0
+        self._queues = {}
+
+        metrics.gauge("updates.pending", lambda: self.current_concurrent_updates)
+        metrics.gauge("updates.running", lambda: self.running_updates)
+        metrics.gauge("updates.queues", lambda: len(self._queues))
+
+    @property
+    def running_updates(self) -> int:
+        """正在执行的更新数量"""
+        return self._running_count
+
+    @staticmethod
+    def _order_key(update: object) -> tuple[str, int] | None:
+        """获取更新的保序键，返回 None 表示无需保序"""
+        if not isinstance(update, Update):
+            return None
+        if update.callback_query:
+            return "user", update.callback_query.from_user.id
+        if update.effective_chat:
+            return "chat", update.effective_chat.id
+        if update.effective_user:
+            return "user", update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._order_key(update)
+        if key is None:
+            async with self._running:
+                await self._run(coroutine)
+            return
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _OrderedQueue()
+
+        queue.depth += 1
+        enqueued_at = time.monotonic()
+        try:
+            # asyncio.Lock 按等待顺序唤醒，保证同一会话内的处理顺序
+            async with queue.lock:
+                async with self._running:
+                    wait = time.monotonic() - enqueued_at
+                    queue.last_wait = wait
+                    queue.max_wait = max(queue.max_wait, wait)
+                    metrics.histogram("updates.wait").observe(wait)
+                    await self._run(coroutine)
+        finally:
+            queue.depth -= 1
+            if queue.depth == 0:
+                del self._queues[key]
+
+    async def _run(self, coroutine: Awaitable[Any]):
+        self._running_count += 1
+        try:
+            await coroutine
+        finally:
+            self._running_count -= 1
+
+    def queue_stats(self, limit: int = 10) -> list[tuple[tuple[str, int], int, float, float]]:
+        """按排队深度降序，获取各会话的 (保序键, 排队深度, 最近等待时间, 最长等待时间)"""
+        stats = [(key, q.depth, q.last_wait, q.max_wait) for key, q in self._queues.items()]
+        stats.sort(key=lambda item: item[1], reverse=True)
+        return stats[:limit]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
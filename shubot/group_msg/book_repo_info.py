@@ -6,13 +6,18 @@ from telegram.ext import ContextTypes
 from telegram.helpers import escape_markdown
 
 from shubot.ext.group_msg_handler import GroupMsgHandlerMixin, GroupMessageHandleResult
+from shubot.ext.group_msg_match import ExactText
+from shubot.ext.msg_features import MessageFeatures
 
 
 class BookRepoInfoHandler(GroupMsgHandlerMixin):
-    async def handle_group_msg(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    may_stop = True
+
+    def match_rules(self):
+        return (ExactText("书库"),)
+
+    async def handle_group_msg(self, update: Update, context: ContextTypes.DEFAULT_TYPE, features: MessageFeatures):
         message = cast(Message, update.message)
-        if message.text.strip() != "书库":
-            return None
 
         # 显示书库信息
         book_repo = self._config.book.book_repo_template.format(
@@ -0,0 +1,114 @@
+import bisect
+from typing import Callable
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+"""默认的直方图桶边界，单位为秒"""
+
+
+class Histogram:
+    """
+    固定桶边界的直方图，用于统计耗时等分布。
+
+    每个桶记录「小于等于边界」的观测次数，最后一个桶记录超出所有边界的次数。
+    """
+
+    _buckets: tuple[float, ...]
+    _counts: list[int]
+    count: int
+    total: float
+    max: float
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """记录一次观测值"""
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """根据桶边界估算分位数 (返回所在桶的上边界)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self._buckets, self._counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return self.max
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class MetricsRegistry:
+    """进程内的指标注册表：计数器、直方图与按需读取的仪表盘 (gauge)"""
+
+    _counters: dict[str, int]
+    _histograms: dict[str, Histogram]
+    _gauges: dict[str, Callable[[], float]]
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def inc(self, name: str, value: int = 1):
+        """累加计数器"""
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def histogram(self, name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """获取 (或创建) 指定名称的直方图"""
+        hist = self._histograms.get(name)
+        if hist is None:
+            hist = self._histograms[name] = Histogram(buckets)
+        return hist
+
+    def gauge(self, name: str, reader: Callable[[], float]):
+        """注册一个仪表盘，读取时调用 `reader` 获取当前值"""
+        self._gauges[name] = reader
+
+    def snapshot(self) -> dict[str, dict]:
+        return {
+            "counters": dict(self._counters),
+            "gauges": {name: reader() for name, reader in self._gauges.items()},
+            "histograms": {name: hist.snapshot() for name, hist in self._histograms.items()},
+        }
+
+    def format_text(self) -> str:
+        """将当前指标格式化为纯文本"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name} = {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"{name} = {value:g}")
+        for name, hist in sorted(snapshot["histograms"].items()):
+            lines.append(
+                f"{name}: n={hist['count']} mean={hist['mean'] * 1000:.1f}ms "
+                f"p95={hist['p95'] * 1000:.1f}ms max={hist['max'] * 1000:.1f}ms"
+            )
+        return "\n".join(lines)
+
+
+metrics = MetricsRegistry()
+"""全局指标注册表"""
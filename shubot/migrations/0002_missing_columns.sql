@@ -0,0 +1,9 @@
+-- 旧的表结构中缺少、但代码已在使用的列
+
+-- 最后签到日期 (签到存储过程与启动时加载今日签到使用)
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS last_checkin DATE NULL;
+
+-- 用户显示名称 (由名称缓存写入)
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS full_name VARCHAR(255) NULL;
@@ -0,0 +1,18 @@
+-- 热点查询的索引。使用 `python -m benchmarks.explain_queries` 检查各查询的执行计划。
+-- 按主键 / 唯一键 user_id 查找的查询无需额外索引。
+
+-- 群组排行榜：按群组读取全部成员 (LeaderboardModel._fetch_group)。
+-- 唯一键 (user_id, group_id) 无法按 group_id 查找；此索引同时覆盖 user_id，无需回表。
+CREATE INDEX IF NOT EXISTS idx_user_group_group ON user_group (group_id, user_id);
+
+-- 启动时加载今日已签到的用户 (CheckinCommand._load_checkins)，覆盖索引
+CREATE INDEX IF NOT EXISTS idx_users_last_checkin ON users (last_checkin, user_id);
+
+-- 猫娘：启动及跨日时加载当日全部契约
+CREATE INDEX IF NOT EXISTS idx_slave_records_date ON slave_records (created_date);
+
+-- 猫娘：按 (slave_id, created_date) 确认契约，按 (slave_id, group_id, created_date) 查找契约
+CREATE INDEX IF NOT EXISTS idx_slave_records_slave ON slave_records (slave_id, created_date, group_id);
+
+-- 授权群组版本戳 MAX(added_at) (GroupAuthModel.refresh 定期执行)
+CREATE INDEX IF NOT EXISTS idx_authorized_groups_added_at ON authorized_groups (added_at);
@@ -0,0 +1,40 @@
+-- 全服排行榜 (LeaderboardModel.global_page) 按 (境界, 积分, 用户 ID) 分页。
+-- 境界与积分分属两张表时无法使用索引，每次翻页都需要连接全表并排序。
+-- 因此在 users 中冗余保存境界，由触发器与 user_cultivation 保持同步，排序键落在同一个索引中。
+
+-- 冗余的境界，没有修仙档案时为 -1 (NO_CULTIVATION)
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS cultivation_stage INT NOT NULL DEFAULT -1;
+
+-- user_cultivation 有指向 users 的外键，新建的用户不会已有修仙档案，users 上无需触发器
+CREATE OR REPLACE TRIGGER trg_user_cultivation_insert
+    AFTER INSERT
+    ON user_cultivation
+    FOR EACH ROW
+    UPDATE users
+    SET cultivation_stage = IFNULL(NEW.stage, 0)
+    WHERE user_id = NEW.user_id;
+
+CREATE OR REPLACE TRIGGER trg_user_cultivation_update
+    AFTER UPDATE
+    ON user_cultivation
+    FOR EACH ROW
+    UPDATE users
+    SET cultivation_stage = IFNULL(NEW.stage, 0)
+    WHERE user_id = NEW.user_id
+      AND cultivation_stage != IFNULL(NEW.stage, 0);
+
+CREATE OR REPLACE TRIGGER trg_user_cultivation_delete
+    AFTER DELETE
+    ON user_cultivation
+    FOR EACH ROW
+    UPDATE users
+    SET cultivation_stage = -1
+    WHERE user_id = OLD.user_id;
+
+-- 触发器建立之后再回填已有数据，期间的写入由触发器同步
+UPDATE users u
+    LEFT JOIN user_cultivation uc ON u.user_id = uc.user_id
+SET u.cultivation_stage = IF(uc.user_id IS NULL, -1, IFNULL(uc.stage, 0));
+
+CREATE INDEX IF NOT EXISTS idx_users_global_rank ON users (cultivation_stage, points, user_id);
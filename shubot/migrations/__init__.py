@@ -0,0 +1,118 @@
+"""
+数据库迁移。
+
+本目录下的 `NNNN_说明.sql` 文件按编号顺序执行，已执行的编号记录在 `shubot_migrations` 表中。
+机器人启动时自动执行尚未执行的迁移，也可以单独执行：
+
+    python -m shubot.migrations -c config.yaml
+    python -m shubot.migrations -c config.yaml --status
+
+MariaDB 的 DDL 语句不在事务中，迁移中途失败时已执行的语句不会回滚，
+因此迁移中的语句需要可以重复执行 (`IF NOT EXISTS` 等)。已发布的迁移文件不应再修改，需要变更时添加新的迁移。
+"""
+
+import logging
+import re
+from datetime import datetime
+from os import listdir, path
+from typing import TYPE_CHECKING, NamedTuple
+
+from shubot.model.schema import execute_script, named_lock
+
+if TYPE_CHECKING:
+    from shubot.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = path.dirname(path.abspath(__file__))
+
+_LOCK_TIMEOUT = 300
+"""等待其他进程执行迁移的时间上限，单位为秒"""
+
+_re_migration = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+
+class Migration(NamedTuple):
+    """一个迁移文件"""
+
+    version: int
+    name: str
+    path: str
+
+    def read(self) -> str:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+def discover() -> list[Migration]:
+    """按编号顺序列出所有迁移文件"""
+    migrations = []
+    for filename in listdir(MIGRATIONS_DIR):
+        m = _re_migration.match(filename)
+        if m:
+            migrations.append(Migration(int(m.group(1)), m.group(2), path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort()
+
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"迁移编号重复: {versions}")
+    return migrations
+
+
+class MigrationRunner:
+    """按顺序执行尚未执行的迁移。执行期间持有数据库级别的锁，多个进程同时启动时只有一个会执行迁移。"""
+
+    _db: "DatabaseManager"
+
+    def __init__(self, db: "DatabaseManager"):
+        self._db = db
+
+    async def _ensure_table(self):
+        await self._db.update(
+            """
+                CREATE TABLE IF NOT EXISTS shubot_migrations
+                (
+                    version    INT          NOT NULL PRIMARY KEY,
+                    name       VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP    NOT NULL DEFAULT UTC_TIMESTAMP()
+                )
+            """
+        )
+
+    async def status(self) -> list[tuple[Migration, datetime | None]]:
+        """所有迁移及其执行时间，未执行的为 None。迁移只用于 MySQL / MariaDB，其他后端返回空列表。"""
+        if self._db.dialect != "mysql":
+            return []
+        await self._ensure_table()
+        rows = await self._db.find_many("SELECT version, applied_at FROM shubot_migrations")
+        applied = dict(rows)
+        return [(m, applied.get(m.version)) for m in discover()]
+
+    async def migrate(self) -> list[Migration]:
+        """执行尚未执行的迁移，返回本次执行的迁移"""
+        if all(applied_at is not None for _, applied_at in await self.status()):
+            return []
+
+        # 使用独立的连接，锁与该连接绑定
+        conn = await self._db.acquire_connection()
+        try:
+            async with conn.cursor() as cursor, named_lock(cursor, "shubot_migrations", _LOCK_TIMEOUT):
+                # 等待锁期间，其他进程可能已经执行了迁移
+                await cursor.execute("SELECT version FROM shubot_migrations")
+                applied = {version for (version,) in await cursor.fetchall()}
+
+                done = []
+                for migration in discover():
+                    if migration.version in applied:
+                        continue
+                    logger.info(f"执行数据库迁移 {migration.version:04d}_{migration.name}")
+                    await execute_script(cursor, migration.read())
+                    await cursor.execute(
+                        "INSERT INTO shubot_migrations (version, name) VALUES (%s, %s)",
+                        (migration.version, migration.name),
+                    )
+                    await conn.commit()
+                    done.append(migration)
+                return done
+        finally:
+            await self._db.release_connection(conn)
@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+import logging
+
+from mashumaro.codecs.yaml import yaml_decode
+
+from shubot.config import Config
+from shubot.database import DatabaseManager
+from shubot.migrations import MigrationRunner
+
+logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+
+async def run(config_path: str, status_only: bool):
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml_decode(f.read(), Config)
+
+    db = DatabaseManager.get_instance()
+    await db.open_pool(config.db)
+    try:
+        runner = MigrationRunner(db)
+        if not status_only:
+            await runner.migrate()
+        for migration, applied_at in await runner.status():
+            state = applied_at.isoformat(sep=" ") if applied_at else "未执行"
+            print(f"{migration.version:04d}_{migration.name}: {state}")
+    finally:
+        await db.close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m shubot.migrations", description="执行数据库迁移")
+    parser.add_argument("-c", "--config", help="config file path", default="config.yaml")
+    parser.add_argument("--status", help="只显示迁移状态，不执行", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.config, args.status))
+
+
+if __name__ == "__main__":
+    main()
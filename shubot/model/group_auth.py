@@ -1,27 +1,60 @@
-from typing import TYPE_CHECKING
+import logging
+from typing import TYPE_CHECKING, Any
 
-from async_lru import alru_cache
+from shubot.ext.periodic import PeriodicTask
 
 if TYPE_CHECKING:
     from shubot.database import DatabaseManager
 
+logger = logging.getLogger(__name__)
+
 
 class GroupAuthModel:
     """群组验证模型"""
 
     _db: "DatabaseManager"
+    _authorized: frozenset[int]
+    """已授权的群组 ID，启动时从数据库完整加载"""
+    _version: tuple[Any, ...] | None
+    """授权表的版本戳 (行数, 最后添加时间)，用于发现其他进程所做的修改"""
+    _refresh_task: PeriodicTask | None
 
     def __init__(self, db: "DatabaseManager"):
         self._db = db
+        self._authorized = frozenset()
+        self._version = None
+        self._refresh_task = None
 
     async def init(self):
-        pass
+        await self.reload()
+        self._refresh_task = PeriodicTask(
+            "group-auth-refresh", self._db.config.group_auth_refresh_interval, self.refresh
+        )
+        self._refresh_task.start()
+
+    async def close(self):
+        if self._refresh_task:
+            await self._refresh_task.stop()
+
+    async def _fetch_version(self) -> tuple[Any, ...]:
+        return tuple(await self._db.find_one("SELECT COUNT(*), MAX(added_at) FROM authorized_groups"))
+
+    async def reload(self):
+        """从数据库完整加载授权群组列表"""
+        version = await self._fetch_version()
+        rows = await self._db.find_many("SELECT group_id FROM authorized_groups")
+        self._authorized = frozenset(group_id for (group_id,) in rows)
+        self._version = version
+        logger.info(f"已加载 {len(self._authorized)} 个授权群组")
+
+    async def refresh(self):
+        """检查授权表的版本戳，若是有变化 (例如其他进程修改了授权) 则重新加载"""
+        if await self._fetch_version() != self._version:
+            await self.reload()
 
-    @alru_cache(16)
-    async def is_group_authorized(self, group_id: int):
-        """检查群组是否已授权。该方法会缓存结果，以减少数据库查询次数来提高性能。"""
-        result = await self._db.find_one("SELECT added_at FROM authorized_groups WHERE group_id = %s", (group_id,))
-        return bool(result)
+    def is_group_authorized(self, group_id: int) -> bool:
+        """检查群组是否已授权。仅查询内存中的授权列表，不访问数据库。"""
+        return group_id in self._authorized
 
     async def set_group_auth(self, group_id: int, group_name: str = "", auth: bool = False):
         """设置群组授权状态"""
@@ -36,6 +69,7 @@ class GroupAuthModel:
                 """,
                 (group_id, group_name, group_name),
             )
+            self._authorized = self._authorized | {group_id}
         else:
             rowcount = await self._db.update(
                 """
@@ -43,9 +77,11 @@ class GroupAuthModel:
                     """,
                 (group_id,),
             )
+            self._authorized = self._authorized - {group_id}
 
-        # 清除授权状态缓存
-        self.is_group_authorized.cache_invalidate(group_id)
+        # 重新完整加载，而不是只更新版本戳：期间其他进程的修改也会改变版本戳，只记下版本戳会漏掉这些修改。
+        # 授权修改很少发生，完整加载的开销可以接受。
+        await self.reload()
         return rowcount > 0
 
     async def allow_group(self, group_id: int, name: str):
@@ -0,0 +1,441 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Iterator, NamedTuple
+
+from shubot.ext.periodic import PeriodicTask
+from shubot.ext.sorted_list import SortedList
+from shubot.metrics import metrics
+
+if TYPE_CHECKING:
+    from shubot.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+NO_CULTIVATION = -1
+"""没有修仙档案 (`user_cultivation` 中无记录) 时使用的境界值，排在境界 0 之后"""
+
+RankKey = tuple[int, int, int]
+"""排序键 (-境界, -积分, 用户 ID)，升序即为排行榜顺序"""
+
+GlobalCursor = tuple[int, int, int]
+"""全服排行榜的分页游标：页面边界条目的 (境界, 积分, 用户 ID)"""
+
+
+def _rank_key(user_id: int, score: tuple[int, int]) -> RankKey:
+    return -score[0], -score[1], user_id
+
+
+class GroupRank(NamedTuple):
+    """用户在群组排行榜中的名次"""
+
+    rank: int
+    """名次，从 1 开始"""
+    total: int
+    """上榜人数"""
+    score: tuple[int, int]
+    """用户自己的 (境界, 积分)"""
+    above: tuple[int, int] | None
+    """前一名的 (境界, 积分)，第一名时为 None"""
+
+    def points_to_next(self) -> int | None:
+        """与前一名境界相同时，超过前一名还需要的积分；境界不同或已是第一名时为 None"""
+        if self.above is None or self.above[0] != self.score[0]:
+            return None
+        return self.above[1] - self.score[1] + 1
+
+
+class _GroupBoard:
+    """单个群组的排行榜"""
+
+    members: set[int]
+    """群组内的全部成员 (`user_group`)，包括尚无积分帐号的用户"""
+    ranked: SortedList[RankKey]
+    """有积分帐号的成员，按排序键升序排列。积分变化时的删除与插入都是 O(log n)，大群组中也不需要移动整个列表"""
+
+    def __init__(self):
+        self.members = set()
+        self.ranked = SortedList()
+
+    def insert(self, key: RankKey):
+        self.ranked.add(key)
+
+    def remove(self, key: RankKey):
+        self.ranked.remove(key)
+
+    def index(self, key: RankKey) -> int | None:
+        """排序键的位置，不存在时返回 None"""
+        return self.ranked.index(key)
+
+
+class LeaderboardModel:
+    """
+    群组排行榜模型。
+
+    首次查询某个群组时从数据库完整加载，之后随积分与境界的修改增量维护，排行榜与帮主查询直接读取内存。
+    积分为「数据库中的值 + 尚未写入的缓冲」，与 `UserModel.get_points` 一致。
+    后台会定期与数据库核对，修正遗漏的修改 (例如其他进程的写入)。
+
+    读取数据库 (加载群组、核对、重新读取分数) 期间仍会收到修改通知，读取结果可能比内存中的旧。
+    因此每次修改都有一个递增的序号，读取期间被修改过的用户不使用读取结果，以内存为准或稍后重新读取。
+    """
+
+    _db: "DatabaseManager"
+    _scores: dict[int, tuple[int, int]]
+    """已加载用户的 (境界, 积分)"""
+    _groups: dict[int, _GroupBoard]
+    """已加载的群组"""
+    _user_groups: dict[int, set[int]]
+    """用户所在的已加载群组"""
+    _loading: dict[int, asyncio.Future]
+    """正在加载的群组，用于合并并发的加载请求"""
+    _refreshing: set[int]
+    """等待从数据库重新读取分数的用户"""
+    _write_seq: int
+    """修改通知的序号，每次修改加一"""
+    _written: dict[int, int]
+    """读取数据库期间被修改的用户及其最后一次修改的序号，没有进行中的读取时清空"""
+    _db_reads: int
+    """进行中的数据库读取数量"""
+    _queued_members: dict[int, set[int]]
+    """群组加载期间加入的成员，加载完成后合并"""
+    _global_listeners: list[Callable[[], None]]
+    """全服排行榜可能变化时调用的函数，用于作废渲染好的页面"""
+    _tasks: set[asyncio.Task]
+    _reconcile_task: PeriodicTask | None
+
+    def __init__(self, db: "DatabaseManager"):
+        self._db = db
+        self._scores = {}
+        self._groups = {}
+        self._user_groups = {}
+        self._loading = {}
+        self._refreshing = set()
+        self._write_seq = 0
+        self._written = {}
+        self._db_reads = 0
+        self._queued_members = {}
+        self._global_listeners = []
+        self._tasks = set()
+        self._reconcile_task = None
+
+        metrics.gauge("leaderboard.groups", lambda: len(self._groups))
+        metrics.gauge("leaderboard.users", lambda: len(self._scores))
+
+    async def init(self):
+        self._reconcile_task = PeriodicTask(
+            "leaderboard-reconcile", self._db.config.leaderboard_reconcile_interval, self.reconcile
+        )
+        self._reconcile_task.start()
+
+    async def close(self):
+        if self._reconcile_task:
+            await self._reconcile_task.stop()
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _fetch_group(self, group_id: int) -> tuple[set[int], dict[int, tuple[int, int]]]:
+        """从数据库读取群组成员及其 (境界, 积分)"""
+        rows = await self._db.find_many(
+            f"""
+                SELECT ug.user_id, u.user_id IS NOT NULL, IFNULL(uc.stage, {NO_CULTIVATION}), IFNULL(u.points, 0)
+                FROM user_group ug
+                    LEFT JOIN users u ON ug.user_id = u.user_id
+                    LEFT JOIN user_cultivation uc ON ug.user_id = uc.user_id
+                WHERE ug.group_id = %s
+            """,
+            (group_id,),
+        )
+        members = set()
+        scores = {}
+        for uid, has_account, stage, points in rows:
+            members.add(uid)
+            if has_account:
+                scores[uid] = (stage, points + self._db.User.pending_points(uid))
+        return members, scores
+
+    async def _get_board(self, group_id: int) -> _GroupBoard:
+        board = self._groups.get(group_id)
+        if board is not None:
+            metrics.inc("leaderboard.hit")
+            return board
+
+        metrics.inc("leaderboard.miss")
+        future = self._loading.get(group_id)
+        if future is None:
+            future = self._loading[group_id] = asyncio.ensure_future(self._load_group(group_id))
+            future.add_done_callback(lambda _: self._loading.pop(group_id, None))
+        return await asyncio.shield(future)
+
+    async def _load_group(self, group_id: int) -> _GroupBoard:
+        try:
+            with self._tracking_writes() as seq:
+                members, scores = await self._fetch_group(group_id)
+                changed = self._written_since(seq)
+            queued = self._queued_members.get(group_id, set())
+        finally:
+            self._queued_members.pop(group_id, None)
+
+        members |= queued
+        board = _GroupBoard()
+        for uid in members:
+            # 读取期间被修改的用户，读取到的分数可能已过时
+            self._add_member(board, group_id, uid, scores.get(uid) if uid not in changed else None)
+        self._groups[group_id] = board
+        for uid in (changed | queued) & members:
+            if uid not in self._scores:
+                self._refresh_later(uid)
+        return board
+
+    def _add_member(self, board: _GroupBoard, group_id: int, user_id: int, score: tuple[int, int] | None):
+        board.members.add(user_id)
+        self._user_groups.setdefault(user_id, set()).add(group_id)
+        # 内存中已有的分数更新，优先使用
+        score = self._scores.setdefault(user_id, score) if score is not None else self._scores.get(user_id)
+        if score is not None:
+            board.insert(_rank_key(user_id, score))
+
+    def _remove_member(self, board: _GroupBoard, group_id: int, user_id: int):
+        board.members.discard(user_id)
+        score = self._scores.get(user_id)
+        if score is not None:
+            board.remove(_rank_key(user_id, score))
+        groups = self._user_groups.get(user_id)
+        if groups is not None:
+            groups.discard(group_id)
+            if not groups:
+                # 不再属于任何已加载的群组，无需继续跟踪
+                del self._user_groups[user_id]
+                self._scores.pop(user_id, None)
+
+    async def top(self, group_id: int, limit: int) -> list[tuple[int, int, int]]:
+        """获取群组排行榜前 `limit` 名的 (用户 ID, 境界, 积分)"""
+        board = await self._get_board(group_id)
+        return [(uid, max(-neg_stage, 0), -neg_points) for neg_stage, neg_points, uid in board.ranked.head(limit)]
+
+    async def gang_leader(self, group_id: int) -> int | None:
+        """获取群组的帮主 (境界与积分最高、且有修仙档案的成员)"""
+        board = await self._get_board(group_id)
+        if board.ranked and -board.ranked[0][0] != NO_CULTIVATION:
+            return board.ranked[0][2]
+        return None
+
+    async def rank(self, group_id: int, user_id: int) -> GroupRank | None:
+        """获取用户在群组中的名次 (O(log n))，用户不在榜上时返回 None"""
+        board = await self._get_board(group_id)
+        score = self._scores.get(user_id)
+        if score is None or user_id not in board.members:
+            return None
+        i = board.index(_rank_key(user_id, score))
+        if i is None:
+            return None
+        above = None
+        if i > 0:
+            neg_stage, neg_points, _ = board.ranked[i - 1]
+            above = (-neg_stage, -neg_points)
+        return GroupRank(i + 1, len(board.ranked), score, above)
+
+    async def global_page(
+        self, cursor: GlobalCursor | None, limit: int, backward: bool = False
+    ) -> list[tuple[int, int, int]]:
+        """
+        获取全服排行榜的一页 (用户 ID, 境界, 积分)，按境界、积分、用户 ID 降序排列。
+
+        使用游标 (keyset) 分页而非 OFFSET：`cursor` 为上一页最后一条 (向后翻页时为当前页第一条) 的排序值。
+        排序键由 `users.cultivation_stage` (触发器同步的境界)、`points` 与 `user_id` 组成，
+        均在索引 `idx_users_global_rank` 中，无论翻到第几页都只需沿索引读取 `limit` 行。
+        仅包括有修仙档案的用户，积分不含尚未写入的缓冲。
+        """
+        cond = "cultivation_stage >= 0"
+        args: tuple[int, ...] = ()
+        if cursor is not None:
+            # 展开行比较，使其可以作为索引的范围条件
+            op = ">" if backward else "<"
+            cond += (
+                f" AND (cultivation_stage {op} %s"
+                f" OR cultivation_stage = %s AND (points {op} %s OR points = %s AND user_id {op} %s))"
+            )
+            stage, points, user_id = cursor
+            args = (stage, stage, points, points, user_id)
+        order = "ASC" if backward else "DESC"
+        rows = await self._db.find_many(
+            f"""
+                SELECT user_id, cultivation_stage, points
+                FROM users
+                WHERE {cond}
+                ORDER BY cultivation_stage {order}, points {order}, user_id {order}
+                LIMIT {int(limit)}
+            """,
+            args,
+        )
+        return [tuple(row) for row in (reversed(rows) if backward else rows)]
+
+    def _rescore(self, user_id: int, score: tuple[int, int]):
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        self._scores[user_id] = score
+        for group_id in self._user_groups.get(user_id, ()):
+            board = self._groups[group_id]
+            if old is not None:
+                board.remove(_rank_key(user_id, old))
+            board.insert(_rank_key(user_id, score))
+
+    def _unscore(self, user_id: int):
+        """用户的积分帐号已不存在，从所有排行榜中移除 (仍保留成员关系)"""
+        old = self._scores.pop(user_id, None)
+        if old is None:
+            return
+        for group_id in self._user_groups.get(user_id, ()):
+            self._groups[group_id].remove(_rank_key(user_id, old))
+
+    def _touch(self, user_id: int):
+        """记录一次修改通知，使进行中的数据库读取不再使用该用户的读取结果"""
+        self._write_seq += 1
+        if self._db_reads:
+            self._written[user_id] = self._write_seq
+
+    @contextmanager
+    def _tracking_writes(self) -> Iterator[int]:
+        """读取数据库期间记录被修改的用户，返回读取前的修改序号，配合 `_written_since` 使用"""
+        self._db_reads += 1
+        try:
+            yield self._write_seq
+        finally:
+            self._db_reads -= 1
+            if not self._db_reads:
+                self._written.clear()
+
+    def _written_since(self, seq: int) -> set[int]:
+        """序号 `seq` 之后被修改过的用户。需在 `_tracking_writes` 内调用"""
+        return {uid for uid, written_seq in self._written.items() if written_seq > seq}
+
+    def _refresh_later(self, user_id: int):
+        """分数未知的用户发生了修改，稍后从数据库重新读取"""
+        if user_id not in self._user_groups or user_id in self._refreshing:
+            return
+        self._refreshing.add(user_id)
+        task = asyncio.create_task(self._refresh_user(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_user(self, user_id: int):
+        try:
+            with self._tracking_writes() as seq:
+                row = await self._db.find_one(
+                    f"""
+                        SELECT IFNULL(uc.stage, {NO_CULTIVATION}), u.points
+                        FROM users u
+                            LEFT JOIN user_cultivation uc ON u.user_id = uc.user_id
+                        WHERE u.user_id = %s
+                    """,
+                    (user_id,),
+                )
+                stale = self._written.get(user_id, 0) > seq
+        except Exception as ex:
+            logger.error(f"读取用户分数 (uid={user_id}) 失败: {str(ex)}")
+            return
+        finally:
+            self._refreshing.discard(user_id)
+        if stale:
+            # 读取期间又有修改，结果可能已过时，重新读取
+            return self._refresh_later(user_id)
+        if row and user_id in self._user_groups:
+            stage, points = row
+            self._rescore(user_id, (stage, points + self._db.User.pending_points(user_id)))
+
+    def add_points(self, user_id: int, delta: int):
+        """用户积分增加了 `delta`"""
+        self._touch(user_id)
+        score = self._scores.get(user_id)
+        if score is None:
+            return self._refresh_later(user_id)
+        self._rescore(user_id, (score[0], max(score[1] + delta, 0)))
+
+    def on_global_change(self, callback: Callable[[], None]):
+        """注册全服排行榜可能变化时调用的函数"""
+        self._global_listeners.append(callback)
+
+    def _global_changed(self, *stages: int | None):
+        """
+        通知全服排行榜可能变化。`stages` 为用户修改前后的境界 (None 表示未加载，境界未知)，
+        均为 `NO_CULTIVATION` 时用户不在全服排行榜上，无需通知。
+        静默加分的批量写入不通知，由页面缓存的有效期兜底。
+        """
+        if all(stage == NO_CULTIVATION for stage in stages):
+            return
+        for callback in self._global_listeners:
+            callback()
+
+    def set_score(self, user_id: int, *, stage: int | None = None, points: int | None = None):
+        """
+        用户的境界或数据库中的积分已更新。
+        `stage` 为 `NO_CULTIVATION` 表示修仙档案已删除；`points` 为数据库中的值，不含尚未写入的缓冲。
+        """
+        self._touch(user_id)
+        score = self._scores.get(user_id)
+        old_stage = score[0] if score is not None else None
+        self._global_changed(old_stage, old_stage if stage is None else stage)
+        if score is None:
+            return self._refresh_later(user_id)
+        if stage is None:
+            stage = score[0]
+        points = score[1] if points is None else points + self._db.User.pending_points(user_id)
+        self._rescore(user_id, (stage, points))
+
+    def ensure_cultivation(self, user_id: int):
+        """用户的修仙档案已建立 (若不存在)"""
+        self._touch(user_id)
+        score = self._scores.get(user_id)
+        if score is None or score[0] == NO_CULTIVATION:
+            # 新建档案的用户出现在全服排行榜上；已有档案时排行榜不变
+            self._global_changed(None)
+        if score is None:
+            return self._refresh_later(user_id)
+        if score[0] == NO_CULTIVATION:
+            self._rescore(user_id, (0, score[1]))
+
+    def add_member(self, user_id: int, group_id: int):
+        """用户已加入群组 (`user_group`)"""
+        self._touch(user_id)
+        board = self._groups.get(group_id)
+        if board is None:
+            if group_id in self._loading:
+                # 群组正在加载，读取结果可能不包括该成员
+                self._queued_members.setdefault(group_id, set()).add(user_id)
+            return
+        if user_id in board.members:
+            return
+        self._add_member(board, group_id, user_id, None)
+        if user_id not in self._scores:
+            self._refresh_later(user_id)
+
+    async def reconcile(self):
+        """逐个与数据库核对已加载的群组，发现差异时以数据库为准重建"""
+        for group_id in list(self._groups):
+            board = self._groups.get(group_id)
+            if board is None:
+                continue
+            with self._tracking_writes() as seq:
+                members, scores = await self._fetch_group(group_id)
+                changed = self._written_since(seq)
+
+            # 读取期间被修改的用户以内存为准，留待下次核对
+            members -= changed
+            scores = {uid: score for uid, score in scores.items() if uid not in changed}
+            board_members = board.members - changed
+            current = {uid: self._scores[uid] for uid in board_members if uid in self._scores}
+            if members == board_members and scores == current:
+                continue
+
+            metrics.inc("leaderboard.drift")
+            logger.warning(f"群组 {group_id} 的排行榜与数据库不一致，以数据库为准修正")
+            for uid in members - board_members:
+                self._add_member(board, group_id, uid, None)
+            for uid in board_members - members:
+                self._remove_member(board, group_id, uid)
+            for uid in members:
+                if uid in scores:
+                    self._rescore(uid, scores[uid])
+                else:
+                    self._unscore(uid)
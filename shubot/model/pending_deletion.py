@@ -0,0 +1,46 @@
+from os import path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from shubot.database import DatabaseManager
+
+
+class PendingDeletionModel:
+    """待删除消息的持久化存储，保证重启后仍能删除之前计划删除的消息"""
+
+    _db: "DatabaseManager"
+
+    def __init__(self, db: "DatabaseManager"):
+        self._db = db
+
+    async def init(self):
+        await self._db.Schema.install(path.join(path.dirname(__file__), "pending_deletion_init.sql"))
+
+    async def load_all(self) -> list[tuple[int, int, float]]:
+        """加载所有待删除的消息 (会话 ID, 消息 ID, 到期时间)"""
+        rows = await self._db.find_many("SELECT chat_id, message_id, due_at FROM pending_deletions")
+        return [(chat_id, message_id, due_at) for chat_id, message_id, due_at in rows]
+
+    async def add_many(self, rows: list[tuple[int, int, float]]):
+        """批量记录待删除的消息 (会话 ID, 消息 ID, 到期时间)"""
+        if not rows:
+            return
+        values = ",".join(["(%s, %s, %s)"] * len(rows))
+        await self._db.update(
+            f"""
+                INSERT INTO pending_deletions (chat_id, message_id, due_at)
+                VALUES {values}
+                ON DUPLICATE KEY UPDATE due_at = VALUES(due_at)
+            """,
+            tuple(v for row in rows for v in row),
+        )
+
+    async def remove_many(self, keys: list[tuple[int, int]]):
+        """批量移除已删除的消息 (会话 ID, 消息 ID)"""
+        if not keys:
+            return
+        values = ",".join(["(%s, %s)"] * len(keys))
+        await self._db.update(
+            f"DELETE FROM pending_deletions WHERE (chat_id, message_id) IN ({values})",
+            tuple(v for key in keys for v in key),
+        )
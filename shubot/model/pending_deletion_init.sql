@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS pending_deletions
+(
+    chat_id    BIGINT NOT NULL,
+    message_id BIGINT NOT NULL,
+    due_at     DOUBLE NOT NULL, -- 到期时间 (UNIX 时间戳，秒)
+    PRIMARY KEY (chat_id, message_id)
+);
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from shubot.config import WriteBehindConfig
+from shubot.ext.periodic import PeriodicTask
+
+if TYPE_CHECKING:
+    from shubot.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class PointsWriteBehind:
+    """
+    积分写回缓冲 (write-behind)。
+
+    在内存中按用户合并积分变化量，达到数量阈值或时间间隔后，使用一条多行 upsert 批量写入数据库。
+    读取积分时需要加上 `pending` 中尚未写入的部分，以保证能读到自己的写入。
+    """
+
+    _db: "DatabaseManager"
+    _config: WriteBehindConfig
+    _pending: dict[int, int]
+    _inflight: dict[int, int]
+    """正在写入数据库的变化量"""
+    _generation: int
+    """每当有变化量移出缓冲区 (写入数据库) 时加一，读取方据此判断读取期间是否发生了写入"""
+    _lock: asyncio.Lock
+    _task: PeriodicTask
+
+    def __init__(self, db: "DatabaseManager", config: WriteBehindConfig | None = None):
+        self._db = db
+        self._config = config or WriteBehindConfig()
+        self._pending = {}
+        self._inflight = {}
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._task = PeriodicTask("points-write-behind", self._config.flush_interval, self.flush, run_on_stop=True)
+
+    def start(self):
+        self._task.start()
+
+    async def stop(self):
+        """停止后台写回，并将剩余数据全部写入数据库"""
+        await self._task.stop()
+
+    def add(self, user_id: int, delta: int):
+        """累加一个用户的积分变化量"""
+        self._pending[user_id] = self._pending.get(user_id, 0) + delta
+        if len(self._pending) >= self._config.max_pending:
+            self._task.trigger()
+
+    def pending(self, user_id: int) -> int:
+        """获取用户尚未写入数据库的积分变化量 (包括正在写入的部分)"""
+        return self._pending.get(user_id, 0) + self._inflight.get(user_id, 0)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    async def take(self, user_id: int) -> int:
+        """
+        取出用户尚未写入数据库的积分变化量，调用方负责将其写入数据库。
+        若有正在进行的批量写入，会等待其完成，以保证数据库中的值是最新的。
+        """
+        async with self._lock:
+            delta = self._pending.pop(user_id, 0)
+            if delta:
+                # 调用方随后写入数据库，读取方需要重新读取
+                self._generation += 1
+            return delta
+
+    async def flush(self):
+        """将当前缓冲的所有变化量写入数据库"""
+        async with self._lock:
+            if not self._pending:
+                return
+
+            self._inflight, self._pending = self._pending, {}
+            try:
+                await self._flush_inflight()
+            finally:
+                # 未能写入的部分合并回缓冲区，等待下次重试
+                for uid, delta in self._inflight.items():
+                    self.add(uid, delta)
+                self._inflight = {}
+
+    async def _flush_inflight(self):
+        rows = [(uid, delta) for uid, delta in self._inflight.items() if delta > 0]
+        for i in range(0, len(rows), self._config.batch_size):
+            chunk = rows[i : i + self._config.batch_size]
+            try:
+                await self._upsert(chunk)
+            except Exception as ex:
+                logger.error(f"积分批量写入失败 ({len(chunk)} 条): {str(ex)}")
+                return
+            self._done([uid for uid, _ in chunk])
+
+        # 扣分需要「最低为 0」的语义，逐条走存储过程
+        for uid, delta in [(uid, delta) for uid, delta in self._inflight.items() if delta < 0]:
+            try:
+                await self._db.call("shubot_common_user_update_pts", uid, delta)
+            except Exception as ex:
+                logger.error(f"积分写入失败 (uid={uid}, delta={delta}): {str(ex)}")
+                continue
+            self._done([uid])
+
+        # 变化量为 0 的条目无需写入
+        for uid in [uid for uid, delta in self._inflight.items() if delta == 0]:
+            del self._inflight[uid]
+
+    def _done(self, user_ids: list[int]):
+        """
+        变化量已写入数据库：先作废这些用户的读取缓存，再移出 `_inflight`。
+        两步之间没有 await，读取方不会看到「缓存中的旧值 + 已不含这部分的变化量」。
+        """
+        self._db.User.invalidate_many(user_ids)
+        for uid in user_ids:
+            del self._inflight[uid]
+        self._generation += 1
+
+    async def _upsert(self, rows: list[tuple[int, int]]):
+        if not rows:
+            return
+        values = ",".join(["(%s, %s)"] * len(rows))
+        args = tuple(v for row in rows for v in row)
+        await self._db.update(
+            f"""
+                INSERT INTO users (user_id, points)
+                VALUES {values}
+                ON DUPLICATE KEY UPDATE points = points + VALUES(points)
+            """,
+            args,
+        )
@@ -0,0 +1,112 @@
+import hashlib
+import logging
+from contextlib import asynccontextmanager
+from os import path
+from typing import TYPE_CHECKING, AsyncIterator
+
+import aiomysql
+
+from shubot.metrics import metrics
+
+if TYPE_CHECKING:
+    from shubot.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+_LOCK_TIMEOUT = 60
+"""等待其他进程安装同一 SQL 文件的时间上限，单位为秒"""
+
+
+@asynccontextmanager
+async def named_lock(cursor: aiomysql.Cursor, name: str, timeout: int) -> AsyncIterator[None]:
+    """持有数据库级别的命名锁 (`GET_LOCK`)。锁与游标所在的连接绑定，期间不应归还该连接。"""
+    await cursor.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+    (locked,) = await cursor.fetchone()
+    if locked != 1:
+        raise TimeoutError(f"等待数据库锁 {name} 超时")
+    try:
+        yield
+    finally:
+        await cursor.execute("DO RELEASE_LOCK(%s)", (name,))
+
+
+async def execute_script(cursor: aiomysql.Cursor, sql: str):
+    """执行包含多条语句的 SQL 文件内容，逐条取回结果，使后面语句的错误也能抛出"""
+    await cursor.execute(sql)
+    while await cursor.nextset():
+        pass
+
+
+class SchemaModel:
+    """
+    SQL 文件 (建表语句、存储过程等) 安装器。
+
+    每个 SQL 文件的内容哈希记录在 `shubot_schema` 表中，启动时只执行内容有变化的文件。
+    执行期间持有数据库级别的锁 (`GET_LOCK`)，多个进程同时启动时，同一文件只会被其中一个执行。
+
+    需要强制重新执行某个文件时，删除 `shubot_schema` 表中对应的行即可。
+    """
+
+    _db: "DatabaseManager"
+
+    def __init__(self, db: "DatabaseManager"):
+        self._db = db
+
+    async def init(self):
+        if self._db.dialect != "mysql":
+            return
+        await self._db.update(
+            """
+                CREATE TABLE IF NOT EXISTS shubot_schema
+                (
+                    name       VARCHAR(64) NOT NULL PRIMARY KEY,
+                    hash       CHAR(64)    NOT NULL,
+                    applied_at TIMESTAMP   NOT NULL DEFAULT UTC_TIMESTAMP()
+                )
+            """
+        )
+
+    async def _applied_hash(self, name: str) -> str | None:
+        row = await self._db.find_one("SELECT hash FROM shubot_schema WHERE name = %s", (name,))
+        return row[0] if row else None
+
+    async def install(self, sql_path: str) -> bool:
+        """安装 SQL 文件，以文件名 (不含扩展名) 区分。内容未变化时跳过，返回是否执行了该文件。"""
+        if self._db.dialect != "mysql":
+            # 其他后端的存储过程以 Python 实现 (如 shubot.backend.sqlite_procedures)
+            return False
+        name = path.splitext(path.basename(sql_path))[0]
+        with open(sql_path, "r", encoding="utf-8") as f:
+            sql = f.read()
+        digest = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+
+        if await self._applied_hash(name) == digest:
+            metrics.inc("schema.skipped")
+            return False
+
+        # 使用独立的连接，锁与该连接绑定
+        conn = await self._db.acquire_connection()
+        try:
+            async with conn.cursor() as cursor, named_lock(cursor, f"shubot_schema.{name}", _LOCK_TIMEOUT):
+                # 等待锁期间，其他进程可能已经安装了相同的内容
+                await cursor.execute("SELECT hash FROM shubot_schema WHERE name = %s", (name,))
+                row = await cursor.fetchone()
+                if row and row[0] == digest:
+                    metrics.inc("schema.skipped")
+                    return False
+
+                logger.info(f"安装 SQL 文件 {name} ({digest[:12]})")
+                await execute_script(cursor, sql)
+                await cursor.execute(
+                    """
+                            INSERT INTO shubot_schema (name, hash)
+                            VALUES (%s, %s)
+                            ON DUPLICATE KEY UPDATE hash = VALUES(hash), applied_at = UTC_TIMESTAMP()
+                        """,
+                    (name, digest),
+                )
+                await conn.commit()
+                metrics.inc("schema.applied")
+                return True
+        finally:
+            await self._db.release_connection(conn)
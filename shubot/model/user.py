@@ -1,12 +1,24 @@
-from dataclasses import dataclass, field
+import asyncio
+import logging
+from dataclasses import dataclass, field, replace
 from os import path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Iterable
 
 from telegram import User
 
+from shubot.ext.batch_loader import BatchLoader
+from shubot.ext.cache import ReadCache
+from shubot.metrics import metrics
+from shubot.model.points_buffer import PointsWriteBehind
+
 if TYPE_CHECKING:
     from shubot.database import DatabaseManager
 
+logger = logging.getLogger(__name__)
+
+_STATE_READ_ATTEMPTS = 3
+"""读取用户状态时，因积分写回而重新读取的最大次数"""
+
 
 @dataclass
 class CultivationRecord:
@@ -26,62 +38,213 @@ class CultivationRecord:
         return self.stage // 3
 
 
+@dataclass
+class UserStateRecord(CultivationRecord):
+    """用户状态记录：修仙数据与积分"""
+
+    points: int = field(default=0)
+    """积分 (包括尚未写入数据库的部分)"""
+
+    def to_cultivation(self) -> CultivationRecord:
+        return CultivationRecord(self.user_id, self.stage, self.pills, self.next_cost)
+
+
 class UserModel:
     """通用用户相关模型"""
 
     _db: "DatabaseManager"
+    _points_buffer: PointsWriteBehind
+    """静默加分的写回缓冲"""
+    _known: set[int]
+    """已确认积分帐号与修仙档案都存在的用户 ID"""
+    _state_loader: BatchLoader[int, UserStateRecord | None]
+    """合并同一轮事件循环内的用户状态读取"""
+    _state_cache: ReadCache[int, UserStateRecord]
+    """用户状态 (数据库中的值，不含缓冲的积分) 的读取缓存，写入后需调用 `invalidate`"""
 
     def __init__(self, db: "DatabaseManager"):
         self._db = db
+        self._points_buffer = PointsWriteBehind(db)
+        self._known = set()
+        self._state_loader = BatchLoader("user_state", self._fetch_states)
+        self._state_cache = ReadCache("user_state")
+
+        metrics.gauge("users.known", lambda: len(self._known))
 
     async def init(self):
-        init_sql = path.join(path.dirname(__file__), "user_init.sql")
-        with open(init_sql, "r", encoding="utf-8") as f:
-            await self._db.update(f.read())
+        await self._db.Schema.install(path.join(path.dirname(__file__), "user_init.sql"))
+
+        self._state_cache.configure(self._db.config.user_state_cache)
+        self._points_buffer = PointsWriteBehind(self._db, self._db.config.write_behind)
+        self._points_buffer.start()
 
-    async def ensure_exists_inner(self, user_id: int, username: str):
-        """通用函数：确保用户存在 (手动指定信息)"""
-        return await self._db.update(
+        await self._load_known_users()
+
+    async def _load_known_users(self):
+        """从数据库加载已有积分帐号与修仙档案的用户"""
+        rows = await self._db.find_many(
+            """
+                SELECT u.user_id
+                FROM users u
+                    JOIN user_cultivation uc ON u.user_id = uc.user_id
             """
-            INSERT IGNORE INTO users (user_id, username)
-            VALUES (%s, %s);
+        )
+        self._known = {user_id for (user_id,) in rows}
+        logger.info(f"已加载 {len(self._known)} 位已知用户")
+
+    async def close(self):
+        """关闭前将缓冲的积分写入数据库"""
+        await self._points_buffer.stop()
+
+    async def ensure_exists_inner(self, user_id: int, username: str, full_name: str | None = None):
+        """通用函数：确保用户存在 (手动指定信息)。已知存在的用户不会访问数据库。"""
+        if user_id in self._known:
+            metrics.inc("users.known.hit")
+            return 0
+
+        metrics.inc("users.known.miss")
+        result = await self._db.update(
+            """
+            INSERT IGNORE INTO users (user_id, username, full_name)
+            VALUES (%s, %s, %s);
             INSERT IGNORE INTO user_cultivation (user_id, pills, stage, next_cost)
             VALUES (%s, 0, 0, 10);
         """,
-            (user_id, username, user_id),
+            (user_id, username, full_name, user_id),
         )
+        self._known.add(user_id)
+        self.invalidate(user_id)
+        self._db.Leaderboard.ensure_cultivation(user_id)
+        return result
+
+    def mark_exists(self, user_id: int):
+        """用户的积分帐号与修仙档案已经建立 (例如由存储过程建立)"""
+        self._known.add(user_id)
+
+    def mark_missing(self, user_id: int):
+        """用户的积分帐号或修仙档案已被删除，下次 `ensure_exists` 时需要重新建立"""
+        self._known.discard(user_id)
+
+    def invalidate(self, user_id: int):
+        """用户的积分或修仙数据已在数据库中修改 (包括存储过程)，作废读取缓存"""
+        self._state_cache.invalidate(user_id)
+
+    def invalidate_many(self, user_ids: Iterable[int]):
+        self._state_cache.invalidate_many(user_ids)
 
     async def ensure_exists(self, user: User):
         """通用函数：确保用户存在"""
-        return await self.ensure_exists_inner(user_id=user.id, username=user.username)
+        return await self.ensure_exists_inner(user_id=user.id, username=user.username, full_name=user.full_name)
+
+    async def _fetch_states(self, user_ids: list[int]) -> dict[int, UserStateRecord | None]:
+        """
+        批量读取多个用户在数据库中的状态，两者都不存在的用户为 None。
+        积分帐号与修仙档案可能只存在其一，因此分别按主键读取两张表，再按用户 ID 合并。
+        """
+        ids = ",".join(["%s"] * len(user_ids))
+        points_rows, cult_rows = await asyncio.gather(
+            self._db.find_many(f"SELECT user_id, points FROM users WHERE user_id IN ({ids})", tuple(user_ids)),
+            self._db.find_many(
+                f"SELECT user_id, stage, pills, next_cost FROM user_cultivation WHERE user_id IN ({ids})",
+                tuple(user_ids),
+            ),
+        )
+        points = dict(points_rows)
+        cults = {user_id: cult for user_id, *cult in cult_rows}
+        states = {}
+        for user_id in user_ids:
+            cult = cults.get(user_id)
+            if user_id not in points and cult is None:
+                states[user_id] = None
+                continue
+            state = UserStateRecord(user_id, *cult) if cult is not None else UserStateRecord(user_id)
+            state.points = points.get(user_id) or 0
+            states[user_id] = state
+        return states
+
+    @staticmethod
+    def _with_pending(user_id: int, stored: UserStateRecord | None, pending: int) -> UserStateRecord:
+        """在数据库中的状态上加上尚未写入的积分，返回新的记录"""
+        state = replace(stored) if stored is not None else UserStateRecord(user_id)
+        state.points = max(state.points + pending, 0)
+        return state
+
+    async def get_state(self, user_id: int) -> UserStateRecord:
+        """
+        获取用户的积分与修仙数据。
+        优先使用读取缓存，未命中时同一轮事件循环内的多次调用会合并为一次查询。
+        """
+        return (await self.get_states([user_id]))[0]
+
+    async def get_states(self, user_ids: list[int]) -> list[UserStateRecord]:
+        """
+        批量获取用户的积分与修仙数据，结果与 `user_ids` 的顺序一致。
+
+        尚未写入的积分在读取数据库之前取快照；读取期间若有积分写入数据库 (写回缓冲的 `generation` 变化)，
+        数据库中的值可能已包含快照中的部分，此时重新读取，避免重复或遗漏计算。
+        """
+        for _ in range(_STATE_READ_ATTEMPTS):
+            generation = self._points_buffer.generation
+            pending = [self._points_buffer.pending(uid) for uid in user_ids]
+            stored = await self._state_cache.get_many(user_ids, self._state_loader.load)
+            if self._points_buffer.generation == generation:
+                break
+            metrics.inc("users.state.reread")
+        else:
+            # 写入过于频繁时使用最后一次读取的结果，此时积分可能略有偏差
+            pending = [self._points_buffer.pending(uid) for uid in user_ids]
+        return [self._with_pending(uid, state, delta) for uid, state, delta in zip(user_ids, stored, pending)]
 
     async def get_points(self, user_id: int) -> int:
-        """获取用户的积分"""
-        result = await self._db.find_one("""SELECT points FROM users WHERE user_id = %s""", (user_id,))
-        return result[0] if result else 0
+        """获取用户的积分 (包括尚未写入数据库的部分)"""
+        return (await self.get_state(user_id)).points
 
     async def modify_points(self, user_id: int, delta: int):
         """修改用户的积分。若是新的分数为负数，则修改为 0。返回旧的和新的积分。"""
-        _, (status, old_points, new_points) = await self._db.call("shubot_common_user_update_pts", user_id, delta)
+        pending = await self._points_buffer.take(user_id)
+        try:
+            _, (status, old_points, new_points) = await self._db.call(
+                "shubot_common_user_update_pts", user_id, pending + delta
+            )
+        except Exception:
+            self._points_buffer.add(user_id, pending)
+            raise
+        self.invalidate(user_id)
         if status <= 0:
+            self._points_buffer.add(user_id, pending)
             raise ValueError("Failed to update points")
-        return old_points, new_points
+        self._db.Leaderboard.set_score(user_id, points=new_points)
+        return old_points + pending, new_points
+
+    def add_points_deferred(self, user_id: int, delta: int):
+        """延迟修改用户的积分：变化量先在内存中合并，之后批量写入数据库。适用于高频的小额加分。"""
+        self._points_buffer.add(user_id, delta)
+        self._db.Leaderboard.add_points(user_id, delta)
+
+    def pending_points(self, user_id: int) -> int:
+        """获取用户尚未写入数据库的积分变化量"""
+        return self._points_buffer.pending(user_id)
+
+    async def flush_pending_points(self, user_id: int):
+        """将用户尚未写入的积分立即写入数据库。在数据库内读取并修改积分 (存储过程等) 之前调用。"""
+        pending = await self._points_buffer.take(user_id)
+        if pending:
+            try:
+                await self._db.call("shubot_common_user_update_pts", user_id, pending)
+            except Exception:
+                self._points_buffer.add(user_id, pending)
+                raise
+            self.invalidate(user_id)
 
     async def modify_pills(self, user_id: int, delta: int):
         """修改用户的突破丹数量。若是新的数量为负数，则修改为 0。返回旧的和新的数量。"""
         _, (status, old_pills, new_pills) = await self._db.call("shubot_common_user_update_pills", user_id, delta)
+        self.invalidate(user_id)
         if status <= 0:
             raise ValueError("Failed to update pills")
+        self._db.Leaderboard.ensure_cultivation(user_id)
         return old_pills, new_pills
 
     async def get_cultivation_data(self, user_id: int) -> CultivationRecord:
         """获取用户的修仙数据"""
-        data = await self._db.find_one(
-            """
-            SELECT stage, pills, next_cost
-            FROM user_cultivation
-            WHERE user_id = %s
-        """,
-            (user_id,),
-        )
-        return CultivationRecord(user_id, *(data or []))
+        return (await self.get_state(user_id)).to_cultivation()
@@ -0,0 +1,127 @@
+import logging
+from typing import TYPE_CHECKING
+
+from shubot.config import MembershipConfig
+from shubot.ext.periodic import PeriodicTask
+from shubot.metrics import metrics
+
+if TYPE_CHECKING:
+    from shubot.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+_GROUP_BITS = 20
+"""打包键中群组序号所占的位数"""
+
+
+class UserGroupModel:
+    """
+    用户与群组的关联 (`user_group`)。
+
+    已知的关联启动时从数据库完整加载，以打包的整数 `(user_id << 20) | 群组序号` 保存在一个集合中，
+    群组序号为群组 ID 在本进程内的编号。新的关联先在内存中缓冲，定期用一条多行 `INSERT IGNORE` 批量写入。
+
+    `user_group` 的外键要求用户已有积分帐号 (`users`)。尚无帐号的用户的关联不会写入，
+    并从已知关联中移除，下次发言时重新尝试。
+    """
+
+    _db: "DatabaseManager"
+    _config: MembershipConfig
+    _group_index: dict[int, int]
+    """群组 ID 到群组序号的映射"""
+    _members: set[int]
+    """已知的关联 (打包键)，包括尚未写入数据库的部分"""
+    _pending: list[tuple[int, int]]
+    """等待写入数据库的 (用户 ID, 群组 ID)"""
+    _task: PeriodicTask
+
+    def __init__(self, db: "DatabaseManager"):
+        self._db = db
+        self._config = MembershipConfig()
+        self._group_index = {}
+        self._members = set()
+        self._pending = []
+        self._task = PeriodicTask("user-group-flush", self._config.flush_interval, self.flush, run_on_stop=True)
+
+        metrics.gauge("user_group.known", lambda: len(self._members))
+        metrics.gauge("user_group.pending", lambda: len(self._pending))
+
+    async def init(self):
+        self._config = self._db.config.membership
+        rows = await self._db.find_many("SELECT user_id, group_id FROM user_group")
+        self._members = {self._key(user_id, group_id) for user_id, group_id in rows}
+        logger.info(f"已加载 {len(self._members)} 条用户群组关联 ({len(self._group_index)} 个群组)")
+
+        self._task = PeriodicTask("user-group-flush", self._config.flush_interval, self.flush, run_on_stop=True)
+        self._task.start()
+
+    async def close(self):
+        await self._task.stop()
+
+    def _key(self, user_id: int, group_id: int) -> int:
+        index = self._group_index.get(group_id)
+        if index is None:
+            index = self._group_index[group_id] = len(self._group_index)
+            if index >= 1 << _GROUP_BITS:
+                raise OverflowError("群组数量超出打包键的范围")
+        return (user_id << _GROUP_BITS) | index
+
+    def is_member(self, user_id: int, group_id: int) -> bool:
+        """用户是否已关联到群组 (包括尚未写入数据库的关联)"""
+        index = self._group_index.get(group_id)
+        return index is not None and ((user_id << _GROUP_BITS) | index) in self._members
+
+    def add(self, user_id: int, group_id: int):
+        """关联用户与群组。已知的关联不会访问数据库，新的关联等待批量写入。"""
+        key = self._key(user_id, group_id)
+        if key in self._members:
+            metrics.inc("user_group.hit")
+            return
+
+        metrics.inc("user_group.miss")
+        self._members.add(key)
+        self._pending.append((user_id, group_id))
+        if len(self._pending) >= self._config.max_pending:
+            self._task.trigger()
+
+    async def flush(self):
+        """将新的关联写入数据库"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        for i in range(0, len(pending), self._config.batch_size):
+            chunk = pending[i : i + self._config.batch_size]
+            try:
+                written = await self._insert(chunk)
+            except Exception:
+                # 未写入的关联等待下次重试
+                self._pending.extend(pending[i:])
+                raise
+            for user_id, group_id in chunk:
+                if user_id in written:
+                    # 写入后再加入排行榜，避免与数据库核对时被移除
+                    self._db.Leaderboard.add_member(user_id, group_id)
+                else:
+                    metrics.inc("user_group.no_account")
+                    self._members.discard(self._key(user_id, group_id))
+
+    async def _insert(self, rows: list[tuple[int, int]]) -> set[int]:
+        """写入关联，返回已有积分帐号、关联已写入的用户"""
+        user_ids = tuple({user_id for user_id, _ in rows})
+        found = await self._db.find_many(
+            f"SELECT user_id FROM users WHERE user_id IN ({','.join(['%s'] * len(user_ids))})", user_ids
+        )
+        existing = {user_id for (user_id,) in found}
+        rows = [row for row in rows if row[0] in existing]
+        if not rows:
+            return existing
+
+        values = ",".join(["(%s, %s)"] * len(rows))
+        await self._db.update(
+            f"""
+                INSERT IGNORE INTO user_group (user_id, group_id)
+                VALUES {values}
+            """,
+            tuple(v for row in rows for v in row),
+        )
+        return existing
@@ -1,5 +1,4 @@
-DROP PROCEDURE IF EXISTS shubot_common_user_update_pts;
-CREATE PROCEDURE shubot_common_user_update_pts(IN p_uid INT8, IN p_delta INT8)
+CREATE OR REPLACE PROCEDURE shubot_common_user_update_pts(IN p_uid INT8, IN p_delta INT8)
     -- 用户积分更改
     -- p_uid: 用户ID
     -- p_delta: 变化量
@@ -43,8 +42,7 @@ BEGIN
     COMMIT;
 END;
 
-DROP PROCEDURE IF EXISTS shubot_common_user_update_pills;
-CREATE PROCEDURE shubot_common_user_update_pills(IN p_uid INT8, IN p_delta INT8)
+CREATE OR REPLACE PROCEDURE shubot_common_user_update_pills(IN p_uid INT8, IN p_delta INT8)
     -- 修仙/药丸更改
     -- p_uid: 用户ID
     -- p_delta: 变化量
@@ -0,0 +1,171 @@
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+
+from telegram import User
+
+from shubot.config import NameCacheConfig
+from shubot.ext.batch_loader import BatchLoader
+from shubot.ext.cache import ReadCache
+from shubot.ext.periodic import PeriodicTask
+from shubot.metrics import metrics
+
+if TYPE_CHECKING:
+    from shubot.database import DatabaseManager
+
+
+class UserName(NamedTuple):
+    """用户的显示名称"""
+
+    full_name: str
+    username: str | None
+
+
+class _CacheEntry(NamedTuple):
+    name: UserName
+    expires_at: float
+
+
+class UserNameModel:
+    """
+    用户显示名称缓存。
+
+    名称来自机器人收到的每条更新中的用户信息 (`observe`)，在内存中按 LRU 缓存，并定期写入 `users` 表的
+    `username` 与 `full_name` 列。查询时依次使用内存缓存、数据库，均未命中时返回 None，由调用方决定是否调用 Bot API。
+
+    缓存项超过 `ttl` 后仍可使用，但再次见到该用户时会重新写入数据库，用于跟进改名。
+    """
+
+    _db: "DatabaseManager"
+    _config: NameCacheConfig
+    _cache: OrderedDict[int, _CacheEntry]
+    _dirty: dict[int, UserName]
+    """等待写入数据库的名称"""
+    _task: PeriodicTask
+    _lookup_loader: BatchLoader[int, UserName | None]
+    """合并同一轮事件循环内的数据库查询"""
+    _lookup_cache: ReadCache[int, UserName]
+    """数据库查询的缓存，只用于记住数据库中没有名称的用户 (负缓存)"""
+
+    def __init__(self, db: "DatabaseManager"):
+        self._db = db
+        self._config = NameCacheConfig()
+        self._cache = OrderedDict()
+        self._dirty = {}
+        self._task = PeriodicTask("user-name-flush", self._config.flush_interval, self.flush, run_on_stop=True)
+        self._lookup_loader = BatchLoader("user_name", self._fetch_names)
+        self._lookup_cache = ReadCache("user_name_lookup")
+
+        metrics.gauge("names.cached", lambda: len(self._cache))
+
+    async def init(self):
+        self._config = self._db.config.name_cache
+        self._lookup_cache.configure(self._db.config.name_lookup_cache)
+        self._task = PeriodicTask("user-name-flush", self._config.flush_interval, self.flush, run_on_stop=True)
+        self._task.start()
+
+    async def close(self):
+        await self._task.stop()
+
+    def _put(self, user_id: int, name: UserName):
+        self._cache[user_id] = _CacheEntry(name, time.monotonic() + self._config.ttl)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self._config.capacity:
+            self._cache.popitem(last=False)
+
+    def observe(self, user: User | None):
+        """记录收到的更新中的用户名称。名称未变化且未过期时不做任何事。"""
+        if user is None or user.is_bot:
+            return
+        self.remember(user.id, user.full_name, user.username)
+
+    def remember(self, user_id: int, full_name: str, username: str | None = None):
+        """记录用户名称"""
+        name = UserName(full_name, username)
+        entry = self._cache.get(user_id)
+        if entry is not None and entry.name == name and entry.expires_at > time.monotonic():
+            self._cache.move_to_end(user_id)
+            return
+
+        self._put(user_id, name)
+        self._lookup_cache.invalidate(user_id)
+        self._dirty[user_id] = name
+        if len(self._dirty) >= self._config.max_pending:
+            self._task.trigger()
+
+    async def get_names(self, user_ids: Iterable[int]) -> dict[int, UserName]:
+        """批量获取用户名称，未知的用户不会出现在结果中"""
+        result = {}
+        missing = []
+        for uid in user_ids:
+            entry = self._cache.get(uid)
+            if entry is None:
+                missing.append(uid)
+            else:
+                self._cache.move_to_end(uid)
+                result[uid] = entry.name
+        metrics.inc("names.hit", len(result))
+
+        if missing:
+            metrics.inc("names.miss", len(missing))
+            names = await self._lookup_cache.get_many(missing, self._lookup_loader.load)
+            for uid, name in zip(missing, names):
+                if name is None:
+                    continue
+                result[uid] = name
+                if uid not in self._cache:
+                    # 数据库中的名称可能较旧，视为已过期，再次见到用户时会重新写入
+                    self._cache[uid] = _CacheEntry(name, 0.0)
+                    self._cache.move_to_end(uid)
+        return result
+
+    async def _fetch_names(self, user_ids: list[int]) -> dict[int, UserName | None]:
+        """从数据库读取多个用户的名称，没有名称的用户为 None"""
+        rows = await self._db.find_many(
+            f"""
+                SELECT user_id, full_name, username
+                FROM users
+                WHERE user_id IN ({",".join(["%s"] * len(user_ids))}) AND full_name IS NOT NULL
+            """,
+            tuple(user_ids),
+        )
+        names: dict[int, UserName | None] = dict.fromkeys(user_ids)
+        for uid, full_name, username in rows:
+            names[uid] = UserName(full_name, username)
+        return names
+
+    async def get_name(self, user_id: int) -> UserName | None:
+        """获取用户名称，未知时返回 None"""
+        return (await self.get_names((user_id,))).get(user_id)
+
+    async def flush(self):
+        """将变化的名称写入数据库。只更新已有帐号的用户，不会因此建立积分帐号。"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        rows = list(dirty.items())
+        try:
+            for i in range(0, len(rows), self._config.batch_size):
+                await self._update_names(rows[i : i + self._config.batch_size])
+        except Exception:
+            # 未写入的名称 (不覆盖之后的新名称) 等待下次重试
+            for uid, name in rows:
+                self._dirty.setdefault(uid, name)
+            raise
+
+    async def _update_names(self, rows: list[tuple[int, UserName]]):
+        case_when = " ".join(["WHEN %s THEN %s"] * len(rows))
+        ids = ",".join(["%s"] * len(rows))
+        await self._db.update(
+            f"""
+                UPDATE users
+                SET full_name = CASE user_id {case_when} END,
+                    username  = CASE user_id {case_when} END
+                WHERE user_id IN ({ids})
+            """,
+            (
+                *(v for uid, name in rows for v in (uid, name.full_name)),
+                *(v for uid, name in rows for v in (uid, name.username)),
+                *(uid for uid, _ in rows),
+            ),
+        )
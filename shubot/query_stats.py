@@ -0,0 +1,94 @@
+import os
+import re
+import sys
+from functools import lru_cache
+
+from shubot.metrics import Histogram
+
+_SHUBOT_DIR = os.path.dirname(os.path.abspath(__file__))
+_HANDLER_DIRS = tuple(os.path.join(_SHUBOT_DIR, name) + os.sep for name in ("command", "group_msg"))
+_IGNORED_FILES = frozenset({os.path.join(_SHUBOT_DIR, "database.py"), os.path.abspath(__file__)})
+
+_re_comment = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_re_string = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_re_number = re.compile(r"\b\d+(?:\.\d+)?\b")
+_re_placeholder = re.compile(r"%s|\?")
+_re_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_re_rows = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+_re_case = re.compile(r"(?:WHEN \? THEN \? ){2,}")
+_re_union_ids = re.compile(r"SELECT \? AS (\w+)(?: UNION ALL SELECT \? AS \1)+", re.I)
+_re_space = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query: str) -> str:
+    """
+    将 SQL 语句规范化为指纹：去除注释与多余空白，常量与占位符替换为 `?`，
+    `IN (?, ?, ...)`、多行 `VALUES` 等重复结构折叠为一项，使参数数量不同的同一语句得到相同的指纹。
+    """
+    fp = _re_comment.sub(" ", query)
+    fp = _re_string.sub("?", fp)
+    fp = _re_number.sub("?", fp)
+    fp = _re_placeholder.sub("?", fp)
+    fp = _re_space.sub(" ", fp).strip().rstrip(";").strip()
+    fp = _re_list.sub("(?+)", fp)
+    fp = _re_rows.sub("(?+)...", fp)
+    fp = _re_case.sub("WHEN ? THEN ?... ", fp)
+    fp = _re_union_ids.sub(r"SELECT ? AS \1...", fp)
+    return fp
+
+
+def find_caller() -> str:
+    """
+    在调用栈中查找发起查询的代码，返回「处理函数 (直接调用方)」。
+    需在协程第一次挂起前调用，此时调用栈中包含等待该查询的所有协程。
+    """
+    frame = sys._getframe(1)
+    caller = handler = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_SHUBOT_DIR) and filename not in _IGNORED_FILES:
+            name = frame.f_code.co_qualname
+            if caller is None:
+                caller = name
+            if filename.startswith(_HANDLER_DIRS):
+                handler = name
+        frame = frame.f_back
+
+    if handler is None or handler == caller:
+        return caller or "?"
+    return f"{handler} ({caller})"
+
+
+class QueryStats:
+    """按语句指纹统计的查询耗时"""
+
+    _histograms: dict[str, Histogram]
+
+    def __init__(self):
+        self._histograms = {}
+
+    def observe(self, fp: str, seconds: float):
+        hist = self._histograms.get(fp)
+        if hist is None:
+            hist = self._histograms[fp] = Histogram()
+        hist.observe(seconds)
+
+    def top(self, limit: int = 5) -> list[tuple[str, Histogram]]:
+        """按总耗时降序，获取耗时最多的语句"""
+        items = sorted(self._histograms.items(), key=lambda item: item[1].total, reverse=True)
+        return items[:limit]
+
+    def format_text(self, limit: int = 5, width: int = 80) -> str:
+        lines = []
+        for fp, hist in self.top(limit):
+            short = fp if len(fp) <= width else fp[: width - 3] + "..."
+            lines.append(
+                f"{short}\n  n={hist.count} total={hist.total * 1000:.0f}ms "
+                f"mean={hist.mean * 1000:.1f}ms p95={hist.quantile(0.95) * 1000:.1f}ms max={hist.max * 1000:.1f}ms"
+            )
+        return "\n".join(lines)
+
+
+query_stats = QueryStats()
+"""全局查询耗时统计"""
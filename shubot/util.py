@@ -1,16 +1,11 @@
-from typing import cast
-
 from telegram import Message
-from telegram.ext import CallbackContext, JobQueue
-
 
-async def _delete(ctx: CallbackContext):
-    data = cast(dict, ctx.job.data)
-    await ctx.bot.delete_message(**data)
 
+def defer_delete(message: Message, timeout: int = 30):
+    """延迟删除消息，由批量删除调度器统一处理"""
+    from shubot.bot import ShuBot
 
-def defer_delete(queue: JobQueue, message: Message, timeout: int = 30):
-    queue.run_once(_delete, data={"chat_id": message.chat_id, "message_id": message.message_id}, when=timeout)
+    ShuBot.get_instance().get_message_deleter().schedule(message.chat_id, message.message_id, timeout)
 
 
 async def reply(src: Message, text: str, parse_mode=None, delete_prev_msg=True, defer_delete_by: int = 10):
@@ -28,9 +23,7 @@ async def reply(src: Message, text: str, parse_mode=None, delete_prev_msg=True,
     new_msg = await src.reply_text(text, parse_mode=parse_mode)
     if delete_prev_msg:
         if defer_delete_by:
-            from shubot.bot import ShuBot
-
-            defer_delete(ShuBot.get_instance().get_job_queue(), src, timeout=defer_delete_by)
+            defer_delete(src, timeout=defer_delete_by)
         else:
             await src.delete()
     return new_msg
@@ -0,0 +1,35 @@
+import asyncio
+import inspect
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import pytest
+
+from shubot.config import DatabaseConfig, SqliteConfig
+from shubot.database import DatabaseManager
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem: pytest.Function):
+    """协程测试函数在新的事件循环中执行，不依赖 pytest-asyncio"""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    args = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.run(pyfuncitem.obj(**args))
+    return True
+
+
+@asynccontextmanager
+async def _open_sqlite_db() -> AsyncIterator[DatabaseManager]:
+    db = DatabaseManager()
+    await db.init_pool(DatabaseConfig(backend="sqlite", sqlite=SqliteConfig(path=":memory:")))
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+@pytest.fixture
+def sqlite_db():
+    """打开内存 SQLite 数据库 (已建立表结构、初始化全部模型)：`async with sqlite_db() as db: ...`"""
+    return _open_sqlite_db
@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+
+from shubot.config import ReadCacheConfig
+from shubot.database import _Session, _current_session
+from shubot.ext.batch_loader import BatchLoader
+from shubot.ext.cache import ReadCache
+
+
+class _Loader:
+    """记录调用次数的读取函数，`release` 之前一直等待"""
+
+    def __init__(self, value=None):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.value
+
+
+async def test_single_flight():
+    cache = ReadCache("test_single_flight")
+    loader = _Loader("v")
+    tasks = [asyncio.create_task(cache.get("k", loader)) for _ in range(5)]
+    await asyncio.sleep(0)
+    loader.release.set()
+    assert await asyncio.gather(*tasks) == ["v"] * 5
+    assert loader.calls == 1
+    assert cache.stats().misses == 1 and cache.stats().coalesced == 4
+
+    # 已缓存
+    assert await cache.get("k", loader) == "v"
+    assert loader.calls == 1
+
+
+async def test_invalidate_during_load():
+    cache = ReadCache("test_invalidate_during_load")
+    stale = _Loader("old")
+    task = asyncio.create_task(cache.get("k", stale))
+    await asyncio.sleep(0)
+
+    # 读取期间数据被修改：进行中的读取作废，之后的读取不与其合并
+    cache.invalidate("k")
+    fresh = _Loader("new")
+    fresh.release.set()
+    assert await asyncio.wait_for(cache.get("k", fresh), 1) == "new"
+
+    stale.release.set()
+    assert await task == "old"
+    # 作废的读取结果没有覆盖缓存
+    assert await cache.get("k", _Loader("unused")) == "new"
+
+
+async def test_clear_drops_inflight_load():
+    cache = ReadCache("test_clear_drops_inflight_load")
+    loader = _Loader("old")
+    task = asyncio.create_task(cache.get("k", loader))
+    await asyncio.sleep(0)
+    cache.clear()
+    loader.release.set()
+    await task
+
+    again = _Loader("new")
+    again.release.set()
+    assert await cache.get("k", again) == "new"
+
+
+async def test_loader_cancelled_waiters_retry():
+    cache = ReadCache("test_loader_cancelled_waiters_retry")
+    first = _Loader("v")
+    leader = asyncio.create_task(cache.get("k", first))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get("k", first))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    first.release.set()
+    assert await follower == "v"
+    assert first.calls == 2
+
+
+async def test_loader_error_is_shared_and_not_cached():
+    cache = ReadCache("test_loader_error_is_shared_and_not_cached")
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        raise KeyError("k")
+
+    results = await asyncio.gather(cache.get("k", failing), cache.get("k", failing), return_exceptions=True)
+    assert all(isinstance(r, KeyError) for r in results)
+    assert calls == 1
+    with pytest.raises(KeyError):
+        await cache.get("k", failing)
+    assert calls == 2
+
+
+async def test_negative_cache_and_lru():
+    cache = ReadCache("test_negative_cache_and_lru", ReadCacheConfig(capacity=2, ttl=60, negative_ttl=0))
+
+    async def none():
+        return None
+
+    async def value(v):
+        return v
+
+    # negative_ttl 为 0 时不缓存 None
+    assert await cache.get("missing", none) is None
+    assert cache.stats().size == 0
+
+    await cache.get("a", lambda: value(1))
+    await cache.get("b", lambda: value(2))
+    await cache.get("a", lambda: value(-1))
+    await cache.get("c", lambda: value(3))
+    # 容量为 2，最久未使用的 b 被淘汰
+    assert await cache.get("a", lambda: value(-1)) == 1
+    assert await cache.get("b", lambda: value(-2)) == -2
+    assert cache.stats().evictions >= 1
+
+
+async def test_batch_loader_merges_one_round():
+    batches = []
+
+    async def fetch(keys):
+        batches.append(sorted(keys))
+        return {k: k * 10 for k in keys}
+
+    loader = BatchLoader("test_batch", fetch, max_batch_size=3)
+    results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load_many([3, 4]))
+    assert results == [10, 20, 10, [30, 40]]
+    assert sorted(batches) == [[1, 2, 3], [4]]
+
+
+async def test_batch_loader_missing_key_and_error():
+    async def fetch(keys):
+        if 0 in keys:
+            raise ValueError()
+        return {k: k for k in keys if k != 2}
+
+    loader = BatchLoader("test_batch_errors", fetch)
+    results = await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+    assert results[0] == 1 and isinstance(results[1], KeyError)
+    with pytest.raises(ValueError):
+        await loader.load(0)
+
+
+async def test_batch_loader_runs_outside_caller_context():
+    seen = []
+
+    async def fetch(keys):
+        seen.append(_current_session.get())
+        return {k: k for k in keys}
+
+    loader = BatchLoader("test_batch_context", fetch)
+    _current_session.set(_Session())
+    assert await loader.load(1) == 1
+    assert seen == [None]
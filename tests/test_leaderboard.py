@@ -0,0 +1,152 @@
+import asyncio
+
+from shubot.database import DatabaseManager
+from shubot.model.leaderboard import NO_CULTIVATION
+
+GROUP = -100
+
+
+async def _add_user(db: DatabaseManager, user_id: int, points: int, group_id: int = GROUP):
+    await db.User.ensure_exists_inner(user_id, f"u{user_id}")
+    await db.update("INSERT INTO user_group (user_id, group_id) VALUES (%s, %s)", (user_id, group_id))
+    await db.User.modify_points(user_id, points)
+
+
+async def _db_top(db: DatabaseManager, group_id: int = GROUP) -> list[tuple[int, int, int]]:
+    rows = await db.find_many(
+        """
+            SELECT u.user_id, uc.stage, u.points
+            FROM user_group ug
+                JOIN users u ON ug.user_id = u.user_id
+                JOIN user_cultivation uc ON ug.user_id = uc.user_id
+            WHERE ug.group_id = %s
+            ORDER BY uc.stage DESC, u.points DESC, u.user_id
+        """,
+        (group_id,),
+    )
+    return [tuple(row) for row in rows]
+
+
+async def _until_reading(db: DatabaseManager):
+    """等待排行榜发出数据库读取"""
+    while not db.Leaderboard._db_reads:
+        await asyncio.sleep(0)
+
+
+async def _settle(db: DatabaseManager):
+    """等待后台重新读取分数的任务完成"""
+    while db.Leaderboard._tasks:
+        await asyncio.gather(*db.Leaderboard._tasks)
+
+
+async def test_top_and_rank_follow_writes(sqlite_db):
+    async with sqlite_db() as db:
+        for uid, points in enumerate([5, 30, 30, 12, 0], 1):
+            await _add_user(db, uid, points)
+        assert await db.Leaderboard.top(GROUP, 10) == await _db_top(db)
+
+        await db.User.modify_points(4, 40)
+        db.User.add_points_deferred(5, 31)
+        await db.update("UPDATE user_cultivation SET stage = 1 WHERE user_id = 1")
+        db.Leaderboard.set_score(1, stage=1)
+
+        top = await db.Leaderboard.top(GROUP, 10)
+        assert [uid for uid, _, _ in top] == [1, 4, 5, 2, 3]
+        assert top[2] == (5, 0, 31)
+
+        rank = await db.Leaderboard.rank(GROUP, 2)
+        assert (rank.rank, rank.total, rank.score, rank.above) == (4, 5, (0, 30), (0, 31))
+        assert rank.points_to_next() == 2
+        assert await db.Leaderboard.gang_leader(GROUP) == 1
+
+
+async def test_write_during_group_load_wins(sqlite_db):
+    async with sqlite_db() as db:
+        await _add_user(db, 1, 5)
+        await _add_user(db, 2, 10)
+
+        # 加载群组的读取已发出，读取期间修改的用户不使用读取到的旧分数，稍后重新读取
+        loading = asyncio.create_task(db.Leaderboard.top(GROUP, 10))
+        await _until_reading(db)
+        db.Leaderboard.set_score(1, points=50)
+        await db.update("UPDATE users SET points = 50 WHERE user_id = 1")
+        assert await loading == [(2, 0, 10)]
+        await _settle(db)
+
+        assert await db.Leaderboard.top(GROUP, 10) == [(1, 0, 50), (2, 0, 10)]
+
+
+async def test_reconcile_repairs_drift(sqlite_db):
+    async with sqlite_db() as db:
+        for uid in (1, 2, 3):
+            await _add_user(db, uid, uid * 10)
+        await db.Leaderboard.top(GROUP, 10)
+
+        # 绕过模型的修改 (例如其他进程的写入)
+        await db.update("UPDATE users SET points = 100 WHERE user_id = 1")
+        await db.update("DELETE FROM user_group WHERE user_id = 3")
+        await db.User.ensure_exists_inner(4, "u4")
+        await db.update("INSERT INTO user_group (user_id, group_id) VALUES (4, %s)", (GROUP,))
+
+        await db.Leaderboard.reconcile()
+        assert await db.Leaderboard.top(GROUP, 10) == await _db_top(db) == [(1, 0, 100), (2, 0, 20), (4, 0, 0)]
+
+
+async def test_reconcile_keeps_writes_made_during_read(sqlite_db):
+    async with sqlite_db() as db:
+        await _add_user(db, 1, 5)
+        await db.Leaderboard.top(GROUP, 10)
+
+        reconciling = asyncio.create_task(db.Leaderboard.reconcile())
+        await _until_reading(db)
+        # 核对的读取已发出，读取结果不包括这次修改
+        db.Leaderboard.set_score(1, points=70)
+        await reconciling
+        assert await db.Leaderboard.top(GROUP, 10) == [(1, 0, 70)]
+
+
+async def test_global_page_keyset(sqlite_db):
+    async with sqlite_db() as db:
+        for uid in range(1, 8):
+            await _add_user(db, uid, uid % 3)
+        # 全服排行榜按境界、积分、用户 ID 降序排列
+        expected = sorted(await _db_top(db), key=lambda row: (row[1], row[2], row[0]), reverse=True)
+
+        pages = []
+        cursor = None
+        while page := await db.Leaderboard.global_page(cursor, 3):
+            pages.append(page)
+            uid, stage, points = page[-1]
+            cursor = (stage, points, uid)
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [row for page in pages for row in page] == expected
+
+        uid, stage, points = pages[1][0]
+        assert await db.Leaderboard.global_page((stage, points, uid), 3, backward=True) == pages[0]
+
+
+async def test_global_change_notifications(sqlite_db):
+    async with sqlite_db() as db:
+        changes = []
+        board = db.Leaderboard
+        board.on_global_change(lambda: changes.append(1))
+
+        await _add_user(db, 1, 5)
+        await board.top(GROUP, 10)
+        changes.clear()
+
+        # 已有修仙档案的用户
+        board.set_score(1, points=8)
+        board.ensure_cultivation(1)
+        assert len(changes) == 1
+
+        # 没有修仙档案、也未获得档案的用户不在全服排行榜上
+        board._rescore(1, (NO_CULTIVATION, 8))
+        board.set_score(1, points=9)
+        assert len(changes) == 1
+        board.ensure_cultivation(1)
+        assert len(changes) == 2
+
+        # 未加载的用户境界未知
+        board.set_score(99, points=1)
+        assert len(changes) == 3
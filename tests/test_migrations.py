@@ -0,0 +1,123 @@
+from shubot.migrations import MigrationRunner, discover
+
+
+class _FakeCursor:
+    """记录执行的语句，按 MariaDB 的行为返回锁与已执行迁移的查询结果"""
+
+    def __init__(self, db: "_FakeMysql"):
+        self._db = db
+        self._result = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query: str, args=None):
+        self._db.executed.append(query.strip())
+        if query.startswith("SELECT GET_LOCK"):
+            self._result = [(1,)]
+        elif query.startswith("SELECT version FROM shubot_migrations"):
+            self._result = [(v,) for v in sorted(self._db.applied)]
+        elif query.startswith("INSERT INTO shubot_migrations"):
+            self._db.applied[args[0]] = "now"
+
+    async def fetchone(self):
+        return self._result[0]
+
+    async def fetchall(self):
+        return self._result
+
+    async def nextset(self):
+        return None
+
+
+class _FakeConnection:
+    def __init__(self, db: "_FakeMysql"):
+        self._db = db
+        self.commits = 0
+
+    def cursor(self):
+        return _FakeCursor(self._db)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class _FakeMysql:
+    """MigrationRunner 使用的 DatabaseManager 接口"""
+
+    dialect = "mysql"
+
+    def __init__(self, applied: set[int]):
+        self.applied = {version: "before" for version in applied}
+        self.executed = []
+        self.connections = []
+        self.released = 0
+
+    async def update(self, query: str, args=None):
+        self.executed.append(query.strip())
+        return 0
+
+    async def find_many(self, query: str, args=None):
+        return list(self.applied.items())
+
+    async def acquire_connection(self):
+        conn = _FakeConnection(self)
+        self.connections.append(conn)
+        return conn
+
+    async def release_connection(self, conn):
+        self.released += 1
+
+
+def test_discover_is_ordered():
+    migrations = discover()
+    versions = [m.version for m in migrations]
+    assert versions == sorted(versions) and versions[0] == 1
+    assert len(set(versions)) == len(versions)
+    assert all(m.read().strip() for m in migrations)
+
+
+async def test_migrate_applies_pending_in_order():
+    migrations = discover()
+    db = _FakeMysql({migrations[0].version})
+    done = await MigrationRunner(db).migrate()
+
+    assert done == migrations[1:]
+    assert set(db.applied) == {m.version for m in migrations}
+    scripts = [q for q in db.executed if any(q == m.read().strip() for m in migrations)]
+    assert scripts == [m.read().strip() for m in migrations[1:]]
+    # 每个迁移执行后单独提交，持有的锁最后释放，连接归还
+    assert db.connections[0].commits == len(migrations) - 1
+    assert db.executed[-1].startswith("DO RELEASE_LOCK")
+    assert db.released == 1
+
+
+async def test_migrate_nothing_pending():
+    db = _FakeMysql({m.version for m in discover()})
+    assert await MigrationRunner(db).migrate() == []
+    assert db.connections == []
+
+
+async def test_migrate_skips_versions_applied_while_waiting_for_lock():
+    migrations = discover()
+    db = _FakeMysql(set())
+
+    # 状态查询时尚未执行，获得锁时其他进程已执行完毕
+    async def find_many(query, args=None):
+        for m in migrations:
+            db.applied[m.version] = "other process"
+        return []
+
+    db.find_many = find_many
+    assert await MigrationRunner(db).migrate() == []
+    assert db.connections[0].commits == 0
+
+
+async def test_sqlite_has_no_migrations(sqlite_db):
+    async with sqlite_db() as db:
+        runner = MigrationRunner(db)
+        assert await runner.status() == []
+        assert await runner.migrate() == []
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from shubot.config import RateLimitConfig
+from shubot.ext.rate_limiter import OutboundRateLimiter, SendPriority
+
+
+def _limiter(**config) -> OutboundRateLimiter:
+    """不启动派发循环的限流器，由测试调用 `_dispatch` 并指定当前时间"""
+    limiter = OutboundRateLimiter(RateLimitConfig(**config))
+    limiter._wakeup = asyncio.Event()
+    return limiter
+
+
+async def _enqueue(limiter: OutboundRateLimiter, *requests: tuple[int, SendPriority]) -> list[asyncio.Task]:
+    tasks = [asyncio.create_task(limiter._acquire(chat_id, priority)) for chat_id, priority in requests]
+    await asyncio.sleep(0)
+    return tasks
+
+
+async def _released(tasks: list[asyncio.Task]) -> list[int]:
+    await asyncio.sleep(0)
+    return [i for i, task in enumerate(tasks) if task.done()]
+
+
+async def test_priority_order():
+    limiter = _limiter(global_rate=1.0)
+    tasks = await _enqueue(
+        limiter, (-1, SendPriority.COSMETIC), (-2, SendPriority.NORMAL), (-3, SendPriority.INTERACTIVE)
+    )
+    now = time.monotonic()
+    assert limiter._dispatch(now) == pytest.approx(1.0)
+    assert await _released(tasks) == [2]
+    limiter._dispatch(now + 1.0)
+    assert await _released(tasks) == [1, 2]
+    assert limiter._dispatch(now + 2.0) is None
+    assert await _released(tasks) == [0, 1, 2]
+
+
+async def test_group_bucket_keeps_order():
+    limiter = _limiter(group_per_minute=60.0, group_burst=2.0)
+    tasks = await _enqueue(limiter, *[(-1, SendPriority.NORMAL)] * 3, (-2, SendPriority.NORMAL))
+    # 会话的令牌桶在派发时才建立，当前时间需晚于建立时间
+    now = time.monotonic() + 0.01
+    wait = limiter._dispatch(now)
+    # 群组 -1 的突发额度用完，第三条等待补充令牌；其他群组不受影响
+    assert await _released(tasks) == [0, 1, 3]
+    assert wait == pytest.approx(1.0, abs=0.02)
+    limiter._dispatch(now + wait)
+    assert await _released(tasks) == [0, 1, 2, 3]
+
+
+async def test_retry_after_blocks_chat():
+    limiter = _limiter(max_retries=1)
+    calls = 0
+
+    async def send():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RetryAfter(0)
+        return True
+
+    assert await limiter.process_request(send, (), {}, "sendMessage", {"chat_id": -1}, None)
+    assert calls == 2
+    assert limiter._chat_buckets[-1].blocked_until > 0
+
+    async def always_limited():
+        raise RetryAfter(0)
+
+    with pytest.raises(RetryAfter):
+        await limiter.process_request(always_limited, (), {}, "sendMessage", {"chat_id": -1}, None)
+
+
+async def test_shutdown_releases_waiters():
+    limiter = _limiter(global_rate=1.0)
+    await limiter.initialize()
+    limiter._global_bucket.tokens = 0
+    tasks = await _enqueue(limiter, (-1, SendPriority.NORMAL), (2, SendPriority.COSMETIC))
+    await limiter.shutdown()
+    assert await _released(tasks) == [0, 1]
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from shubot.ext.sorted_list import SortedList
+
+
+def _check(items: SortedList[int], expected: list[int]):
+    assert len(items) == len(expected)
+    assert list(items) == expected
+    for i in range(0, len(expected), 7):
+        assert items[i] == expected[i]
+        assert items.index(expected[i]) == expected.index(expected[i])
+    assert items.head(5) == expected[:5]
+
+
+@pytest.mark.parametrize("load", [2, 4, 512])
+def test_matches_sorted_list(load):
+    rnd = random.Random(load)
+    items = SortedList(load)
+    expected = []
+    for _ in range(2000):
+        if expected and rnd.random() < 0.45:
+            value = rnd.choice(expected)
+            expected.remove(value)
+            assert items.remove(value)
+        else:
+            value = rnd.randrange(500)
+            expected.append(value)
+            expected.sort()
+            items.add(value)
+    _check(items, expected)
+
+    for value in list(expected):
+        assert items.remove(value)
+    assert len(items) == 0 and list(items) == []
+
+
+def test_missing_values():
+    items = SortedList(2)
+    assert not items.remove(1)
+    assert items.index(1) is None
+    for value in (5, 1, 3):
+        items.add(value)
+    assert not items.remove(4)
+    assert not items.remove(9)
+    assert items.index(4) is None
+    assert items[-1] == 5
+    with pytest.raises(IndexError):
+        _ = items[3]
@@ -0,0 +1,159 @@
+import re
+import sqlite3
+from glob import glob
+from os import path
+
+import pytest
+
+import shubot
+from shubot.backend.sqlite import translate
+from shubot.backend.sqlite_procedures import PROCEDURES, Procedure
+
+_re_create_procedure = re.compile(r"CREATE\s+OR\s+REPLACE\s+PROCEDURE\s+(\w+)", re.I)
+
+
+def test_translate_placeholders_and_statements():
+    assert translate("SELECT * FROM users WHERE user_id = %s AND points > %s") == (
+        ("SELECT * FROM users WHERE user_id = ? AND points > ?", 2),
+    )
+    assert translate("UPDATE users SET points = 0 WHERE user_id = %s; DELETE FROM x WHERE id = %s;") == (
+        ("UPDATE users SET points = 0 WHERE user_id = ?", 1),
+        ("DELETE FROM x WHERE id = ?", 1),
+    )
+
+
+def test_translate_mysql_syntax():
+    ((sql, n),) = translate("INSERT IGNORE INTO users (user_id) VALUES (%s)")
+    assert sql == "INSERT OR IGNORE INTO users (user_id) VALUES (?)" and n == 1
+
+    ((sql, _),) = translate(
+        "INSERT INTO user_names (user_id, full_name) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE full_name = VALUES(full_name)"
+    )
+    assert sql.endswith("ON CONFLICT DO UPDATE SET full_name = excluded.full_name")
+
+    ((sql, _),) = translate("SELECT UTC_DATE(), UTC_TIMESTAMP()")
+    assert sql == "SELECT date('now'), datetime('now')"
+
+    ((sql, _),) = translate("SELECT points FROM users WHERE user_id = %s FOR UPDATE")
+    assert "FOR UPDATE" not in sql
+
+
+def test_every_procedure_is_ported():
+    """SQL 文件中的每个存储过程都有 Python 实现 (内部调用的辅助过程除外)"""
+    root = path.dirname(shubot.__file__)
+    names = set()
+    for sql_path in glob(path.join(root, "**", "*_init.sql"), recursive=True):
+        with open(sql_path, "r", encoding="utf-8") as f:
+            names.update(_re_create_procedure.findall(f.read()))
+    assert names - {"shubot_rob_get_user_pts"} == set(PROCEDURES)
+
+
+async def test_update_pts(sqlite_db):
+    async with sqlite_db() as db:
+        assert await db.call("shubot_common_user_update_pts", 1, -5) == (1, (1, 0, 0))
+        assert await db.call("shubot_common_user_update_pts", 1, 7) == (1, (2, 0, 7))
+        assert await db.call("shubot_common_user_update_pts", 1, -10) == (1, (2, 7, 0))
+        assert await db.call("shubot_common_user_update_pts", 2, 3) == (1, (1, 0, 3))
+
+
+async def test_update_pills(sqlite_db):
+    async with sqlite_db() as db:
+        assert await db.call("shubot_common_user_update_pills", 1, 2) == (1, (1, 0, 2))
+        assert await db.call("shubot_common_user_update_pills", 1, -5) == (1, (2, 2, 0))
+        assert await db.find_one("SELECT stage, next_cost FROM user_cultivation WHERE user_id = 1") == (0, 10)
+
+
+async def test_checkin(sqlite_db):
+    async with sqlite_db() as db:
+        assert await db.call("shubot_checkin", 1, "alice", "Alice", 5) == (1, (1, 5))
+        assert await db.call("shubot_checkin", 1, "alice", "Alice", 5) == (1, (-1, 5))
+        assert await db.find_one("SELECT stage FROM user_cultivation WHERE user_id = 1") == (0,)
+
+        await db.update("UPDATE users SET last_checkin = '2000-01-01' WHERE user_id = 1")
+        assert await db.call("shubot_checkin", 1, "alice", "Alice", 5) == (1, (1, 10))
+
+
+async def test_lottery(sqlite_db):
+    async with sqlite_db() as db:
+        # 没有积分帐号：积分视为 0
+        assert await db.call("shubot_lottery", 1, 2, 10, 0) == (1, (-2, 0, 0, 0))
+
+        await db.call("shubot_common_user_update_pts", 1, 30)
+        assert await db.call("shubot_lottery", 1, 2, 10, 0) == (1, (1, 30, 20, 1))
+        assert await db.call("shubot_lottery", 1, 2, 10, 25) == (1, (1, 20, 35, 2))
+        assert await db.call("shubot_lottery", 1, 2, 10, 0) == (1, (-1, 35, 0, 2))
+        assert await db.find_one("SELECT points FROM users WHERE user_id = 1") == (35,)
+
+        # 隔天次数重置
+        await db.update("UPDATE gua_records SET date = '2000-01-01' WHERE user_id = 1")
+        assert await db.call("shubot_lottery", 1, 2, 40, 0) == (1, (-2, 35, 0, 0))
+        assert await db.call("shubot_lottery", 1, 2, 10, 0) == (1, (1, 35, 25, 1))
+
+
+async def test_rob_user(sqlite_db):
+    async with sqlite_db() as db:
+        assert await db.call("shubot_rob_user", 1, 60, 2) == (1, (1, 1))
+        assert await db.call("shubot_rob_user", 1, 60, 2) == (1, (-2, 0))
+        assert await db.call("shubot_rob_user", 1, -1, 2) == (1, (3, 2))
+        assert await db.call("shubot_rob_user", 1, -1, 2) == (1, (-1, 0))
+
+        await db.update("UPDATE rob_records SET last_rob = '2000-01-01 12:00:00' WHERE user_id = 1")
+        assert await db.call("shubot_rob_user", 1, 60, 2) == (1, (2, 1))
+
+
+async def test_rob_transfer(sqlite_db):
+    async with sqlite_db() as db:
+        # 输家没有积分 (帐号不存在时建立)
+        assert await db.call("shubot_rob_transfer", 1, 2, 0.5) == (1, (-1, 0, 0, 0))
+        assert await db.find_many("SELECT user_id, points FROM users ORDER BY user_id") == [(1, 0), (2, 0)]
+
+        await db.call("shubot_common_user_update_pts", 1, 10)
+        await db.call("shubot_common_user_update_pts", 2, 4)
+        assert await db.call("shubot_rob_transfer", 1, 2, 0.05) == (1, (-2, 0, 10, 4))
+        assert await db.call("shubot_rob_transfer", 1, 2, 0.35) == (1, (1, 3, 7, 7))
+        assert await db.find_many("SELECT user_id, points FROM users ORDER BY user_id") == [(1, 7), (2, 7)]
+
+
+async def test_rob_reset_user(sqlite_db):
+    async with sqlite_db() as db:
+        await db.call("shubot_checkin", 1, "alice", "Alice", 5)
+        assert await db.call("shubot_rob_reset_user", 1) == (1, (1,))
+        assert await db.find_one("SELECT points FROM users WHERE user_id = 1") == (0,)
+        assert await db.find_one("SELECT 1 FROM user_cultivation WHERE user_id = 1") is None
+
+
+async def test_procedure_error_rolls_back(sqlite_db, monkeypatch):
+    def failing(conn: sqlite3.Connection, uid: int):
+        conn.execute("UPDATE users SET points = 100 WHERE user_id = ?", (uid,))
+        conn.execute("INSERT INTO users (user_id) VALUES (?)", (uid,))
+        return (1,)
+
+    monkeypatch.setitem(PROCEDURES, "shubot_test_failing", Procedure(failing, (0, 0)))
+    async with sqlite_db() as db:
+        await db.call("shubot_common_user_update_pts", 1, 5)
+        assert await db.call("shubot_test_failing", 1) == (0, (0, 0))
+        assert await db.find_one("SELECT points FROM users WHERE user_id = 1") == (5,)
+
+        with pytest.raises(NotImplementedError):
+            await db.call("shubot_missing", 1)
+
+
+async def test_transaction(sqlite_db):
+    async with sqlite_db() as db:
+        await db.call("shubot_common_user_update_pts", 1, 5)
+        with pytest.raises(ValueError):
+            async with db.transaction():
+                assert db.in_transaction
+                await db.update("UPDATE users SET points = 50 WHERE user_id = 1")
+                assert await db.find_one("SELECT points FROM users WHERE user_id = 1") == (50,)
+                raise ValueError()
+        assert not db.in_transaction
+        assert await db.find_one("SELECT points FROM users WHERE user_id = 1") == (5,)
+
+        async with db.transaction():
+            await db.update("UPDATE users SET points = 50 WHERE user_id = 1")
+            # 存储过程会提交外层事务 (MySQL)，因此不能在事务中调用
+            with pytest.raises(RuntimeError):
+                await db.call("shubot_common_user_update_pts", 1, 5)
+        assert await db.find_one("SELECT points FROM users WHERE user_id = 1") == (50,)